@@ -0,0 +1,57 @@
+"""Add waitlist entries
+
+Revision ID: a4c6e8b0d2f5
+Revises: f3b5d7f9a1c3
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c6e8b0d2f5'
+down_revision = 'f3b5d7f9a1c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('waitlist_entries',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('patient_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('doctor_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('specialty', sa.String(), nullable=True),
+    sa.Column('appointment_type_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('earliest_date', sa.String(), nullable=False),
+    sa.Column('latest_date', sa.String(), nullable=False),
+    sa.Column('earliest_time', sa.String(), nullable=False),
+    sa.Column('latest_time', sa.String(), nullable=False),
+    sa.Column('auto_book', sa.Boolean(), nullable=False),
+    sa.Column('current_appointment_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('reason', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('offered_doctor_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('offered_room_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('offered_date', sa.String(), nullable=True),
+    sa.Column('offered_time', sa.String(), nullable=True),
+    sa.Column('offer_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('appointment_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['appointment_type_id'], ['appointment_types.id'], ),
+    sa.ForeignKeyConstraint(['doctor_id'], ['doctors.id'], ),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_waitlist_entries_patient_id'), 'waitlist_entries', ['patient_id'], unique=False)
+    op.create_index('ix_waitlist_doctor_window', 'waitlist_entries', ['doctor_id', 'earliest_date', 'latest_date'], unique=False, postgresql_where=sa.text("status = 'waiting'"))
+    op.create_index('ix_waitlist_specialty_window', 'waitlist_entries', ['specialty', 'earliest_date', 'latest_date'], unique=False, postgresql_where=sa.text("status = 'waiting' AND doctor_id IS NULL"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_waitlist_specialty_window', table_name='waitlist_entries')
+    op.drop_index('ix_waitlist_doctor_window', table_name='waitlist_entries')
+    op.drop_index(op.f('ix_waitlist_entries_patient_id'), table_name='waitlist_entries')
+    op.drop_table('waitlist_entries')
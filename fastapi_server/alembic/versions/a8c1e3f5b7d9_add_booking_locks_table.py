@@ -0,0 +1,28 @@
+"""Add booking locks table
+
+Revision ID: a8c1e3f5b7d9
+Revises: f1b3d5e7a9c2
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c1e3f5b7d9'
+down_revision = 'f1b3d5e7a9c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('booking_locks',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('locked_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('booking_locks')
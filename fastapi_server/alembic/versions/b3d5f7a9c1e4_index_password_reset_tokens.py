@@ -0,0 +1,31 @@
+"""Index password reset tokens
+
+Revision ID: b3d5f7a9c1e4
+Revises: a8c1e3f5b7d9
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d5f7a9c1e4'
+down_revision = 'a8c1e3f5b7d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Tokens expirados ou usados não servem mais; a limpeza também evita
+    # duplicatas antigas de token_hash ao criar o índice único
+    op.execute("DELETE FROM password_reset_tokens WHERE used = true OR expires_at <= CURRENT_TIMESTAMP")
+    op.create_index(op.f('ix_password_reset_tokens_token_hash'), 'password_reset_tokens', ['token_hash'], unique=True)
+    op.create_index(op.f('ix_password_reset_tokens_expires_at'), 'password_reset_tokens', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_password_reset_tokens_user_id'), 'password_reset_tokens', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_password_reset_tokens_user_id'), table_name='password_reset_tokens')
+    op.drop_index(op.f('ix_password_reset_tokens_expires_at'), table_name='password_reset_tokens')
+    op.drop_index(op.f('ix_password_reset_tokens_token_hash'), table_name='password_reset_tokens')
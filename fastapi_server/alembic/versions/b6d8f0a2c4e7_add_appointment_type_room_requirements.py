@@ -0,0 +1,26 @@
+"""Add room requirements to appointment types
+
+Revision ID: b6d8f0a2c4e7
+Revises: a4c6e8b0d2f5
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d8f0a2c4e7'
+down_revision = 'a4c6e8b0d2f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('appointment_types', sa.Column('required_room_type', sa.String(), nullable=True))
+    op.add_column('appointment_types', sa.Column('required_equipment', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('appointment_types', 'required_equipment')
+    op.drop_column('appointment_types', 'required_room_type')
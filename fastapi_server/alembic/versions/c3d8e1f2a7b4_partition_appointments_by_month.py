@@ -0,0 +1,118 @@
+"""Partition appointments by month
+
+Revision ID: c3d8e1f2a7b4
+Revises: aafc954ad32e
+Create Date: 2026-10-18 10:00:00.000000
+
+Converte ``appointments`` em tabela particionada por faixa (mensal) de
+``appointment_date`` no PostgreSQL. A chave primária passa a ser
+(id, appointment_date), exigência do particionamento. Datas fora do formato
+YYYY-MM-DD caem na partição default. Em outros bancos apenas os índices por
+data são criados.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d8e1f2a7b4'
+down_revision = 'aafc954ad32e'
+branch_labels = None
+depends_on = None
+
+# Partições criadas além do último mês com dados
+MONTHS_AHEAD = 3
+
+COLUMNS = """
+    id UUID NOT NULL,
+    patient_id UUID NOT NULL REFERENCES patients (id),
+    doctor_id UUID NOT NULL REFERENCES doctors (id),
+    room_id UUID REFERENCES clinic_rooms (id),
+    appointment_type_id UUID NOT NULL REFERENCES appointment_types (id),
+    appointment_date VARCHAR NOT NULL,
+    appointment_time VARCHAR NOT NULL,
+    status VARCHAR NOT NULL,
+    reason TEXT,
+    notes TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE
+"""
+
+COLUMN_NAMES = (
+    "id, patient_id, doctor_id, room_id, appointment_type_id, appointment_date, "
+    "appointment_time, status, reason, notes, created_at, updated_at"
+)
+
+INDEXES = {
+    "ix_appointments_doctor_date": ["doctor_id", "appointment_date"],
+    "ix_appointments_room_date": ["room_id", "appointment_date"],
+    "ix_appointments_patient_date": ["patient_id", "appointment_date"],
+    "ix_appointments_status_date": ["status", "appointment_date"],
+}
+
+
+def _next_month(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _month_range(bind):
+    """Meses cobertos pelos dados existentes, até MONTHS_AHEAD após o atual."""
+    row = bind.execute(sa.text(
+        "SELECT min(appointment_date), max(appointment_date), to_char(now(), 'YYYY-MM') "
+        "FROM appointments_legacy WHERE appointment_date ~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}$'"
+    )).fetchone()
+    first = row[0][:7] if row[0] else row[2]
+    last = max(row[1][:7] if row[1] else row[2], row[2])
+
+    year, month = int(first[:4]), int(first[5:7])
+    last_year, last_month = int(last[:4]), int(last[5:7])
+    for _ in range(MONTHS_AHEAD):
+        last_year, last_month = _next_month(last_year, last_month)
+
+    while (year, month) <= (last_year, last_month):
+        yield year, month
+        year, month = _next_month(year, month)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        for name, columns in INDEXES.items():
+            op.create_index(name, 'appointments', columns)
+        return
+
+    op.execute('ALTER TABLE appointments RENAME TO appointments_legacy')
+    op.execute('ALTER TABLE appointments_legacy RENAME CONSTRAINT appointments_pkey TO appointments_legacy_pkey')
+
+    op.execute(f"""
+        CREATE TABLE appointments ({COLUMNS},
+            PRIMARY KEY (id, appointment_date)
+        ) PARTITION BY RANGE (appointment_date)
+    """)
+    op.execute('CREATE TABLE appointments_default PARTITION OF appointments DEFAULT')
+    for name, columns in INDEXES.items():
+        op.execute(f'CREATE INDEX {name} ON appointments ({", ".join(columns)})')
+
+    for year, month in _month_range(bind):
+        next_year, next_month = _next_month(year, month)
+        op.execute(
+            f"CREATE TABLE appointments_y{year:04d}m{month:02d} PARTITION OF appointments "
+            f"FOR VALUES FROM ('{year:04d}-{month:02d}-01') TO ('{next_year:04d}-{next_month:02d}-01')"
+        )
+
+    op.execute(f'INSERT INTO appointments ({COLUMN_NAMES}) SELECT {COLUMN_NAMES} FROM appointments_legacy')
+    op.execute('DROP TABLE appointments_legacy')
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        for name in INDEXES:
+            op.drop_index(name, table_name='appointments')
+        return
+
+    op.execute('ALTER TABLE appointments RENAME TO appointments_partitioned')
+    op.execute('ALTER TABLE appointments_partitioned RENAME CONSTRAINT appointments_pkey TO appointments_partitioned_pkey')
+    op.execute(f'CREATE TABLE appointments ({COLUMNS}, PRIMARY KEY (id))')
+    op.execute(f'INSERT INTO appointments ({COLUMN_NAMES}) SELECT {COLUMN_NAMES} FROM appointments_partitioned')
+    op.execute('DROP TABLE appointments_partitioned CASCADE')
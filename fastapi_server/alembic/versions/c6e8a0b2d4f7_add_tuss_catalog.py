@@ -0,0 +1,53 @@
+"""Add TUSS catalog and appointment procedures
+
+Revision ID: c6e8a0b2d4f7
+Revises: b3d5f7a9c1e4
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e8a0b2d4f7'
+down_revision = 'b3d5f7a9c1e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('tuss_catalog_versions',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('checksum', sa.String(length=64), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('loaded_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tuss_procedures',
+    sa.Column('version_id', sa.Integer(), nullable=False),
+    sa.Column('code', sa.String(length=10), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('valid_from', sa.String(length=10), nullable=True),
+    sa.Column('valid_until', sa.String(length=10), nullable=True),
+    sa.ForeignKeyConstraint(['version_id'], ['tuss_catalog_versions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('version_id', 'code')
+    )
+    op.create_table('appointment_procedures',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('appointment_id', sa.UUID(), nullable=False),
+    sa.Column('procedure_code', sa.String(length=10), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_appointment_procedures_appointment_id'), 'appointment_procedures', ['appointment_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_appointment_procedures_appointment_id'), table_name='appointment_procedures')
+    op.drop_table('appointment_procedures')
+    op.drop_table('tuss_procedures')
+    op.drop_table('tuss_catalog_versions')
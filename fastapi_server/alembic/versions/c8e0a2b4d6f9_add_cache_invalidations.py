@@ -0,0 +1,33 @@
+"""Add cache invalidation log
+
+Revision ID: c8e0a2b4d6f9
+Revises: b6d8f0a2c4e7
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e0a2b4d6f9'
+down_revision = 'b6d8f0a2c4e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('cache_invalidations',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('entity', sa.String(length=64), nullable=False),
+    sa.Column('key', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    op.create_index(op.f('ix_cache_invalidations_created_at'), 'cache_invalidations', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_cache_invalidations_created_at'), table_name='cache_invalidations')
+    op.drop_table('cache_invalidations')
@@ -0,0 +1,47 @@
+"""Add appointment daily stats
+
+Revision ID: d4e9f3a1b2c5
+Revises: c3d8e1f2a7b4
+Create Date: 2026-10-18 11:00:00.000000
+
+Tabela de agregados do dashboard (dia, médico, sala, status), preenchida a
+partir dos agendamentos existentes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e9f3a1b2c5'
+down_revision = 'c3d8e1f2a7b4'
+branch_labels = None
+depends_on = None
+
+NO_ROOM = '00000000-0000-0000-0000-000000000000'
+
+
+def upgrade() -> None:
+    op.create_table('appointment_daily_stats',
+    sa.Column('stat_date', sa.String(), nullable=False),
+    sa.Column('doctor_id', sa.UUID(), nullable=False),
+    sa.Column('room_id', sa.UUID(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('stat_date', 'doctor_id', 'room_id', 'status')
+    )
+
+    # Fora do PostgreSQL o tipo UUID do SQLAlchemy grava 32 dígitos hexadecimais
+    if op.get_bind().dialect.name == 'postgresql':
+        no_room = f"'{NO_ROOM}'::uuid"
+    else:
+        no_room = f"'{NO_ROOM.replace('-', '')}'"
+    op.execute(f"""
+        INSERT INTO appointment_daily_stats (stat_date, doctor_id, room_id, status, count)
+        SELECT appointment_date, doctor_id, COALESCE(room_id, {no_room}), status, count(*)
+        FROM appointments
+        GROUP BY appointment_date, doctor_id, COALESCE(room_id, {no_room}), status
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('appointment_daily_stats')
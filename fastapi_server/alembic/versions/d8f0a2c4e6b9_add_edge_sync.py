@@ -0,0 +1,47 @@
+"""Add row versions and change log for edge sync
+
+Revision ID: d8f0a2c4e6b9
+Revises: c6e8a0b2d4f7
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f0a2c4e6b9'
+down_revision = 'c6e8a0b2d4f7'
+branch_labels = None
+depends_on = None
+
+SYNCED_TABLES = ('insurance_plans', 'patients', 'doctors', 'clinic_rooms', 'appointment_types', 'appointments')
+
+
+def upgrade() -> None:
+    for table in SYNCED_TABLES:
+        op.add_column(table, sa.Column('row_version', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('sync_changes',
+    sa.Column('seq', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('row_id', sa.String(length=36), nullable=False),
+    sa.Column('op', sa.String(length=8), nullable=False),
+    sa.Column('row_version', sa.Integer(), nullable=False),
+    sa.Column('origin', sa.String(length=64), nullable=False),
+    sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('seq')
+    )
+    op.create_index('ix_sync_changes_row', 'sync_changes', ['table_name', 'row_id', 'seq'], unique=False)
+    op.create_table('sync_state',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sync_state')
+    op.drop_index('ix_sync_changes_row', table_name='sync_changes')
+    op.drop_table('sync_changes')
+    for table in SYNCED_TABLES:
+        op.drop_column(table, 'row_version')
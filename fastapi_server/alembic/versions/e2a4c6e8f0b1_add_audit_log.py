@@ -0,0 +1,39 @@
+"""Add audit log
+
+Revision ID: e2a4c6e8f0b1
+Revises: d8f0a2c4e6b9
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a4c6e8f0b1'
+down_revision = 'd8f0a2c4e6b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('audit_log',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('row_id', sa.String(length=36), nullable=False),
+    sa.Column('action', sa.String(length=8), nullable=False),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('user_email', sa.String(), nullable=True),
+    sa.Column('changes', sa.JSON(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_audit_log_row', 'audit_log', ['table_name', 'row_id', 'changed_at'], unique=False)
+    op.create_index('ix_audit_log_user', 'audit_log', ['user_id', 'changed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_audit_log_user', table_name='audit_log')
+    op.drop_index('ix_audit_log_row', table_name='audit_log')
+    op.drop_table('audit_log')
@@ -0,0 +1,30 @@
+"""Add transaction id to sync_changes
+
+Revision ID: e9b1d3f5a7c8
+Revises: c8e0a2b4d6f9
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b1d3f5a7c8'
+down_revision = 'c8e0a2b4d6f9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sync_changes', sa.Column('txid', sa.BigInteger(), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        # Registros anteriores ficam na transação 0: cursores antigos (só o seq) continuam válidos
+        op.execute('UPDATE sync_changes SET txid = 0')
+        op.execute("ALTER TABLE sync_changes ALTER COLUMN txid SET DEFAULT pg_current_xact_id()::text::bigint")
+    op.create_index('ix_sync_changes_txid', 'sync_changes', ['txid', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_changes_txid', table_name='sync_changes')
+    op.drop_column('sync_changes', 'txid')
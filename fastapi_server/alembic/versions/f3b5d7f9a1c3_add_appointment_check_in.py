@@ -0,0 +1,24 @@
+"""Add appointment check-in time
+
+Revision ID: f3b5d7f9a1c3
+Revises: e2a4c6e8f0b1
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b5d7f9a1c3'
+down_revision = 'e2a4c6e8f0b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('appointments', sa.Column('checked_in_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('appointments', 'checked_in_at')
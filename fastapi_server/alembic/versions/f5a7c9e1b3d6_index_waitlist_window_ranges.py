@@ -0,0 +1,43 @@
+"""Index waitlist windows as day ranges
+
+Revision ID: f5a7c9e1b3d6
+Revises: e9b1d3f5a7c8
+Create Date: 2026-10-19 23:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5a7c9e1b3d6'
+down_revision = 'e9b1d3f5a7c8'
+branch_labels = None
+depends_on = None
+
+WINDOW = "int4range(replace(earliest_date, '-', '')::int, replace(latest_date, '-', '')::int, '[]')"
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # uuid e texto em índices GiST
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        f"CREATE INDEX ix_waitlist_doctor_range ON waitlist_entries USING gist (doctor_id, ({WINDOW})) "
+        "WHERE status = 'waiting'"
+    )
+    op.execute(
+        f"CREATE INDEX ix_waitlist_specialty_range ON waitlist_entries USING gist (specialty, ({WINDOW})) "
+        "WHERE status = 'waiting' AND doctor_id IS NULL"
+    )
+    op.drop_index('ix_waitlist_specialty_window', table_name='waitlist_entries')
+    op.drop_index('ix_waitlist_doctor_window', table_name='waitlist_entries')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.create_index('ix_waitlist_doctor_window', 'waitlist_entries', ['doctor_id', 'earliest_date', 'latest_date'], unique=False, postgresql_where="status = 'waiting'")
+    op.create_index('ix_waitlist_specialty_window', 'waitlist_entries', ['specialty', 'earliest_date', 'latest_date'], unique=False, postgresql_where="status = 'waiting' AND doctor_id IS NULL")
+    op.drop_index('ix_waitlist_specialty_range', table_name='waitlist_entries')
+    op.drop_index('ix_waitlist_doctor_range', table_name='waitlist_entries')
@@ -0,0 +1,217 @@
+"""Relatórios de ocupação de médicos e salas.
+
+Os intervalos dos agendamentos do período são carregados com uma única
+consulta de projeção e convertidos em arrays NumPy. A ocupação é calculada
+em resolução de minuto sobre uma grade (recurso x dia x minuto do expediente)
+usando um array de diferenças seguido de soma acumulada; utilização semanal,
+mapa de calor por dia da semana e hora e intervalos ociosos saem de reduções
+sobre essa grade.
+"""
+import os
+from datetime import date, timedelta
+from typing import Dict, List, Sequence
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+import archive
+from booking import DEFAULT_DURATION_MINUTES, parse_duration
+from models import Appointment, AppointmentType, ClinicRoom, Doctor
+
+WORKDAY_START_HOUR = int(os.getenv("WORKDAY_START_HOUR", "8"))
+WORKDAY_END_HOUR = int(os.getenv("WORKDAY_END_HOUR", "18"))
+# Dias úteis (0 = segunda-feira)
+WORKING_WEEKDAYS = tuple(int(day) for day in os.getenv("WORKING_WEEKDAYS", "0,1,2,3,4").split(","))
+ANALYTICS_MIN_GAP_MINUTES = int(os.getenv("ANALYTICS_MIN_GAP_MINUTES", "30"))
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", "400"))
+
+# Cancelados liberam o horário; os demais status ocupam a agenda
+FREE_STATUSES = ("cancelled",)
+
+
+def compute_utilization(
+    resource_index: np.ndarray,
+    day_index: np.ndarray,
+    start_minute: np.ndarray,
+    duration: np.ndarray,
+    n_resources: int,
+    start: date,
+    n_days: int,
+    workday_start_hour: int = WORKDAY_START_HOUR,
+    workday_end_hour: int = WORKDAY_END_HOUR,
+    working_weekdays: Sequence[int] = WORKING_WEEKDAYS,
+    min_gap_minutes: int = ANALYTICS_MIN_GAP_MINUTES
+) -> Dict[str, np.ndarray]:
+    """Calcula a ocupação a partir dos intervalos já convertidos em arrays.
+
+    ``resource_index``, ``day_index``, ``start_minute`` (minutos desde 00:00) e
+    ``duration`` têm um elemento por agendamento. Retorna arrays indexados pelo
+    recurso (primeiro eixo).
+    """
+    window_start = workday_start_hour * 60
+    window = (workday_end_hour - workday_start_hour) * 60
+    hours = workday_end_hour - workday_start_hour
+
+    weekdays = (np.arange(n_days) + start.weekday()) % 7
+    working_day = np.isin(weekdays, working_weekdays)
+
+    # Recorta os intervalos ao expediente e descarta dias não úteis
+    begin = np.clip(start_minute - window_start, 0, window)
+    end = np.clip(start_minute + duration - window_start, 0, window)
+    keep = (end > begin) & working_day[day_index]
+    row = resource_index[keep].astype(np.int64) * n_days + day_index[keep]
+
+    # Array de diferenças: +1 no início, -1 no fim; a soma acumulada dá a ocupação
+    diff = np.zeros((n_resources * n_days, window + 1), dtype=np.int32)
+    np.add.at(diff, (row, begin[keep]), 1)
+    np.add.at(diff, (row, end[keep]), -1)
+    occupied = np.cumsum(diff[:, :window], axis=1, dtype=np.int32) > 0
+    occupied = occupied.reshape(n_resources, n_days, window)
+
+    booked_by_day = occupied.sum(axis=2)
+
+    # Semanas começando na segunda-feira anterior (ou igual) a ``start``
+    week_index = (np.arange(n_days) + start.weekday()) // 7
+    n_weeks = int(week_index[-1]) + 1 if n_days else 0
+    week_matrix = np.zeros((n_days, n_weeks), dtype=np.int64)
+    week_matrix[np.arange(n_days), week_index] = 1
+    booked_by_week = booked_by_day @ week_matrix
+    available_by_week = (working_day.astype(np.int64) @ week_matrix) * window
+
+    # Mapa de calor: minutos ocupados por dia da semana e hora / minutos disponíveis
+    booked_by_hour = occupied.reshape(n_resources, n_days, hours, 60).sum(axis=3)
+    heatmap = np.zeros((n_resources, 7, hours), dtype=np.float64)
+    days_per_weekday = np.bincount(weekdays[working_day], minlength=7)
+    for weekday in range(7):
+        if days_per_weekday[weekday]:
+            selected = booked_by_hour[:, (weekdays == weekday) & working_day, :]
+            heatmap[:, weekday, :] = selected.sum(axis=1) / (days_per_weekday[weekday] * 60)
+
+    # Intervalos ociosos: sequências livres com pelo menos ``min_gap_minutes``
+    free = ~occupied[:, working_day, :]
+    padded = np.zeros(free.shape[:2] + (window + 2,), dtype=np.int8)
+    padded[:, :, 1:-1] = free
+    edges = np.diff(padded, axis=2)
+    gap_resource, _, gap_start = np.nonzero(edges == 1)
+    _, _, gap_end = np.nonzero(edges == -1)
+    gap_length = gap_end - gap_start
+    long_gaps = gap_length >= min_gap_minutes
+    gap_count = np.bincount(gap_resource[long_gaps], minlength=n_resources)
+    gap_minutes = np.bincount(gap_resource[long_gaps], weights=gap_length[long_gaps], minlength=n_resources)
+    longest_gap = np.zeros(n_resources, dtype=np.int64)
+    np.maximum.at(longest_gap, gap_resource[long_gaps], gap_length[long_gaps])
+
+    return {
+        "booked_minutes": booked_by_day.sum(axis=1),
+        "available_minutes": np.full(n_resources, int(working_day.sum()) * window),
+        "booked_by_week": booked_by_week,
+        "available_by_week": available_by_week,
+        "heatmap": heatmap,
+        "gap_count": gap_count,
+        "gap_minutes": gap_minutes.astype(np.int64),
+        "longest_gap": longest_gap,
+    }
+
+
+def _load_intervals(db: Session, resource: str, start_date: str, end_date: str) -> List[tuple]:
+    """(recurso, data, minuto inicial, tipo) dos agendamentos do período."""
+    column = Appointment.doctor_id if resource == "doctor" else Appointment.room_id
+    start_minute = (
+        cast(func.substr(Appointment.appointment_time, 1, 2), Integer) * 60
+        + cast(func.substr(Appointment.appointment_time, 4, 2), Integer)
+    )
+    rows = db.execute(
+        select(column, Appointment.appointment_date, start_minute, Appointment.appointment_type_id).where(
+            Appointment.appointment_date >= start_date,
+            Appointment.appointment_date <= end_date,
+            Appointment.status.notin_(FREE_STATUSES),
+            column.isnot(None)
+        )
+    ).all()
+    intervals = [(str(row[0]), row[1], row[2], str(row[3])) for row in rows]
+
+    if archive.archive_applies(start_date, end_date):
+        key = "doctor_id" if resource == "doctor" else "room_id"
+        for row in archive.query_archive(start_date, end_date):
+            if row[key] and row["status"] not in FREE_STATUSES:
+                hour, minute = row["appointment_time"][:5].split(":")
+                intervals.append((row[key], row["appointment_date"], int(hour) * 60 + int(minute), row["appointment_type_id"]))
+    return intervals
+
+
+def utilization_report(db: Session, resource: str, start_date: date, end_date: date) -> dict:
+    """Relatório de ocupação de ``resource`` ("doctor" ou "room") no período."""
+    if resource == "doctor":
+        entities = db.query(Doctor).filter(Doctor.is_active == True).all()
+        labels = {str(doctor.id): f"{doctor.first_name} {doctor.last_name}" for doctor in entities}
+    else:
+        entities = db.query(ClinicRoom).all()
+        labels = {str(room.id): room.room_number for room in entities}
+    durations = {
+        str(appointment_type.id): parse_duration(appointment_type.duration)
+        for appointment_type in db.query(AppointmentType).all()
+    }
+
+    ids = list(labels)
+    position = {resource_id: index for index, resource_id in enumerate(ids)}
+    n_days = (end_date - start_date).days + 1
+    intervals = [
+        interval for interval in _load_intervals(db, resource, start_date.isoformat(), end_date.isoformat())
+        if interval[0] in position
+    ]
+
+    if intervals:
+        resource_ids, dates, minutes, type_ids = zip(*intervals)
+        unique_ids, inverse = np.unique(np.array(resource_ids), return_inverse=True)
+        resource_index = np.array([position[value] for value in unique_ids], dtype=np.int64)[inverse]
+        day_index = (np.array(dates, dtype="datetime64[D]") - np.datetime64(start_date, "D")).astype(np.int64)
+        unique_types, type_inverse = np.unique(np.array(type_ids), return_inverse=True)
+        duration = np.array(
+            [durations.get(value, DEFAULT_DURATION_MINUTES) for value in unique_types], dtype=np.int64
+        )[type_inverse]
+        start_minute = np.array(minutes, dtype=np.int64)
+    else:
+        resource_index = day_index = start_minute = duration = np.zeros(0, dtype=np.int64)
+
+    result = compute_utilization(resource_index, day_index, start_minute, duration, len(ids), start_date, n_days)
+
+    first_monday = start_date - timedelta(days=start_date.weekday())
+    week_starts = [(first_monday + timedelta(weeks=week)).isoformat() for week in range(result["booked_by_week"].shape[1])]
+
+    def ratio(booked, available):
+        return round(float(booked) / float(available), 4) if available else 0.0
+
+    resources = []
+    for index, resource_id in enumerate(ids):
+        resources.append({
+            "id": resource_id,
+            "label": labels[resource_id],
+            "booked_minutes": int(result["booked_minutes"][index]),
+            "available_minutes": int(result["available_minutes"][index]),
+            "utilization": ratio(result["booked_minutes"][index], result["available_minutes"][index]),
+            "weekly": [
+                {
+                    "week_start": week_start,
+                    "utilization": ratio(result["booked_by_week"][index, week], result["available_by_week"][week]),
+                }
+                for week, week_start in enumerate(week_starts)
+            ],
+            "heatmap": np.round(result["heatmap"][index], 4).tolist(),
+            "idle_gaps": {
+                "count": int(result["gap_count"][index]),
+                "total_minutes": int(result["gap_minutes"][index]),
+                "longest_minutes": int(result["longest_gap"][index]),
+            },
+        })
+
+    heatmap = result["heatmap"].mean(axis=0) if ids else np.zeros((7, WORKDAY_END_HOUR - WORKDAY_START_HOUR))
+    return {
+        "resource": resource,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "workday_start_hour": WORKDAY_START_HOUR,
+        "workday_end_hour": WORKDAY_END_HOUR,
+        "heatmap": np.round(heatmap, 4).tolist(),
+        "resources": resources,
+    }
@@ -0,0 +1,344 @@
+"""Arquivamento frio de agendamentos antigos.
+
+Agendamentos concluídos, cancelados ou de falta com mais de
+``ARCHIVE_AFTER_DAYS`` dias saem da tabela ``appointments`` e vão para arquivos
+JSONL compactados (gzip), um diretório por mês de ``appointment_date``:
+
+    ARCHIVE_DIR/appointments/2023-04/<lote>.jsonl.gz
+
+Cada lote é gravado em arquivo temporário e renomeado antes da remoção das
+linhas do banco; se o processo cair entre as duas etapas o lote é gravado de
+novo na próxima execução e a leitura descarta ids repetidos. Em produção com
+mais de um servidor, ``ARCHIVE_DIR`` deve ser um volume compartilhado.
+
+Consultas por paciente ou médico não percorrem os meses: cada lote acrescenta
+uma linha ``<mês>/<lote>`` ao índice de cada paciente e médico que contém
+
+    ARCHIVE_DIR/appointments/by_patient/ab/<patient_id>.txt
+
+e só os lotes listados são lidos. Lotes gravados antes dos índices são
+indexados uma vez, na primeira consulta ou execução do arquivamento.
+"""
+import gzip
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import selectinload
+
+import counts
+import jobs
+import metrics
+from database import SessionLocal
+from models import Appointment, AppointmentType, ClinicRoom, Doctor, Patient
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join("data", "archive"))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "730"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_MAX_BATCHES = int(os.getenv("ARCHIVE_MAX_BATCHES", "100"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", str(24 * 3600)))
+ARCHIVE_CACHE_MONTHS = int(os.getenv("ARCHIVE_CACHE_MONTHS", "24"))
+
+ARCHIVE_STATUSES = ("completed", "cancelled", "no_show")
+
+# Coluna -> diretório do índice por chave
+INDEX_DIRS = {"patient_id": "by_patient", "doctor_id": "by_doctor"}
+INDEX_READY = "index.ready"
+
+COLUMNS = [column.name for column in Appointment.__table__.columns]
+
+_cache_lock = threading.Lock()
+# mês -> (arquivos lidos, linhas); LRU limitado a ARCHIVE_CACHE_MONTHS
+_month_cache: "OrderedDict[str, Tuple[Tuple[str, ...], List[dict]]]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def archive_cutoff(today: Optional[date] = None) -> str:
+    """Data (YYYY-MM-DD) antes da qual agendamentos podem estar arquivados."""
+    today = today or date.today()
+    return (today - timedelta(days=ARCHIVE_AFTER_DAYS)).isoformat()
+
+
+def _appointments_dir() -> str:
+    return os.path.join(ARCHIVE_DIR, "appointments")
+
+
+def _serialize(appointment: Appointment) -> dict:
+    row = {}
+    for name in COLUMNS:
+        value = getattr(appointment, name)
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        row[name] = value
+    return row
+
+
+def _write_batch(month: str, rows: List[dict], batch_id: str) -> str:
+    directory = os.path.join(_appointments_dir(), month)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{batch_id}.jsonl.gz")
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as compressed:
+            for row in rows:
+                compressed.write(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+                compressed.write(b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temporary, path)
+    _index_batch(month, os.path.basename(path), rows)
+    return path
+
+
+def _index_file(column: str, value: str) -> str:
+    return os.path.join(_appointments_dir(), INDEX_DIRS[column], value[:2], f"{value}.txt")
+
+
+def _index_batch(month: str, name: str, rows: List[dict]) -> None:
+    """Acrescenta o lote ao índice de cada paciente e médico que ele contém."""
+    entry = f"{month}/{name}\n"
+    for column in INDEX_DIRS:
+        for value in {row[column] for row in rows if row[column]}:
+            path = _index_file(column, value)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as handle:
+                handle.write(entry)
+
+
+def _ensure_index() -> None:
+    """Indexa os lotes gravados antes dos índices por paciente e médico (uma vez)."""
+    marker = os.path.join(_appointments_dir(), INDEX_READY)
+    if os.path.exists(marker):
+        return
+    with _index_lock:
+        if os.path.exists(marker):
+            return
+        batches = 0
+        for month in _archived_months():
+            directory = os.path.join(_appointments_dir(), month)
+            for name in _batch_files(directory):
+                _index_batch(month, name, _read_batch(os.path.join(directory, name)))
+                batches += 1
+        os.makedirs(_appointments_dir(), exist_ok=True)
+        with open(marker, "w", encoding="utf-8") as handle:
+            handle.write(datetime.now().isoformat())
+    if batches:
+        print(f"[ARCHIVE] {batches} lotes arquivados indexados por paciente e médico")
+
+
+def archive_batch(db, cutoff: str, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Arquiva um lote de agendamentos antigos. Retorna quantas linhas moveu."""
+    appointments = db.query(Appointment).filter(
+        Appointment.appointment_date < cutoff,
+        Appointment.status.in_(ARCHIVE_STATUSES)
+    ).order_by(Appointment.appointment_date, Appointment.id).limit(batch_size).all()
+    if not appointments:
+        return 0
+
+    by_month: Dict[str, List[dict]] = {}
+    for appointment in appointments:
+        by_month.setdefault(appointment.appointment_date[:7], []).append(_serialize(appointment))
+
+    batch_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    for month, rows in by_month.items():
+        _write_batch(month, rows, batch_id)
+
+    # A faixa de datas do lote permite ao PostgreSQL podar as partições
+    db.query(Appointment).filter(
+        Appointment.id.in_([appointment.id for appointment in appointments]),
+        Appointment.appointment_date.between(
+            appointments[0].appointment_date, appointments[-1].appointment_date
+        )
+    ).delete(synchronize_session=False)
+    # Remoção fora do ORM: o after_flush não a vê
+    counts.invalidate_table(db, Appointment)
+    db.commit()
+
+    _invalidate(by_month.keys())
+    metrics.increment("archive.rows", len(appointments))
+    return len(appointments)
+
+
+def archive_old_appointments(max_batches: int = ARCHIVE_MAX_BATCHES) -> int:
+    """Arquiva em lotes tudo o que passou do prazo (até ``max_batches`` lotes)."""
+    cutoff = archive_cutoff()
+    total = 0
+    _ensure_index()
+    db = SessionLocal()
+    try:
+        for _ in range(max_batches):
+            moved = archive_batch(db, cutoff)
+            total += moved
+            if moved < ARCHIVE_BATCH_SIZE:
+                break
+    finally:
+        db.close()
+    if total:
+        print(f"[ARCHIVE] {total} agendamentos arquivados (anteriores a {cutoff})")
+    return total
+
+
+def _invalidate(months: Iterable[str]) -> None:
+    with _cache_lock:
+        for month in months:
+            _month_cache.pop(month, None)
+
+
+def _archived_months() -> List[str]:
+    try:
+        return sorted(name for name in os.listdir(_appointments_dir()) if len(name) == 7)
+    except FileNotFoundError:
+        return []
+
+
+def _batch_files(directory: str) -> Tuple[str, ...]:
+    return tuple(sorted(name for name in os.listdir(directory) if name.endswith(".jsonl.gz")))
+
+
+def _read_batch(path: str) -> List[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle]
+
+
+def _sorted_unique(rows: Iterable[dict]) -> List[dict]:
+    # Um lote regravado após uma queda repete ids
+    unique = {row["id"]: row for row in rows}
+    return sorted(unique.values(), key=lambda row: (row["appointment_date"], row["appointment_time"]))
+
+
+def _read_month(month: str) -> List[dict]:
+    directory = os.path.join(_appointments_dir(), month)
+    files = _batch_files(directory)
+    with _cache_lock:
+        cached = _month_cache.get(month)
+        if cached and cached[0] == files:
+            _month_cache.move_to_end(month)
+            return cached[1]
+
+    result = _sorted_unique(row for name in files for row in _read_batch(os.path.join(directory, name)))
+    metrics.increment("archive.months_read")
+
+    with _cache_lock:
+        _month_cache[month] = (files, result)
+        _month_cache.move_to_end(month)
+        while len(_month_cache) > ARCHIVE_CACHE_MONTHS:
+            _month_cache.popitem(last=False)
+    return result
+
+
+def _read_indexed(column: str, value: str, start_date: Optional[str], end_date: Optional[str]) -> List[dict]:
+    """Linhas arquivadas do paciente ou médico, lendo só os lotes do índice no período."""
+    _ensure_index()
+    try:
+        with open(_index_file(column, value), encoding="utf-8") as handle:
+            batches = sorted({line.strip() for line in handle if line.strip()})
+    except FileNotFoundError:
+        return []
+    batches = [
+        batch for batch in batches
+        if not ((start_date and batch[:7] < start_date[:7]) or (end_date and batch[:7] > end_date[:7]))
+    ]
+    rows = []
+    for batch in batches:
+        try:
+            rows.extend(row for row in _read_batch(os.path.join(_appointments_dir(), batch)) if row[column] == value)
+        except FileNotFoundError:
+            # Índice gravado por um lote que caiu antes do rename
+            continue
+    metrics.increment("archive.batches_read", len(batches))
+    return _sorted_unique(rows)
+
+
+def archive_applies(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    date_filter: Optional[str] = None,
+    keyed: bool = False
+) -> bool:
+    """Indica se o período pedido alcança a faixa arquivada.
+
+    Sem data inicial, só as consultas por paciente ou médico (``keyed``), que
+    usam os índices, leem o arquivo; as demais leem apenas a tabela.
+    """
+    cutoff = archive_cutoff()
+    if date_filter:
+        return date_filter < cutoff
+    if start_date:
+        return start_date < cutoff
+    return keyed
+
+
+def query_archive(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    date_filter: Optional[str] = None,
+    doctor_id: Optional[uuid.UUID] = None,
+    patient_id: Optional[uuid.UUID] = None,
+    status: Optional[str] = None
+) -> List[dict]:
+    """Agendamentos arquivados que atendem aos filtros, em ordem de data/hora."""
+    if date_filter:
+        start_date = max(start_date or date_filter, date_filter)
+        end_date = min(end_date or date_filter, date_filter)
+
+    doctor = str(doctor_id) if doctor_id else None
+    patient = str(patient_id) if patient_id else None
+    if patient or doctor:
+        column, value = ("patient_id", patient) if patient else ("doctor_id", doctor)
+        rows = _read_indexed(column, value, start_date, end_date)
+    else:
+        rows = (
+            row for month in _archived_months()
+            if not ((start_date and month < start_date[:7]) or (end_date and month > end_date[:7]))
+            for row in _read_month(month)
+        )
+    result = []
+    for row in rows:
+        if start_date and row["appointment_date"] < start_date:
+            continue
+        if end_date and row["appointment_date"] > end_date:
+            continue
+        if doctor and row["doctor_id"] != doctor:
+            continue
+        if patient and row["patient_id"] != patient:
+            continue
+        if status and row["status"] != status:
+            continue
+        result.append(row)
+    return result
+
+
+def hydrate(db, rows: List[dict]) -> List[dict]:
+    """Anexa paciente, médico, sala e tipo às linhas arquivadas.
+
+    Cadastros removidos depois do arquivamento ficam ``None``: a página não
+    encolhe e continua de acordo com ``X-Total-Count``.
+    """
+    def load(model, ids, *options):
+        ids = {uuid.UUID(value) for value in ids if value}
+        if not ids:
+            return {}
+        query = db.query(model).options(*options).filter(model.id.in_(ids))
+        return {str(item.id): item for item in query.all()}
+
+    patients = load(Patient, (row["patient_id"] for row in rows), selectinload(Patient.insurance_plan))
+    doctors = load(Doctor, (row["doctor_id"] for row in rows))
+    rooms = load(ClinicRoom, (row["room_id"] for row in rows))
+    types = load(AppointmentType, (row["appointment_type_id"] for row in rows))
+
+    return [{
+        **row,
+        "patient": patients.get(row["patient_id"]),
+        "doctor": doctors.get(row["doctor_id"]),
+        "room": rooms.get(row["room_id"]) if row["room_id"] else None,
+        "appointment_type": types.get(row["appointment_type_id"]),
+    } for row in rows]
+
+
+jobs.register_job("appointment_archive", ARCHIVE_INTERVAL, archive_old_appointments, singleton=True)
@@ -0,0 +1,195 @@
+"""Trilha de auditoria das alterações em pacientes e agendamentos (LGPD).
+
+As rotas de escrita dos routers de pacientes e agendamentos usam
+``get_audited_db``, que marca a sessão com o usuário autenticado. Um listener
+``after_flush`` registra, para cada paciente ou agendamento inserido, alterado
+ou removido, os campos com ``[antes, depois]``. Os registros ficam na sessão
+até o ``commit`` (um ``rollback`` os descarta) e então vão para um buffer em
+memória, sem nenhum INSERT extra na requisição.
+
+A tarefa ``audit_flush`` grava o buffer a cada ``AUDIT_FLUSH_INTERVAL``
+segundos em INSERTs de várias linhas (``AUDIT_BATCH_SIZE`` por comando). O
+encerramento do worker grava o que restou. Se o buffer passar de
+``AUDIT_BUFFER_MAX`` registros, o próprio commit grava um lote (só um, e só se
+nenhuma gravação estiver em andamento), em vez de descartar registros. Em caso
+de falha do banco os registros voltam ao buffer e os commits só tentam de novo
+depois de ``AUDIT_RETRY_SECONDS``; a tarefa segue no seu intervalo.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import date, datetime, timezone
+from typing import Deque, List, Optional
+
+from fastapi import Depends
+from sqlalchemy import event, inspect as sa_inspect, insert
+from sqlalchemy.orm import Session
+
+import jobs
+import metrics
+from auth import get_current_active_user
+from database import SessionLocal, get_db
+from models import Appointment, AuditLog, Patient, User
+
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "2"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_BUFFER_MAX = int(os.getenv("AUDIT_BUFFER_MAX", "10000"))
+AUDIT_RETRY_SECONDS = float(os.getenv("AUDIT_RETRY_SECONDS", "5"))
+
+AUDITED_MODELS = (Patient, Appointment)
+# Colunas mantidas pelo próprio sistema, sem valor para a auditoria
+IGNORED_COLUMNS = {"updated_at", "row_version"}
+
+_buffer: Deque[dict] = deque()
+_flush_lock = threading.Lock()
+# Antes deste instante (time.monotonic) o commit não grava: o banco acabou de falhar
+_retry_at = 0.0
+
+
+async def get_audited_db(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Session:
+    """Sessão do primário cujas alterações são auditadas em nome do usuário."""
+    db.info["audit_user"] = (current_user.id, current_user.email)
+    return db
+
+
+def _jsonable(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _columns(obj):
+    return [attr for attr in sa_inspect(obj.__class__).column_attrs if attr.key not in IGNORED_COLUMNS]
+
+
+def _changes(obj, action: str) -> dict:
+    state = sa_inspect(obj)
+    changes = {}
+    for attr in _columns(obj):
+        history = state.attrs[attr.key].history
+        if action == "insert":
+            # Só o que já está carregado: valores gerados pelo banco exigiriam um SELECT
+            value = state.dict.get(attr.key)
+            if value is not None:
+                changes[attr.key] = [None, _jsonable(value)]
+        elif action == "delete":
+            # Valor carregado do banco (pode estar expirado depois de um commit)
+            value = (history.unchanged or history.deleted or [state.dict.get(attr.key)])[0]
+            changes[attr.key] = [_jsonable(value), None]
+        elif history.has_changes():
+            before = history.deleted[0] if history.deleted else None
+            after = history.added[0] if history.added else None
+            if before != after:
+                changes[attr.key] = [_jsonable(before), _jsonable(after)]
+    return changes
+
+
+@event.listens_for(Session, "after_flush")
+def _capture(session, flush_context):
+    user = session.info.get("audit_user")
+    if user is None:
+        return
+    user_id, user_email = user
+    now = datetime.now(timezone.utc)
+    pending = session.info.setdefault("audit_pending", [])
+    for action, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            if not isinstance(obj, AUDITED_MODELS):
+                continue
+            changes = _changes(obj, action)
+            if not changes:
+                continue
+            pending.append({
+                "table_name": obj.__tablename__,
+                "row_id": str(obj.id),
+                "action": action,
+                "user_id": user_id,
+                "user_email": user_email,
+                "changes": changes,
+                "changed_at": now,
+            })
+
+
+def record(db: Session, model, row_id, action: str, changes: dict) -> None:
+    """Registra uma alteração feita fora do ORM (``UPDATE`` em lote), com o mesmo destino."""
+    user = db.info.get("audit_user")
+    if user is None or not changes:
+        return
+    db.info.setdefault("audit_pending", []).append({
+        "table_name": model.__tablename__,
+        "row_id": str(row_id),
+        "action": action,
+        "user_id": user[0],
+        "user_email": user[1],
+        "changes": changes,
+        "changed_at": datetime.now(timezone.utc),
+    })
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue(session):
+    pending = session.info.pop("audit_pending", None)
+    if not pending:
+        return
+    _buffer.extend(pending)
+    metrics.increment("audit.captured", len(pending))
+    if len(_buffer) > AUDIT_BUFFER_MAX:
+        # Pressão de volta em vez de perder registros, limitada a um lote por commit
+        metrics.increment("audit.buffer_full")
+        if time.monotonic() >= _retry_at:
+            flush(max_batches=1, wait=False)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("audit_pending", None)
+
+
+def pending_count() -> int:
+    return len(_buffer)
+
+
+def flush(max_batches: Optional[int] = None, wait: bool = True) -> int:
+    """Grava o buffer em lotes de ``AUDIT_BATCH_SIZE``; retorna quantos registros gravou.
+
+    ``max_batches`` limita os lotes desta chamada; com ``wait=False`` ela
+    desiste se outra gravação já estiver em andamento.
+    """
+    global _retry_at
+    written, batches = 0, 0
+    if not _flush_lock.acquire(blocking=wait):
+        return 0
+    try:
+        while _buffer and (max_batches is None or batches < max_batches):
+            batch: List[dict] = []
+            while _buffer and len(batch) < AUDIT_BATCH_SIZE:
+                batch.append(_buffer.popleft())
+            started = time.perf_counter()
+            try:
+                with SessionLocal() as db:
+                    db.execute(insert(AuditLog).values(batch))
+                    db.commit()
+            except Exception as e:
+                _buffer.extendleft(reversed(batch))
+                _retry_at = time.monotonic() + AUDIT_RETRY_SECONDS
+                metrics.increment("audit.flush_errors")
+                print(f"[AUDIT] Erro ao gravar {len(batch)} registros (mantidos no buffer): {e}")
+                break
+            written += len(batch)
+            batches += 1
+            metrics.increment("audit.written", len(batch))
+            metrics.observe("audit.flush", time.perf_counter() - started)
+    finally:
+        _flush_lock.release()
+    return written
+
+
+metrics.register_gauge("audit.buffered", pending_count)
+jobs.register_job("audit_flush", AUDIT_FLUSH_INTERVAL, flush)
@@ -1,16 +1,20 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import delete, or_, select, update
 from sqlalchemy.orm import Session
 import os
 import secrets
 import hashlib
+import uuid
 from dotenv import load_dotenv
 
-from database import get_db
+import jobs
+import metrics
+import password_hashing
+from database import SessionLocal, engine, get_read_db
 from models import User, PasswordResetToken
 from schemas import User as UserSchema
 
@@ -21,19 +25,20 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Configuração de hash de senha
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Limpeza dos tokens de recuperação de senha expirados ou usados
+RESET_TOKEN_SWEEP_INTERVAL = int(os.getenv("RESET_TOKEN_SWEEP_INTERVAL", "3600"))
+RESET_TOKEN_SWEEP_BATCH_SIZE = int(os.getenv("RESET_TOKEN_SWEEP_BATCH_SIZE", "1000"))
 
 # Security scheme
 security = HTTPBearer()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica se a senha está correta."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hashing.verify_and_update(plain_password, hashed_password)[0]
 
 def get_password_hash(password: str) -> str:
     """Gera hash da senha."""
-    return pwd_context.hash(password)
+    return password_hashing.hash_password(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Cria token JWT."""
@@ -62,9 +67,17 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     """Autentica usuário com email e senha."""
     user = db.query(User).filter(User.email == email).first()
     if not user:
+        # Mesmo custo de uma senha errada: o tempo não revela se o email existe
+        password_hashing.dummy_verify()
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = password_hashing.verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # Hash com esquema ou custo diferente do configurado
+        user.hashed_password = new_hash
+        db.commit()
+        metrics.increment("auth.rehash")
     return user
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
@@ -86,7 +99,7 @@ def create_user(db: Session, email: str, password: str, full_name: str) -> User:
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> User:
     """Dependency para obter usuário atual autenticado."""
     credentials_exception = HTTPException(
@@ -103,7 +116,13 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
+    # Em rotas de escrita ``db`` é a sessão do primário da própria requisição
     user = get_user_by_email(db, email=email)
+    if user is None and db.info.get("replica"):
+        # Usuário recém-criado que a réplica ainda não recebeu
+        metrics.increment("db.replica.auth_fallbacks")
+        with SessionLocal() as primary:
+            user = get_user_by_email(primary, email=email)
     if user is None:
         raise credentials_exception
     
@@ -115,6 +134,12 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_current_superuser(current_user: User = Depends(get_current_active_user)) -> User:
+    """Dependency para rotas administrativas."""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return current_user
+
 # Funções de recuperação de senha
 def generate_reset_token() -> str:
     """Gera um token seguro para recuperação de senha."""
@@ -162,16 +187,46 @@ def validate_reset_token(db: Session, token: str) -> Optional[PasswordResetToken
     
     return reset_token
 
+def consume_reset_token(db: Session, token: str) -> Optional[uuid.UUID]:
+    """Marca o token como usado, se válido, e retorna o id do usuário.
+
+    Um único UPDATE ... RETURNING: duas requisições com o mesmo token não
+    conseguem consumi-lo ambas. Não faz commit; a troca de senha o faz.
+    """
+    return db.execute(
+        update(PasswordResetToken)
+        .where(
+            PasswordResetToken.token_hash == hash_token(token),
+            PasswordResetToken.used == False,
+            PasswordResetToken.expires_at > datetime.utcnow()
+        )
+        .values(used=True)
+        .returning(PasswordResetToken.user_id)
+    ).scalar()
+
 def use_reset_token(db: Session, token: str) -> bool:
     """Marca um token de recuperação como usado."""
-    reset_token = validate_reset_token(db, token)
-    if not reset_token:
+    if consume_reset_token(db, token) is None:
         return False
-    
-    reset_token.used = True
     db.commit()
     return True
 
+def purge_reset_tokens(batch_size: int = RESET_TOKEN_SWEEP_BATCH_SIZE) -> int:
+    """Remove em lotes os tokens expirados ou já usados."""
+    total = 0
+    while True:
+        with engine.begin() as connection:
+            dead = select(PasswordResetToken.id).where(or_(
+                PasswordResetToken.expires_at <= datetime.utcnow(),
+                PasswordResetToken.used == True
+            )).limit(batch_size)
+            deleted = connection.execute(
+                delete(PasswordResetToken).where(PasswordResetToken.id.in_(dead.scalar_subquery()))
+            ).rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+
 def update_user_password(db: Session, user_id: str, new_password: str) -> bool:
     """Atualiza a senha do usuário."""
     user = db.query(User).filter(User.id == user_id).first()
@@ -181,4 +236,6 @@ def update_user_password(db: Session, user_id: str, new_password: str) -> bool:
     user.hashed_password = get_password_hash(new_password)
     user.updated_at = datetime.utcnow()
     db.commit()
-    return True
\ No newline at end of file
+    return True
+
+jobs.register_job("reset_token_sweep", RESET_TOKEN_SWEEP_INTERVAL, purge_reset_tokens, singleton=True)
@@ -0,0 +1,37 @@
+"""Busca em lote por ID, usada pelos endpoints ``POST /api/<recurso>/batch``.
+
+Resolve a lista inteira com uma única query ``IN``, devolve os registros na
+ordem pedida (IDs repetidos aparecem uma vez) e informa os IDs inexistentes.
+"""
+import os
+import uuid
+from typing import List, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "200"))
+
+
+def fetch_by_ids(db: Session, model, ids: List[uuid.UUID], *options) -> Tuple[list, List[uuid.UUID]]:
+    """Registros de ``model`` para ``ids``, na ordem pedida, e os IDs não encontrados."""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many IDs: at most {BATCH_MAX_IDS} per request"
+        )
+
+    found = {
+        str(item.id): item
+        for item in db.query(model).options(*options).filter(model.id.in_(ids)).all()
+    }
+
+    items, missing = [], []
+    for value in ids:
+        item = found.get(str(value))
+        if item is None:
+            missing.append(value)
+        else:
+            items.append(item)
+    return items, missing
@@ -0,0 +1,141 @@
+"""Teste de estresse de marcações concorrentes contra uma API em execução.
+
+Cria médicos, uma sala por médico, um paciente e um tipo de consulta e dispara
+``--concurrency`` tentativas simultâneas para cada horário, todas disputando
+o mesmo médico e a mesma sala. Ao final confere que nenhum médico ou sala
+ficou com agendamentos ativos sobrepostos e informa a vazão.
+
+Use vários workers para exercitar os locks entre processos:
+    uvicorn main:app --workers 4 --port 8000
+    python benchmarks/booking_stress.py --base-url http://localhost:8000 --doctors 5 --slots 16 --concurrency 8
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+PASSWORD = "Stress123!"
+
+
+def random_cpf() -> str:
+    digits = [random.randint(0, 9) for _ in range(9)]
+    for weights in (range(10, 1, -1), range(11, 1, -1)):
+        remainder = sum(d * w for d, w in zip(digits, weights)) % 11
+        digits.append(0 if remainder < 2 else 11 - remainder)
+    return "".join(map(str, digits))
+
+
+async def setup(client: httpx.AsyncClient, doctors: int):
+    email = f"stress-{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post("/api/auth/register", json={"email": email, "full_name": "Stress", "password": PASSWORD})
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    suffix = uuid.uuid4().hex[:6]
+    doctor_ids, room_ids = [], []
+    for index in range(doctors):
+        response = await client.post("/api/doctors/", json={
+            "first_name": "Stress", "last_name": str(index), "specialty": "Ortopedia",
+            "license_number": f"ST-{suffix}-{index}", "phone": "0", "email": f"doc-{suffix}-{index}@example.com",
+        })
+        response.raise_for_status()
+        doctor_ids.append(response.json()["id"])
+        response = await client.post("/api/clinic-rooms/", json={
+            "room_number": f"ST-{suffix}-{index}", "room_type": "consultorio", "capacity": "1",
+        })
+        response.raise_for_status()
+        room_ids.append(response.json()["id"])
+
+    response = await client.post("/api/patients/", json={
+        "first_name": "Stress", "last_name": "Paciente", "cpf": random_cpf(), "date_of_birth": "1990-01-01",
+        "phone": "0", "address": "-", "emergency_contact": "-", "emergency_phone": "0",
+    })
+    response.raise_for_status()
+    patient_id = response.json()["id"]
+
+    response = await client.post("/api/appointment-types/", json={"type_name": f"Stress {suffix}", "duration": "30"})
+    response.raise_for_status()
+    return doctor_ids, room_ids, patient_id, response.json()["id"]
+
+
+def find_overlaps(appointments, key: str):
+    """Pares de agendamentos ativos do mesmo recurso que se sobrepõem."""
+    by_resource = defaultdict(list)
+    for appointment in appointments:
+        if appointment["status"] in ("scheduled", "confirmed") and appointment.get(key):
+            start = datetime.strptime(appointment["appointment_time"], "%H:%M")
+            by_resource[appointment[key]].append((start, start + timedelta(minutes=30)))
+    overlaps = 0
+    for intervals in by_resource.values():
+        intervals.sort()
+        for (_, previous_end), (start, _) in zip(intervals, intervals[1:]):
+            if start < previous_end:
+                overlaps += 1
+    return overlaps
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--doctors", type=int, default=5)
+    parser.add_argument("--slots", type=int, default=16, help="horários de 30 min por médico")
+    parser.add_argument("--concurrency", type=int, default=8, help="tentativas simultâneas por horário")
+    parser.add_argument("--date", default="2031-03-03")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=200, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        doctor_ids, room_ids, patient_id, type_id = await setup(client, args.doctors)
+
+        latencies = []
+
+        async def book(doctor_id, room_id, slot):
+            # Horários desalinhados (08:00, 08:15, ...) também conflitam entre si
+            minutes = 8 * 60 + slot * 30 + random.choice((0, 0, 15))
+            body = {
+                "patient_id": patient_id, "doctor_id": doctor_id, "room_id": room_id,
+                "appointment_type_id": type_id, "appointment_date": args.date,
+                "appointment_time": f"{minutes // 60:02d}:{minutes % 60:02d}",
+            }
+            started = time.perf_counter()
+            response = await client.post("/api/appointments/", json=body)
+            latencies.append(time.perf_counter() - started)
+            return response.status_code
+
+        attempts = [
+            book(doctor_id, room_id, slot)
+            for doctor_id, room_id in zip(doctor_ids, room_ids)
+            for slot in range(args.slots)
+            for _ in range(args.concurrency)
+        ]
+        random.shuffle(attempts)
+
+        started = time.perf_counter()
+        results = Counter(await asyncio.gather(*attempts))
+        elapsed = time.perf_counter() - started
+
+        response = await client.get("/api/appointments/", params={"date_filter": args.date, "limit": 1000})
+        response.raise_for_status()
+        appointments = [a for a in response.json() if a["doctor_id"] in doctor_ids]
+
+    doctor_overlaps = find_overlaps(appointments, "doctor_id")
+    room_overlaps = find_overlaps(appointments, "room_id")
+    print(f"tentativas: {len(latencies)} em {elapsed:.2f}s ({len(latencies) / elapsed:.0f} req/s)")
+    print(f"respostas: {dict(results)}")
+    print(f"marcações: {results[201]} ({results[201] / elapsed:.0f}/s)")
+    print(f"latência: mediana {statistics.median(latencies) * 1000:.0f} ms, "
+          f"p95 {sorted(latencies)[int(len(latencies) * 0.95)] * 1000:.0f} ms")
+    print(f"sobreposições: médicos={doctor_overlaps} salas={room_overlaps}")
+    if doctor_overlaps or room_overlaps:
+        raise SystemExit("FALHA: agendamentos sobrepostos")
+    print("OK: nenhuma marcação dupla")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
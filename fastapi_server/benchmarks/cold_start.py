@@ -0,0 +1,86 @@
+"""Benchmark de cold start da API.
+
+Executa várias inicializações em processos novos e mede o tempo de import do
+``main`` e o tempo do lifespan (verificação de schema + aquecimento).
+
+Uso:
+    python benchmarks/cold_start.py --runs 10
+    python benchmarks/cold_start.py --importtime   # maiores módulos importados
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOOT_SCRIPT = """
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+async def boot():
+    async with main.lifespan(main.app):
+        pass
+
+asyncio.run(boot())
+t2 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "startup_ms": (t2 - t1) * 1000}))
+"""
+
+
+def run_once() -> dict:
+    started = subprocess.run(
+        [sys.executable, "-c", BOOT_SCRIPT],
+        cwd=SERVER_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(started.stdout.strip().splitlines()[-1])
+
+
+def print_importtime(top: int) -> None:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=SERVER_DIR,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative_us), int(self_us), module))
+    rows.sort(reverse=True)
+    print(f"{'cumulativo (ms)':>16} {'próprio (ms)':>13}  módulo")
+    for cumulative_us, self_us, module in rows[:top]:
+        print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>13.1f}  {module}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="lista os módulos mais lentos de importar")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.importtime:
+        print_importtime(args.top)
+        return
+
+    samples = [run_once() for _ in range(args.runs)]
+    for key in ("import_ms", "startup_ms"):
+        values = sorted(sample[key] for sample in samples)
+        print(
+            f"{key:>10}: mediana={statistics.median(values):.1f}ms "
+            f"min={values[0]:.1f}ms max={values[-1]:.1f}ms (n={len(values)})"
+        )
+
+
+if __name__ == "__main__":
+    main()
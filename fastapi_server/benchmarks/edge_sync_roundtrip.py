@@ -0,0 +1,197 @@
+"""Sincronização entre uma unidade e o central com dois bancos SQLite locais.
+
+Cria os dois bancos, cadastra médicos, salas e pacientes no central, faz a
+primeira sincronização (snapshot) e então simula um período offline em que os
+dois lados escrevem, incluindo:
+
+- a mesma ficha de paciente editada nos dois lados (vence a última escrita);
+- o mesmo médico marcado no mesmo horário nos dois lados (horário duplo);
+- uma remoção de agendamento na unidade.
+
+Depois da sincronização o script confere que os bancos convergiram (linhas e
+versões idênticas), que apenas uma das marcações duplas continua ativa e mostra
+o tamanho dos deltas comprimidos e o tempo de cada ciclo. Termina com código 1
+se algo divergir.
+
+    python benchmarks/edge_sync_roundtrip.py --appointments 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_directory = tempfile.TemporaryDirectory()
+# Os eventos e o db_limiter usam o engine padrão; ele aponta para o central
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory.name, 'central.db')}"
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import edge_sync  # noqa: E402
+from benchmarks.patient_queries import cpf  # noqa: E402
+from models import (  # noqa: E402
+    Appointment, AppointmentType, Base, ClinicRoom, Doctor, InsurancePlan, Patient
+)
+from sqlite_profile import build_sqlite_engine  # noqa: E402
+
+CONFLICT_DATE = "2030-03-04"
+CONFLICT_TIME = "10:00"
+# A marcação do central é a mais antiga e deve ser mantida
+CONFLICT_CREATED = (datetime(2030, 1, 1, 9, 0, tzinfo=timezone.utc), datetime(2030, 1, 1, 9, 5, tzinfo=timezone.utc))
+
+
+def make_node(name: str):
+    engine = build_sqlite_engine(f"sqlite:///{os.path.join(_directory.name, name + '.db')}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autoflush=False, info={"sync_node": name})
+
+
+def seed_central(factory, patients: int, doctors: int) -> None:
+    with factory() as db:
+        plan = InsurancePlan(plan_name="Plano Sync", provider="Sync", coverage_type="full")
+        db.add(plan)
+        db.add(ClinicRoom(room_number="S1", room_type="consultório", capacity="1"))
+        db.add(AppointmentType(type_name="Consulta", duration="30"))
+        for number in range(doctors):
+            db.add(Doctor(
+                first_name="Dr.", last_name=str(number), specialty="Ortopedia",
+                license_number=f"CRM{number:05d}", phone="11 3000-0000", email=f"dr{number}@sync.test",
+            ))
+        db.flush()
+        for number in range(patients):
+            db.add(Patient(
+                first_name="Paciente", last_name=str(number), cpf=cpf(number), date_of_birth="1980-01-01",
+                phone="11 90000-0000", address="Rua A, 1", emergency_contact="Contato",
+                emergency_phone="11 90000-0001", insurance_plan_id=plan.id,
+            ))
+        db.commit()
+
+
+def book(db, rng: random.Random, count: int, month: str) -> None:
+    """Marcações sem sobreposição: 24 horários por médico em cada dia do mês."""
+    doctors = db.query(Doctor).order_by(Doctor.license_number).all()
+    patients = db.query(Patient).all()
+    appointment_type = db.query(AppointmentType).first()
+    per_day = 24 * len(doctors)
+    for number in range(min(count, per_day * 28)):
+        slot = number % per_day
+        db.add(Appointment(
+            patient_id=rng.choice(patients).id,
+            doctor_id=doctors[slot // 24].id,
+            appointment_type_id=appointment_type.id,
+            appointment_date=f"{month}-{1 + number // per_day:02d}",
+            appointment_time=f"{7 + slot % 24 // 2:02d}:{slot % 2 * 30:02d}",
+            status="scheduled",
+            notes="x" * 80,
+        ))
+    db.commit()
+
+
+def double_book(db, doctor_id, patient_id, note: str, created_at: datetime) -> uuid.UUID:
+    appointment_type = db.query(AppointmentType).first()
+    appointment = Appointment(
+        patient_id=patient_id, doctor_id=doctor_id, appointment_type_id=appointment_type.id,
+        appointment_date=CONFLICT_DATE, appointment_time=CONFLICT_TIME, status="scheduled", notes=note,
+        # Explícito: o default do SQLite tem resolução de segundos e o empate seria decidido pelo id
+        created_at=created_at,
+    )
+    db.add(appointment)
+    db.commit()
+    return appointment.id
+
+
+def dump(factory) -> dict:
+    with factory() as db:
+        return {
+            model.__tablename__: {
+                str(row.id): {key: value for key, value in edge_sync.serialize_row(row).items()
+                              if key not in ("created_at", "updated_at")}
+                for row in db.query(model)
+            }
+            for model in edge_sync.SYNCED_MODELS
+        }
+
+
+def timed_sync(label: str, edge, transport) -> dict:
+    started = time.perf_counter()
+    result = edge_sync.sync_once(edge, transport)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {result['sent']:>7} {result['received']:>8} {result['bytes'] / 1024:>9.1f} "
+          f"{result['conflicts']:>9} {elapsed * 1000:>9.0f}")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--doctors", type=int, default=10)
+    parser.add_argument("--appointments", type=int, default=2000, help="marcações em cada lado enquanto offline")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    central = make_node("central")
+    edge = make_node("unidade")
+    transport = edge_sync.DatabaseTransport(central)
+
+    seed_central(central, args.patients, args.doctors)
+    print(f"{'ciclo':<22} {'enviados':>7} {'recebidos':>8} {'KiB gzip':>9} {'conflitos':>9} {'ms':>9}")
+    timed_sync("snapshot", edge, transport)
+
+    # Período offline: os dois lados escrevem
+    with central() as db:
+        book(db, rng, args.appointments, "2030-01")
+        doctor_id = db.query(Doctor.id).order_by(Doctor.license_number).limit(1).scalar()
+        patient_id = db.query(Patient.id).order_by(Patient.cpf).limit(1).scalar()
+        kept = double_book(db, doctor_id, patient_id, "central", CONFLICT_CREATED[0])
+    with edge() as db:
+        book(db, rng, args.appointments, "2030-02")
+        cancelled = double_book(db, doctor_id, patient_id, "unidade", CONFLICT_CREATED[1])
+        removed = db.query(Appointment).filter(Appointment.appointment_date.like("2030-02-%")).first()
+        removed_id = removed.id
+        db.delete(removed)
+        db.commit()
+
+    with edge() as db:
+        db.get(Patient, patient_id).phone = "11 99999-0001"
+        db.commit()
+    time.sleep(0.01)
+    with central() as db:
+        db.get(Patient, patient_id).phone = "11 99999-0002"
+        db.commit()
+
+    first = timed_sync("após offline", edge, transport)
+    timed_sync("sem alterações", edge, transport)
+
+    errors = []
+    central_rows, edge_rows = dump(central), dump(edge)
+    for table in central_rows:
+        if central_rows[table] != edge_rows[table]:
+            different = [key for key in central_rows[table].keys() | edge_rows[table].keys()
+                         if central_rows[table].get(key) != edge_rows[table].get(key)]
+            errors.append(f"{table}: {len(different)} linhas diferentes")
+    appointments = central_rows["appointments"]
+    if appointments[str(kept)]["status"] != "scheduled" or appointments[str(cancelled)]["status"] != "cancelled":
+        errors.append("horário duplo não resolvido a favor da primeira marcação")
+    if str(removed_id) in appointments:
+        errors.append("remoção da unidade não chegou ao central")
+    if central_rows["patients"][str(patient_id)]["phone"] != "11 99999-0002":
+        errors.append("edição mais recente do paciente não prevaleceu")
+    if first["conflicts"] != 1:
+        errors.append(f"esperado 1 horário duplo, encontrados {first['conflicts']}")
+
+    for table, rows in central_rows.items():
+        print(f"{table:<22} {len(rows):>7} linhas")
+    if errors:
+        for error in errors:
+            print(f"ERRO: {error}")
+        sys.exit(1)
+    print("bancos convergiram")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark do hash de senhas (password_hashing).
+
+Mede a latência de um hash e a vazão com um processo por núcleo, para os
+custos informados. Ajuda a escolher ``BCRYPT_ROUNDS``/``ARGON2_TIME_COST`` e a
+dimensionar ``RATE_LIMIT_HASH_CONCURRENCY``.
+
+    python benchmarks/password_hashing.py --bcrypt-rounds 10 11 12 --argon2-time-cost 2 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from password_hashing import HashSettings, build_context  # noqa: E402
+
+
+def hash_for(settings: HashSettings, seconds: float) -> int:
+    """Quantos hashes um processo faz em ``seconds``."""
+    context = build_context(settings)
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        context.hash("benchmark-password")
+        count += 1
+    return count
+
+
+def latency_ms(settings: HashSettings, runs: int) -> float:
+    context = build_context(settings)
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        context.hash("benchmark-password")
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bcrypt-rounds", type=int, nargs="*", default=[10, 12])
+    parser.add_argument("--argon2-time-cost", type=int, nargs="*", default=[2, 3])
+    parser.add_argument("--argon2-memory-cost", type=int, default=65536, help="KiB")
+    parser.add_argument("--argon2-parallelism", type=int, default=2)
+    parser.add_argument("--cores", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    cases = [HashSettings("bcrypt", bcrypt_rounds=rounds) for rounds in args.bcrypt_rounds]
+    cases += [
+        HashSettings(
+            "argon2",
+            argon2_time_cost=time_cost,
+            argon2_memory_cost=args.argon2_memory_cost,
+            argon2_parallelism=args.argon2_parallelism,
+        )
+        for time_cost in args.argon2_time_cost
+    ]
+
+    print(f"{args.cores} processos, {args.seconds:.0f}s por caso")
+    print(f"{'esquema':<28} {'latência':>10} {'hashes/s':>10} {'por núcleo':>11}")
+    with ProcessPoolExecutor(max_workers=args.cores) as pool:
+        for settings in cases:
+            if settings.scheme == "bcrypt":
+                label = f"bcrypt rounds={settings.bcrypt_rounds}"
+            else:
+                label = f"argon2id t={settings.argon2_time_cost} m={settings.argon2_memory_cost // 1024}MiB"
+            latency = latency_ms(settings, 3)
+            started = time.perf_counter()
+            counts = list(pool.map(hash_for, [settings] * args.cores, [args.seconds] * args.cores))
+            elapsed = time.perf_counter() - started
+            per_second = sum(counts) / elapsed
+            print(f"{label:<28} {latency:>8.0f}ms {per_second:>10.1f} {per_second / args.cores:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark da distribuição de salas (room_assignment.assign_rooms).
+
+Gera um dia com ``--appointments`` agendamentos sem sala (consultas de 30
+minutos, retornos de 20, exames de imagem de 60 que exigem sala de imagem com
+raio-x e procedimentos de 45 que exigem maca), ``--rooms`` salas de
+equipamentos variados e alguns agendamentos que já têm sala. Mede apenas o
+cálculo, sem banco de dados, e confere que nenhuma sala recebeu dois
+agendamentos sobrepostos nem agendamento incompatível. Termina com código 1 se
+encontrar algum. Meta: poucos milissegundos para 500 agendamentos.
+
+    python benchmarks/room_assignment.py --appointments 500 --rooms 25
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from room_assignment import Need, Room, assign_rooms, parse_equipment  # noqa: E402
+
+# (tipo de sala exigido, equipamentos exigidos, duração, peso)
+KINDS = [
+    (None, "", 30, 0.55),
+    (None, "", 20, 0.2),
+    ("imagem", "raio-x", 60, 0.1),
+    (None, "maca", 45, 0.15),
+]
+
+
+def synthetic_day(appointments: int, rooms: int, seed: int):
+    rng = random.Random(seed)
+    room_list = []
+    for number in range(rooms):
+        if number % 8 == 0:
+            room_list.append(Room(id=f"S{number}", room_number=f"{number:03d}", room_type="imagem",
+                                  equipment=parse_equipment("raio-x, maca")))
+        else:
+            equipment = "maca" if number % 3 == 0 else ("maca, ultrassom" if number % 5 == 0 else "")
+            room_list.append(Room(id=f"S{number}", room_number=f"{number:03d}", room_type="consultório",
+                                  equipment=parse_equipment(equipment)))
+
+    weights = [kind[3] for kind in KINDS]
+    needs = []
+    for number in range(appointments):
+        room_type, equipment, duration, _ = rng.choices(KINDS, weights)[0]
+        start = 7 * 60 + rng.randrange(0, 11 * 60 - duration, 10)
+        needs.append(Need(id=number, start=start, end=start + duration, room_type=room_type,
+                          equipment=parse_equipment(equipment)))
+
+    # Alguns agendamentos já chegam com sala
+    occupied = defaultdict(list)
+    for room in rng.sample(room_list, max(1, rooms // 5)):
+        start = 7 * 60 + rng.randrange(0, 10 * 60, 30)
+        occupied[room.id].append((start, start + 60))
+    return needs, room_list, occupied
+
+
+def check(needs, rooms, occupied, assignments) -> list:
+    errors = []
+    by_id = {need.id: need for need in needs}
+    room_by_id = {room.id: room for room in rooms}
+    schedule = defaultdict(list, {room_id: list(intervals) for room_id, intervals in occupied.items()})
+    for need_id, room_id in assignments.items():
+        need, room = by_id[need_id], room_by_id[room_id]
+        if need.room_type and room.room_type != need.room_type or not need.equipment <= room.equipment:
+            errors.append(f"agendamento {need_id} em sala incompatível {room.room_number}")
+        schedule[room_id].append((need.start, need.end))
+    for room_id, intervals in schedule.items():
+        intervals.sort()
+        for (_, first_end), (second_start, _) in zip(intervals, intervals[1:]):
+            if second_start < first_end:
+                errors.append(f"sala {room_by_id[room_id].room_number} com agendamentos sobrepostos")
+                break
+    return errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appointments", type=int, default=500)
+    parser.add_argument("--rooms", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    needs, rooms, occupied = synthetic_day(args.appointments, args.rooms, seed=1)
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        assignments, unassigned = assign_rooms(needs, rooms, occupied)
+        timings.append(time.perf_counter() - started)
+
+    print(f"{len(needs)} agendamentos, {len(rooms)} salas")
+    print(f"com sala: {len(assignments)}  sem sala compatível: {len(unassigned)}")
+    print(f"tempo: mediana {statistics.median(timings) * 1000:.2f} ms, máximo {max(timings) * 1000:.2f} ms")
+
+    errors = check(needs, rooms, occupied, assignments)
+    if errors:
+        for error in errors[:20]:
+            print(f"ERRO: {error}")
+        sys.exit(1)
+    print("nenhuma sala sobreposta ou incompatível")
+
+
+if __name__ == "__main__":
+    main()
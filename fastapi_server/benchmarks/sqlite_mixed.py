@@ -0,0 +1,152 @@
+"""Benchmark de leitura/escrita concorrente no SQLite.
+
+Compara o engine padrão do SQLAlchemy (journal em rollback, sem PRAGMAs, pool
+compartilhado por todas as threads) com o perfil de ``sqlite_profile`` (WAL,
+um escritor e um pool de leitores). ``--threads`` threads executam, durante
+``--seconds`` segundos, uma mistura de listagens de agendamentos do dia e
+marcações (``--write-ratio``), e o script mostra a vazão, a latência e os erros
+de ``database is locked``.
+
+    python benchmarks/sqlite_mixed.py --threads 8 --seconds 10 --write-ratio 0.2
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from sqlite_profile import build_engines  # noqa: E402
+
+SCHEMA = [
+    """CREATE TABLE appointments (
+        id CHAR(36) PRIMARY KEY,
+        doctor_id INTEGER NOT NULL,
+        appointment_date VARCHAR NOT NULL,
+        appointment_time VARCHAR NOT NULL,
+        status VARCHAR NOT NULL,
+        notes TEXT
+    )""",
+    "CREATE INDEX ix_appointments_doctor_date ON appointments (doctor_id, appointment_date)",
+]
+
+READ = text(
+    "SELECT id, appointment_time, status, notes FROM appointments "
+    "WHERE doctor_id = :doctor AND appointment_date = :day ORDER BY appointment_time"
+)
+WRITE = text(
+    "INSERT INTO appointments (id, doctor_id, appointment_date, appointment_time, status, notes) "
+    "VALUES (:id, :doctor, :day, :time, 'scheduled', :notes)"
+)
+
+
+def setup(path: str, rows: int, doctors: int, days: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    rng = random.Random(1)
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.exec_driver_sql(statement)
+        connection.execute(WRITE, [
+            {
+                "id": str(uuid.uuid4()),
+                "doctor": rng.randrange(doctors),
+                "day": f"2030-{1 + rng.randrange(days) // 28:02d}-{1 + rng.randrange(days) % 28:02d}",
+                "time": f"{8 + rng.randrange(10):02d}:{rng.choice(['00', '30'])}",
+                "notes": "x" * 200,
+            }
+            for _ in range(rows)
+        ])
+    engine.dispose()
+
+
+def run(writer, reader, threads: int, seconds: float, write_ratio: float, doctors: int, days: int):
+    """Executa a carga mista; ``writer``/``reader`` podem ser o mesmo engine."""
+    write_lock = threading.Lock() if writer is not reader else None
+    reads, writes, errors = [], [], [0]
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            params = {
+                "doctor": rng.randrange(doctors),
+                "day": f"2030-{1 + rng.randrange(days) // 28:02d}-{1 + rng.randrange(days) % 28:02d}",
+            }
+            started = time.perf_counter()
+            try:
+                if rng.random() < write_ratio:
+                    params.update(id=str(uuid.uuid4()), time="12:00", notes="y" * 200)
+                    # O perfil serializa as escritas do processo, como o db_limiter faz na API
+                    if write_lock:
+                        with write_lock, writer.begin() as connection:
+                            connection.execute(WRITE, params)
+                    else:
+                        with writer.begin() as connection:
+                            connection.execute(WRITE, params)
+                    writes.append(time.perf_counter() - started)
+                else:
+                    with reader.connect() as connection:
+                        connection.execute(READ, params).fetchall()
+                    reads.append(time.perf_counter() - started)
+            except OperationalError:
+                errors[0] += 1
+
+    pool = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return reads, writes, errors[0]
+
+
+def report(label: str, seconds: float, reads, writes, errors: int) -> None:
+    def p99(values):
+        return sorted(values)[int(len(values) * 0.99)] * 1000 if values else 0.0
+
+    total = len(reads) + len(writes)
+    print(
+        f"{label:<10} {total / seconds:>9.0f} {len(reads) / seconds:>9.0f} {len(writes) / seconds:>9.0f} "
+        f"{statistics.median(reads) * 1000 if reads else 0:>9.2f} {p99(reads):>9.2f} "
+        f"{statistics.median(writes) * 1000 if writes else 0:>9.2f} {p99(writes):>9.2f} {errors:>7}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads, {args.seconds:.0f}s, {args.write_ratio:.0%} escritas, {args.rows} linhas")
+    print(f"{'engine':<10} {'ops/s':>9} {'leit/s':>9} {'escr/s':>9} "
+          f"{'leit p50':>9} {'leit p99':>9} {'escr p50':>9} {'escr p99':>9} {'erros':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label in ("padrão", "perfil"):
+            path = os.path.join(directory, f"{label}.db")
+            setup(path, args.rows, args.doctors, args.days)
+            url = f"sqlite:///{path}"
+            if label == "padrão":
+                writer = reader = create_engine(url, pool_size=args.threads, connect_args={"check_same_thread": False})
+            else:
+                writer, reader = build_engines(url)
+            reads, writes, errors = run(writer, reader, args.threads, args.seconds, args.write_ratio,
+                                        args.doctors, args.days)
+            report(label, args.seconds, reads, writes, errors)
+            writer.dispose()
+            reader.dispose()
+
+
+if __name__ == "__main__":
+    main()
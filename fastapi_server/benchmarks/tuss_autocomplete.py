@@ -0,0 +1,99 @@
+"""Benchmark da leitura do catálogo TUSS e do autocomplete em memória.
+
+Gera um catálogo sintético no formato da ANS (zip com CSV ``;`` em cp1252,
+linha de título antes do cabeçalho), mede a leitura em streaming
+(``tuss.iter_rows``), a montagem do índice e a latência das buscas.
+Meta: p99 abaixo de 5 ms.
+
+    python benchmarks/tuss_autocomplete.py --procedures 6000
+    python benchmarks/tuss_autocomplete.py --write /tmp/TUSS.zip   # só gera o arquivo
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tuss import PrefixIndex, iter_rows  # noqa: E402
+
+WORDS = [
+    "artroscopia", "joelho", "ombro", "quadril", "tornozelo", "punho", "cotovelo", "coluna", "lombar",
+    "cervical", "fratura", "redução", "incruenta", "cirúrgica", "osteotomia", "artroplastia", "total",
+    "parcial", "revisão", "ligamento", "cruzado", "anterior", "menisco", "sutura", "tendão", "reparo",
+    "infiltração", "bloqueio", "consulta", "ortopédica", "radiografia", "ressonância", "tomografia",
+    "ultrassonografia", "fisioterapia", "imobilização", "gessada", "tração", "enxerto", "ósseo", "fixação",
+    "externa", "interna", "placa", "parafuso", "haste", "intramedular", "descompressão", "neurólise",
+    "túnel", "carpo", "tarso", "hálux", "valgo", "luxação", "recidivante", "sinovectomia", "biópsia",
+]
+
+
+def synthetic_catalog(path: str, procedures: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    buffer = io.StringIO()
+    buffer.write("Tabela 22 - Procedimentos e eventos em saúde\n")
+    buffer.write("Código do Termo;Termo;Data de início de vigência;Data de fim de vigência\n")
+    codes = rng.sample(range(10000000, 99999999), procedures)
+    for code in sorted(codes):
+        description = " ".join(rng.sample(WORDS, rng.randint(3, 8))).capitalize()
+        valid_until = "31/12/2020" if rng.random() < 0.05 else ""
+        buffer.write(f"{code};{description};01/01/2014;{valid_until}\n")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("Tabela 22 - Procedimentos.csv", buffer.getvalue().encode("cp1252"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procedures", type=int, default=6000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--write", help="apenas gera o catálogo sintético neste caminho")
+    args = parser.parse_args()
+
+    if args.write:
+        synthetic_catalog(args.write, args.procedures)
+        print(f"Catálogo sintético com {args.procedures} procedimentos em {args.write}")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "TUSS.zip")
+        synthetic_catalog(path, args.procedures)
+
+        started = time.perf_counter()
+        rows = [(row.code, row.description, row.valid_until) for row in iter_rows(path)]
+        parse_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = PrefixIndex(1, rows)
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(7)
+    queries = []
+    for _ in range(args.queries):
+        kind = rng.random()
+        if kind < 0.2:
+            queries.append(rng.choice(rows)[0][:rng.randint(2, 6)])
+        elif kind < 0.7:
+            queries.append(rng.choice(WORDS)[:rng.randint(2, 6)])
+        else:
+            queries.append(" ".join(word[:rng.randint(3, 6)] for word in rng.sample(WORDS, 2)))
+
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, 20)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    print(f"leitura: {len(rows)} procedimentos em {parse_seconds * 1000:.0f} ms")
+    print(f"índice: {len(index.words)} palavras em {build_seconds * 1000:.0f} ms")
+    print(f"busca: mediana {statistics.median(timings):.3f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99)]:.3f} ms, máx {timings[-1]:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
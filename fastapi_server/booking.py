@@ -0,0 +1,198 @@
+"""Serialização das marcações por (médico, data) e (sala, data).
+
+A verificação de conflito e a gravação de um agendamento acontecem com a
+agenda do dia travada, para que duas recepcionistas não marquem o mesmo
+horário ao mesmo tempo. Agendas diferentes não se bloqueiam.
+
+- PostgreSQL: ``pg_try_advisory_xact_lock`` por chave, em ordem fixa (sem
+  deadlock entre médico e sala), liberado no commit/rollback. A espera é feita
+  com ``asyncio.sleep`` para não bloquear o event loop do worker.
+- Outros bancos (SQLite): upsert de uma linha por chave em ``booking_locks``.
+  No SQLite isso toma o lock de escrita do banco, serializando as marcações.
+
+Falhas transitórias (deadlock, serialização, banco travado) são repetidas até
+``BOOKING_MAX_RETRIES`` vezes.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from fastapi import HTTPException, status
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import metrics
+from models import Appointment, BookingLock
+
+BOOKING_LOCK_TIMEOUT = float(os.getenv("BOOKING_LOCK_TIMEOUT", "5"))
+BOOKING_MAX_RETRIES = int(os.getenv("BOOKING_MAX_RETRIES", "3"))
+
+# Status que ocupam o horário
+ACTIVE_STATUSES = ("scheduled", "confirmed")
+DEFAULT_DURATION_MINUTES = 30
+DEFAULT_DURATION = timedelta(minutes=DEFAULT_DURATION_MINUTES)
+
+# SQLSTATE de falhas que podem ser repetidas (deadlock, serialização, lock)
+RETRYABLE_PGCODES = {"40P01", "40001", "55P03"}
+
+T = TypeVar("T")
+
+
+def schedule_keys(doctor_id, room_id, appointment_date: str) -> List[str]:
+    keys = [f"doctor:{doctor_id}:{appointment_date}"]
+    if room_id:
+        keys.append(f"room:{room_id}:{appointment_date}")
+    return sorted(keys)
+
+
+def _advisory_key(key: str) -> int:
+    digest = hashlib.blake2b(f"booking:{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+async def lock_schedules(db: Session, doctor_id, room_id, appointment_date: str) -> None:
+    """Trava as agendas do médico e da sala na data até o fim da transação."""
+    started = time.perf_counter()
+    keys = schedule_keys(doctor_id, room_id, appointment_date)
+
+    if db.get_bind().dialect.name == "postgresql":
+        deadline = time.monotonic() + BOOKING_LOCK_TIMEOUT
+        delay = 0.005
+        for key in keys:
+            while not db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _advisory_key(key)}
+            ).scalar():
+                if time.monotonic() >= deadline:
+                    metrics.increment("booking.lock_timeouts")
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Schedule is busy, try again",
+                        headers={"Retry-After": "1"},
+                    )
+                metrics.increment("booking.lock_waits")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.1)
+    else:
+        _lock_rows(db, keys)
+
+    metrics.observe("booking.lock", time.perf_counter() - started)
+
+
+def lock_keys_blocking(db: Session, keys: List[str]) -> None:
+    """Trava chaves de ``schedule_keys`` esperando na thread (tarefas fora do event loop).
+
+    As chaves são travadas em ordem para não haver deadlock com outras marcações.
+    """
+    keys = sorted(set(keys))
+    if db.get_bind().dialect.name == "postgresql":
+        for key in keys:
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _advisory_key(key)})
+    else:
+        _lock_rows(db, keys)
+
+
+def _lock_rows(db: Session, keys: List[str]) -> None:
+    from sqlalchemy.dialects.sqlite import insert
+
+    now = datetime.now(timezone.utc)
+    for key in keys:
+        statement = insert(BookingLock).values(key=key, locked_at=now)
+        db.execute(statement.on_conflict_do_update(index_elements=["key"], set_={"locked_at": now}))
+
+
+def find_conflict(
+    db: Session,
+    column,
+    resource_id,
+    appointment_date: str,
+    appointment_time: str,
+    exclude_id=None
+) -> Optional[Appointment]:
+    """Agendamento ativo do recurso que se sobrepõe ao horário (30 minutos)."""
+    query = db.query(Appointment).filter(
+        column == resource_id,
+        Appointment.appointment_date == appointment_date,
+        Appointment.status.in_(ACTIVE_STATUSES)
+    )
+    if exclude_id is not None:
+        query = query.filter(Appointment.id != exclude_id)
+
+    for existing in query.all():
+        if overlaps(appointment_time, existing.appointment_time):
+            return existing
+    return None
+
+
+def parse_duration(value: Optional[str]) -> int:
+    """Duração em minutos do tipo de consulta ("30", "45 min", ...)."""
+    match = re.match(r"\s*(\d+)", value or "")
+    return int(match.group(1)) if match and int(match.group(1)) > 0 else DEFAULT_DURATION_MINUTES
+
+
+def overlaps(first_time: str, second_time: str) -> bool:
+    """Dois horários (HH:MM) de ``DEFAULT_DURATION`` se sobrepõem."""
+    first_start = datetime.strptime(first_time, "%H:%M")
+    second_start = datetime.strptime(second_time, "%H:%M")
+    return first_start < second_start + DEFAULT_DURATION and first_start + DEFAULT_DURATION > second_start
+
+
+def ensure_available(
+    db: Session,
+    doctor_id,
+    room_id,
+    appointment_date: str,
+    appointment_time: str,
+    exclude_id=None
+) -> None:
+    """Levanta 400 se o médico ou a sala já estiverem ocupados no horário."""
+    existing = find_conflict(db, Appointment.doctor_id, doctor_id, appointment_date, appointment_time, exclude_id)
+    if existing:
+        existing_end = datetime.strptime(existing.appointment_time, "%H:%M") + DEFAULT_DURATION
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Doctor already has an appointment from {existing.appointment_time} to {existing_end.strftime('%H:%M')} on this date"
+        )
+
+    if room_id:
+        existing = find_conflict(db, Appointment.room_id, room_id, appointment_date, appointment_time, exclude_id)
+        if existing:
+            existing_end = datetime.strptime(existing.appointment_time, "%H:%M") + DEFAULT_DURATION
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Room is already booked from {existing.appointment_time} to {existing_end.strftime('%H:%M')} on this date"
+            )
+
+
+def _is_retryable(error: OperationalError) -> bool:
+    pgcode = getattr(error.orig, "pgcode", None)
+    if pgcode:
+        return pgcode in RETRYABLE_PGCODES
+    return "database is locked" in str(error.orig)
+
+
+async def run_with_retries(db: Session, attempt: Callable[[], Awaitable[T]]) -> T:
+    """Executa ``attempt`` (trava, verifica, grava e faz commit) com novas tentativas."""
+    for number in range(BOOKING_MAX_RETRIES + 1):
+        try:
+            result = await attempt()
+            metrics.increment("booking.committed")
+            return result
+        except OperationalError as e:
+            db.rollback()
+            if not _is_retryable(e):
+                raise
+            if number == BOOKING_MAX_RETRIES:
+                metrics.increment("booking.retries_exhausted")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Schedule is busy, try again",
+                    headers={"Retry-After": "1"},
+                )
+            metrics.increment("booking.retries")
+            await asyncio.sleep(random.uniform(0.01, 0.05) * (2 ** number))
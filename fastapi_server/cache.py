@@ -0,0 +1,84 @@
+"""Caches em memória, por worker, para tabelas pequenas e pouco alteradas.
+
+Cada entrada expira após o TTL; as rotas que alteram os dados publicam a
+invalidação (``invalidation``), que remove a entrada em todos os workers.
+Os valores guardados são schemas Pydantic (não objetos do ORM, que pertencem
+a uma sessão).
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+import invalidation
+import metrics
+from models import InsurancePlan
+from schemas import InsurancePlan as InsurancePlanSchema
+
+INSURANCE_PLAN_CACHE_TTL = float(os.getenv("INSURANCE_PLAN_CACHE_TTL", "60"))
+INSURANCE_PLAN_CACHE_SIZE = int(os.getenv("INSURANCE_PLAN_CACHE_SIZE", "1024"))
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """LRU com expiração; resultados ``None`` não são guardados."""
+
+    def __init__(self, name: str, ttl: float, max_entries: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.register_gauge(f"cache.{name}.size", lambda: len(self._entries))
+
+    def get(self, key: Hashable, loader: Callable[[], Optional[V]]) -> Optional[V]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                metrics.increment(f"cache.{self.name}.hits")
+                return entry[1]
+
+        metrics.increment(f"cache.{self.name}.misses")
+        value = loader()
+        if value is not None:
+            with self._lock:
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+insurance_plans: TTLCache[InsurancePlanSchema] = TTLCache(
+    "insurance_plans", INSURANCE_PLAN_CACHE_TTL, INSURANCE_PLAN_CACHE_SIZE
+)
+
+
+def get_insurance_plan(db: Session, plan_id: uuid.UUID) -> Optional[InsurancePlanSchema]:
+    """Plano de saúde pelo id, do cache ou do banco."""
+    def load() -> Optional[InsurancePlanSchema]:
+        plan = db.query(InsurancePlan).filter(InsurancePlan.id == plan_id).first()
+        return InsurancePlanSchema.model_validate(plan) if plan else None
+
+    return insurance_plans.get(plan_id, load)
+
+
+def _evict_insurance_plan(key: Optional[str]) -> None:
+    insurance_plans.invalidate(uuid.UUID(key) if key is not None else None)
+
+
+invalidation.register("insurance_plans", _evict_insurance_plan)
@@ -0,0 +1,153 @@
+"""Totais para as listagens paginadas (``X-Total-Count``).
+
+As rotas de listagem aceitam ``include_total=true`` e respondem com
+``X-Total-Count`` e ``X-Total-Count-Kind``, que indica como o total foi obtido:
+
+- ``exact``: ``COUNT(*)`` limitado a ``COUNT_EXACT_LIMIT + 1`` linhas, usado em
+  consultas filtradas (e tabelas pequenas), que normalmente retornam poucas linhas;
+- ``estimated``: estimativa do PostgreSQL, de ``pg_class.reltuples`` para a tabela
+  inteira ou do plano (``EXPLAIN``) para filtros que passam do limite;
+- ``cached``: contagem exata da tabela inteira (ou de um filtro fixo da
+  listagem, ``variant``) guardada por ``COUNT_CACHE_TTL`` segundos. Inserções e
+  remoções na tabela publicam a invalidação (``invalidation``), que descarta a
+  contagem em todos os workers; escritas fora do ORM chamam ``invalidate_table``.
+"""
+import json
+import os
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import Response
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+
+import invalidation
+from cache import TTLCache
+
+COUNT_EXACT_LIMIT = int(os.getenv("COUNT_EXACT_LIMIT", "10000"))
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+
+EXACT, ESTIMATED, CACHED = "exact", "estimated", "cached"
+
+# Tabelas das listagens com include_total: só as escritas nelas publicam invalidações
+COUNTED_TABLES = {"appointments", "appointment_types", "clinic_rooms", "doctors", "insurance_plans", "patients"}
+# Tabelas com variantes (ex.: só ativos), que também mudam com UPDATEs
+VARIANT_TABLES = {"doctors"}
+
+# (tabela, variante) -> contagem
+table_counts: TTLCache[int] = TTLCache("table_counts", COUNT_CACHE_TTL, 64)
+# Variantes já usadas por tabela, para descartar todas juntas
+_variants: Dict[str, Set[Optional[str]]] = {}
+
+# Tabelas particionadas (relkind 'p') não têm reltuples próprio: soma as partições
+RELTUPLES_SQL = text("""
+    SELECT CASE WHEN p.relkind = 'p' THEN (
+               SELECT sum(c.reltuples) FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+               WHERE i.inhparent = p.oid AND c.reltuples >= 0
+           ) ELSE p.reltuples END
+    FROM pg_class p
+    WHERE p.oid = to_regclass(:table)
+""")
+
+
+def _evict_table_counts(table: Optional[str]) -> None:
+    if table is None:
+        table_counts.invalidate()
+        return
+    for variant in _variants.get(table, {None}) | {None}:
+        table_counts.invalidate((table, variant))
+
+
+invalidation.register("table_counts", _evict_table_counts)
+
+
+def invalidate_table(db: Session, model) -> None:
+    """Descarta as contagens de ``model`` em todos os workers quando ``db`` fizer commit."""
+    published = db.info.setdefault("count_tables", set())
+    if model.__tablename__ not in published:
+        published.add(model.__tablename__)
+        invalidation.publish(db, "table_counts", model.__tablename__)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_written_tables(session, flush_context):
+    written = list(session.new) + list(session.deleted)
+    written += [obj for obj in session.dirty if getattr(obj, "__tablename__", None) in VARIANT_TABLES]
+    for obj in written:
+        if getattr(obj, "__tablename__", None) in COUNTED_TABLES:
+            invalidate_table(session, type(obj))
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset_published(session):
+    session.info.pop("count_tables", None)
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _table_estimate(db: Session, table: str) -> Optional[int]:
+    """``reltuples`` da tabela; ``None`` se nunca foi analisada."""
+    value = db.execute(RELTUPLES_SQL, {"table": table}).scalar()
+    return int(value) if value is not None and value >= 0 else None
+
+
+def _plan_estimate(db: Session, query) -> Optional[int]:
+    """Linhas estimadas pelo planejador para a consulta."""
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"]) if plan else None
+
+
+def _table_count(db: Session, query, model, variant: Optional[str]) -> Tuple[int, str]:
+    table = model.__tablename__
+    _variants.setdefault(table, {None}).add(variant)
+    computed = []
+
+    def load() -> int:
+        computed.append(True)
+        if variant is not None:
+            return query.count()
+        return db.query(func.count()).select_from(model).scalar()
+
+    total = table_counts.get((table, variant), load)
+    return total, EXACT if computed else CACHED
+
+
+def total_count(db: Session, query, model, filtered: bool, variant: Optional[str] = None) -> Tuple[int, str]:
+    """Total de linhas de ``query`` (sem offset/limit) e o tipo da contagem.
+
+    ``variant`` nomeia um filtro fixo da listagem (ex.: só ativos) cuja contagem
+    também é guardada; a tabela precisa estar em ``VARIANT_TABLES``.
+    """
+    query = query.enable_eagerloads(False).order_by(None)
+
+    if not filtered:
+        if variant is None and _is_postgres(db):
+            estimate = _table_estimate(db, model.__tablename__)
+            if estimate is not None and estimate > COUNT_EXACT_LIMIT:
+                return estimate, ESTIMATED
+        return _table_count(db, query, model, variant)
+
+    capped = db.query(func.count()).select_from(
+        query.limit(COUNT_EXACT_LIMIT + 1).subquery()
+    ).scalar()
+    if capped <= COUNT_EXACT_LIMIT:
+        return capped, EXACT
+    if _is_postgres(db):
+        estimate = _plan_estimate(db, query)
+        if estimate is not None:
+            return max(estimate, capped), ESTIMATED
+    return query.count(), EXACT
+
+
+def set_total_header(
+    response: Response, db: Session, query, model, filtered: bool, extra: int = 0, variant: Optional[str] = None
+) -> None:
+    """Preenche ``X-Total-Count``/``X-Total-Count-Kind``; ``extra`` soma linhas de fora da tabela."""
+    total, kind = total_count(db, query, model, filtered, variant)
+    response.headers["X-Total-Count"] = str(total + extra)
+    response.headers["X-Total-Count-Kind"] = kind
@@ -1,11 +1,11 @@
 import asyncio
-import bcrypt
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
 from models import User, Base
 import os
 from dotenv import load_dotenv
 import uuid
+from password_hashing import hash_password
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -20,12 +20,6 @@ DATABASE_URL = os.getenv(
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def hash_password(password: str) -> str:
-    """Hash da senha usando bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
-
 def create_demo_users():
     """Criar usuários de demonstração"""
     db = SessionLocal()
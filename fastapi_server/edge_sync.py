@@ -0,0 +1,705 @@
+"""Modo offline das unidades: réplica SQLite local sincronizada com o PostgreSQL central.
+
+Cada nó registra as próprias escritas nas tabelas sincronizadas em
+``sync_changes`` (listener ``before_flush``), com a versão da linha
+(``row_version``, incrementada a cada escrita local) e a origem. A unidade
+(``SYNC_ROLE=edge``) atende a recepção mesmo sem rede e, a cada
+``SYNC_INTERVAL`` segundos, quando o central responde:
+
+1. envia as alterações feitas localmente desde o último envio (``/api/sync/push``);
+2. recebe as alterações do central feitas por outros nós (``/api/sync/pull``).
+   A primeira recepção traz um snapshot das tabelas.
+
+Os deltas trafegam como JSON comprimido com gzip, com no máximo
+``SYNC_BATCH_SIZE`` registros do log por lote; várias escritas na mesma linha
+viram um único registro com a linha atual. O snapshot também vem em páginas,
+em ordem de (tabela, id), com o cursor do log tirado no início.
+
+No PostgreSQL o ``seq`` é dado no INSERT, não no commit: uma transação lenta
+pode confirmar um seq menor que outro já enviado. Por isso o central exporta
+pela ordem de (``txid``, ``seq``), onde ``txid`` é a transação que gravou o
+registro, e só os registros de transações anteriores à mais antiga ainda em
+andamento (``pg_snapshot_xmin``). O cursor fica ``<txid>:<seq>``. No SQLite
+as escritas são serializadas e o cursor é o próprio ``seq``.
+
+Conflitos são resolvidos da mesma forma em todos os nós: vence a maior chave
+(``row_version``, ``updated_at``, origem); uma remoção só é aplicada se a versão
+removida for pelo menos a local. Depois de aplicar agendamentos recebidos, o
+nó verifica de novo as agendas do médico e da sala: em caso de horário duplo,
+a marcação criada por último (``created_at``, ``id``) é cancelada como escrita
+local, o que propaga o cancelamento aos outros nós.
+
+Usuários, catálogo TUSS e estatísticas não são sincronizados: cada nó mantém os
+seus (as estatísticas acompanham os agendamentos aplicados). Remoções feitas
+pelo arquivamento (``archive.py``) não entram no log.
+
+    SYNC_ROLE=edge SYNC_NODE_ID=unidade-centro SYNC_CENTRAL_URL=https://central python edge_sync.py sync
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import DateTime, event, func, insert, inspect as sa_inspect, text, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+
+import booking
+import events
+import jobs
+import metrics
+import stats
+from database import SessionLocal
+from models import (
+    UUID, Appointment, AppointmentType, ClinicRoom, Doctor, InsurancePlan, Patient, SyncChange, SyncState
+)
+
+SYNC_ROLE = os.getenv("SYNC_ROLE", "off").lower()  # off | central | edge
+SYNC_NODE_ID = os.getenv("SYNC_NODE_ID", "central")
+SYNC_CENTRAL_URL = os.getenv("SYNC_CENTRAL_URL", "").rstrip("/")
+SYNC_TOKEN = os.getenv("SYNC_TOKEN", "")
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "60"))
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "500"))
+SYNC_TIMEOUT = float(os.getenv("SYNC_TIMEOUT", "30"))
+
+# Ordem das chaves estrangeiras: inserções nesta ordem, remoções na inversa
+SYNCED_MODELS = [InsurancePlan, Patient, Doctor, ClinicRoom, AppointmentType, Appointment]
+MODELS_BY_TABLE = {model.__tablename__: model for model in SYNCED_MODELS}
+TABLE_ORDER = {model.__tablename__: index for index, model in enumerate(SYNCED_MODELS)}
+
+# Linhas que não podem ser removidas enquanto alguém as referencia
+REFERENCES = {
+    "insurance_plans": [Patient.insurance_plan_id],
+    "patients": [Appointment.patient_id],
+    "doctors": [Appointment.doctor_id],
+    "clinic_rooms": [Appointment.room_id],
+    "appointment_types": [Appointment.appointment_type_id],
+}
+
+UPSERT, DELETE = "upsert", "delete"
+EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def node_id(db: Session) -> str:
+    """Identificador do nó; ``sync_node`` na sessão permite vários nós no mesmo processo."""
+    return db.info.get("sync_node", SYNC_NODE_ID)
+
+
+def _enabled(db: Session) -> bool:
+    return SYNC_ROLE != "off" or "sync_node" in db.info
+
+
+def _log(db: Session, obj, op: str, origin: str, now: datetime) -> None:
+    db.add(SyncChange(
+        table_name=obj.__tablename__,
+        row_id=str(obj.id),
+        op=op,
+        row_version=obj.row_version or 0,
+        origin=origin,
+        changed_at=now,
+    ))
+
+
+@event.listens_for(Session, "before_flush")
+def _log_changes(session, flush_context, instances):
+    if not _enabled(session):
+        return
+    # Alterações recebidas de outro nó chegam com versão e origem próprias
+    remote = session.info.get("sync_origin")
+    origin = remote or node_id(session)
+    now = datetime.now(timezone.utc)
+
+    for obj in list(session.new) + list(session.dirty):
+        if obj.__class__ not in SYNCED_MODELS:
+            continue
+        if obj not in session.new and not session.is_modified(obj):
+            continue
+        if obj.id is None:
+            obj.id = uuid.uuid4()
+        if remote is None:
+            obj.row_version = (obj.row_version or 0) + 1
+            obj.updated_at = now
+        _log(session, obj, UPSERT, origin, now)
+
+    for obj in list(session.deleted):
+        if obj.__class__ in SYNCED_MODELS:
+            _log(session, obj, DELETE, origin, now)
+
+
+def log_rows(db: Session, model, versions: List[tuple]) -> None:
+    """Registra escritas feitas fora do ORM (UPDATE em lote); ``versions`` traz (id, nova versão)."""
+    if not _enabled(db) or not versions:
+        return
+    now = datetime.now(timezone.utc)
+    origin = node_id(db)
+    db.execute(insert(SyncChange), [
+        {
+            "table_name": model.__tablename__,
+            "row_id": str(row_id),
+            "op": UPSERT,
+            "row_version": version,
+            "origin": origin,
+            "changed_at": now,
+        }
+        for row_id, version in versions
+    ])
+
+
+def _utc(value: Optional[datetime]) -> datetime:
+    """Datas do SQLite voltam sem fuso; todas são gravadas em UTC."""
+    if value is None:
+        return EPOCH
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def serialize_row(obj) -> dict:
+    data = {}
+    for attr in sa_inspect(obj.__class__).column_attrs:
+        value = getattr(obj, attr.key)
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        data[attr.key] = value
+    return data
+
+
+def _parse(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, UUID):
+        return uuid.UUID(value)
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def encode(delta: dict) -> bytes:
+    return gzip.compress(json.dumps(delta, separators=(",", ":")).encode())
+
+
+def decode(payload: bytes) -> dict:
+    return json.loads(gzip.decompress(payload))
+
+
+def _commit_horizon(db: Session) -> Optional[int]:
+    """Transação mais antiga ainda em andamento no PostgreSQL; ``None`` nos demais bancos."""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    return db.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")).scalar()
+
+
+def parse_cursor(cursor) -> tuple:
+    """(txid, seq) de um cursor ``<txid>:<seq>`` ou ``<seq>``; o seq sozinho vale txid 0."""
+    txid, _, seq = str(cursor or 0).rpartition(":")
+    return int(txid or 0), int(seq)
+
+
+def log_cursor(db: Session):
+    """Posição atual do log: tudo até ela já está visível nas tabelas."""
+    horizon = _commit_horizon(db)
+    if horizon is None:
+        return db.query(func.max(SyncChange.seq)).scalar() or 0
+    # Os registros do próprio horizonte (seq >= 1) ficam depois do cursor
+    return f"{horizon}:0"
+
+
+def export_changes(
+    db: Session,
+    after,
+    limit: int = SYNC_BATCH_SIZE,
+    only_origin: Optional[str] = None,
+    exclude_origin: Optional[str] = None
+) -> dict:
+    """Alterações do log depois do cursor ``after``, uma por linha, com a linha atual."""
+    horizon = _commit_horizon(db)
+    query = db.query(SyncChange)
+    if horizon is None:
+        query = query.filter(SyncChange.seq > parse_cursor(after)[1])
+        order = (SyncChange.seq,)
+    else:
+        # Registros de transações ainda abertas (ou posteriores a elas) esperam o próximo lote
+        query = query.filter(
+            SyncChange.txid < horizon,
+            tuple_(SyncChange.txid, SyncChange.seq) > tuple_(*parse_cursor(after))
+        )
+        order = (SyncChange.txid, SyncChange.seq)
+    if only_origin is not None:
+        query = query.filter(SyncChange.origin == only_origin)
+    if exclude_origin is not None:
+        query = query.filter(SyncChange.origin != exclude_origin)
+    entries = query.order_by(*order).limit(limit + 1).all()
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest: Dict[tuple, SyncChange] = {}
+    for entry in entries:
+        latest[(entry.table_name, entry.row_id)] = entry
+
+    changes = []
+    for model in SYNCED_MODELS:
+        ids = [row_id for table, row_id in latest if table == model.__tablename__]
+        if not ids:
+            continue
+        rows = {str(row.id): row for row in db.query(model).filter(model.id.in_(ids))}
+        for row_id in ids:
+            entry = latest[(model.__tablename__, row_id)]
+            row = rows.get(row_id)
+            change = {"table": model.__tablename__, "id": row_id, "origin": entry.origin}
+            if row is None:
+                change.update(op=DELETE, version=entry.row_version)
+            else:
+                change.update(op=UPSERT, version=row.row_version, data=serialize_row(row))
+            changes.append(change)
+
+    if not entries:
+        cursor = after
+    elif horizon is None:
+        cursor = entries[-1].seq
+    else:
+        cursor = f"{entries[-1].txid}:{entries[-1].seq}"
+    return {"node": node_id(db), "cursor": cursor, "more": more, "changes": changes}
+
+
+def export_snapshot(db: Session, cursor=None, position: Optional[str] = None, limit: int = SYNC_BATCH_SIZE) -> dict:
+    """Uma página do snapshot, em ordem de (tabela, id).
+
+    ``cursor`` é a posição do log no início do snapshot (tirada na primeira
+    página): escritas feitas enquanto as páginas são lidas chegam depois pelo
+    log. ``position`` (``<tabela>:<id>``) é a última linha já enviada.
+    """
+    if not position:
+        cursor = log_cursor(db)
+    table, _, last_id = (position or "").partition(":")
+    origin = node_id(db)
+    changes, more, last = [], False, None
+    for model in SYNCED_MODELS[TABLE_ORDER[table] if table else 0:]:
+        query = db.query(model)
+        if model.__tablename__ == table and last_id:
+            query = query.filter(model.id > uuid.UUID(last_id))
+        remaining = limit - len(changes)
+        rows = query.order_by(model.id).limit(remaining + 1).all()
+        if len(rows) > remaining:
+            more = True
+            rows = rows[:remaining]
+        for row in rows:
+            changes.append({
+                "table": model.__tablename__,
+                "id": str(row.id),
+                "origin": origin,
+                "op": UPSERT,
+                "version": row.row_version,
+                "data": serialize_row(row),
+            })
+            last = f"{model.__tablename__}:{row.id}"
+        if more:
+            break
+    return {"node": origin, "cursor": cursor, "more": more, "position": last if more else None, "changes": changes}
+
+
+def _row_origin(db: Session, table: str, row_id: str) -> str:
+    """Nó da última escrita registrada na linha."""
+    origin = db.query(SyncChange.origin).filter(
+        SyncChange.table_name == table,
+        SyncChange.row_id == row_id
+    ).order_by(SyncChange.seq.desc()).limit(1).scalar()
+    return origin or node_id(db)
+
+
+def _booking_order(appointment: Appointment) -> tuple:
+    return _utc(appointment.created_at), str(appointment.id)
+
+
+def _cancel_double_booking(db: Session, loser: Appointment, winner: Appointment) -> None:
+    stats_before = stats.appointment_key(loser)
+    event_before = events.snapshot(loser)
+    loser.status = "cancelled"
+    note = f"[SYNC] Cancelado por conflito de horário com o agendamento {winner.id}"
+    loser.notes = f"{loser.notes}\n{note}" if loser.notes else note
+    stats.record_change(db, stats_before, stats.appointment_key(loser))
+    events.publish(db, "cancelled", loser, event_before)
+    # A verificação da próxima agenda não pode enxergar a marcação cancelada como ativa
+    db.flush()
+    metrics.increment("sync.double_bookings")
+    print(f"[SYNC] Horário duplo: agendamento {loser.id} cancelado (mantido {winner.id})")
+
+
+def _resolve_double_bookings(db: Session, appointments: List[Appointment]) -> List[dict]:
+    """Cancela as marcações sobrepostas mais recentes nas agendas afetadas.
+
+    Cada agenda (médico ou sala, data) é lida uma vez; as marcações ativas são
+    percorridas da mais antiga para a mais nova, e a que se sobrepõe a uma já
+    mantida é cancelada.
+    """
+    schedules = set()
+    keys = []
+    for appointment in appointments:
+        if appointment.status not in booking.ACTIVE_STATUSES:
+            continue
+        schedules.add(("doctor_id", appointment.doctor_id, appointment.appointment_date))
+        if appointment.room_id is not None:
+            schedules.add(("room_id", appointment.room_id, appointment.appointment_date))
+        keys.extend(booking.schedule_keys(appointment.doctor_id, appointment.room_id, appointment.appointment_date))
+    if not schedules:
+        return []
+    booking.lock_keys_blocking(db, keys)
+
+    conflicts = []
+    for column_name, resource_id, appointment_date in sorted(schedules, key=str):
+        column = getattr(Appointment, column_name)
+        active = db.query(Appointment).filter(
+            column == resource_id,
+            Appointment.appointment_date == appointment_date,
+            Appointment.status.in_(booking.ACTIVE_STATUSES)
+        ).all()
+        kept: List[Appointment] = []
+        for appointment in sorted(active, key=_booking_order):
+            winner = next(
+                (other for other in kept if booking.overlaps(appointment.appointment_time, other.appointment_time)),
+                None
+            )
+            if winner is None:
+                kept.append(appointment)
+                continue
+            _cancel_double_booking(db, appointment, winner)
+            conflicts.append({"kept": str(winner.id), "cancelled": str(appointment.id)})
+    return conflicts
+
+
+def _load_rows(db: Session, changes: List[dict]) -> Dict[tuple, object]:
+    """Linhas locais das alterações recebidas, com uma consulta IN por tabela."""
+    rows = {}
+    for table, model in MODELS_BY_TABLE.items():
+        ids = [uuid.UUID(change["id"]) for change in changes if change["table"] == table]
+        for start in range(0, len(ids), SYNC_BATCH_SIZE):
+            for row in db.query(model).filter(model.id.in_(ids[start:start + SYNC_BATCH_SIZE])):
+                rows[(table, str(row.id))] = row
+    return rows
+
+
+def _local_wins(db: Session, change: dict, row, incoming_updated_at: datetime) -> Optional[bool]:
+    """Compara (versão, updated_at, origem); ``None`` quando são a mesma escrita."""
+    incoming = (change["version"], incoming_updated_at)
+    local = (row.row_version or 0, _utc(row.updated_at))
+    if incoming == local:
+        # Empate raro: a origem da última escrita decide; a consulta só é feita aqui
+        incoming += (change["origin"],)
+        local += (_row_origin(db, change["table"], change["id"]),)
+    if incoming == local:
+        return None
+    return local > incoming
+
+
+def apply_changes(db: Session, changes: List[dict], origin: str) -> dict:
+    """Aplica as alterações recebidas de ``origin`` (sem commit).
+
+    Retorna as contagens, os horários duplos resolvidos e, em ``rejected``, as
+    linhas em que a versão local venceu.
+    """
+    applied, skipped, rejected = 0, 0, []
+    touched: List[Appointment] = []
+    stat_deltas: Counter = Counter()
+    rows = _load_rows(db, changes)
+    db.info["sync_origin"] = origin
+    try:
+        upserts = sorted((c for c in changes if c["op"] == UPSERT), key=lambda c: TABLE_ORDER[c["table"]])
+        for change in upserts:
+            model = MODELS_BY_TABLE[change["table"]]
+            data = change["data"]
+            row = rows.get((change["table"], change["id"]))
+            if row is not None:
+                local_wins = _local_wins(
+                    db, change, row, _utc(_parse(model.__table__.c.updated_at, data.get("updated_at")))
+                )
+                if local_wins is not False:
+                    skipped += 1
+                    if local_wins:
+                        rejected.append(row)
+                    continue
+
+            is_appointment = model is Appointment
+            if is_appointment and row is not None:
+                stat_deltas[stats.appointment_key(row)] -= 1
+                event_before = events.snapshot(row)
+            else:
+                event_before = None
+            created = row is None
+            if created:
+                row = model()
+                db.add(row)
+            for attr in sa_inspect(model).column_attrs:
+                if attr.key in data:
+                    setattr(row, attr.key, _parse(attr.columns[0], data[attr.key]))
+            # Sem isso o onupdate de updated_at trocaria a data da escrita original
+            flag_modified(row, "updated_at")
+            if is_appointment:
+                stat_deltas[stats.appointment_key(row)] += 1
+                events.publish(db, "created" if created else "updated", row, event_before)
+                touched.append(row)
+            applied += 1
+
+        deletes = sorted(
+            (c for c in changes if c["op"] == DELETE), key=lambda c: TABLE_ORDER[c["table"]], reverse=True
+        )
+        for change in deletes:
+            row = rows.get((change["table"], change["id"]))
+            if row is None:
+                skipped += 1
+                continue
+            referenced = any(
+                db.query(column).filter(column == row.id).limit(1).first() is not None
+                for column in REFERENCES.get(change["table"], ())
+            )
+            if (row.row_version or 0) > change["version"] or referenced:
+                skipped += 1
+                rejected.append(row)
+                continue
+            if isinstance(row, Appointment):
+                stat_deltas[stats.appointment_key(row)] -= 1
+                events.publish(db, "cancelled", row)
+            db.delete(row)
+            applied += 1
+
+        # Um upsert por chave do agregado, em vez de dois por agendamento
+        for key, delta in stat_deltas.items():
+            if delta:
+                stats.apply_delta(db, key, delta)
+        db.flush()
+    finally:
+        db.info.pop("sync_origin", None)
+
+    # Cancelamentos por horário duplo são escritas deste nó
+    conflicts = _resolve_double_bookings(db, touched)
+    db.flush()
+    return {"applied": applied, "skipped": skipped, "conflicts": conflicts, "rejected": rejected}
+
+
+def get_state(db: Session, key: str) -> Optional[str]:
+    state = db.get(SyncState, key)
+    return state.value if state else None
+
+
+def set_state(db: Session, key: str, value) -> None:
+    db.merge(SyncState(key=key, value=str(value)))
+
+
+def clear_state(db: Session, key: str) -> None:
+    state = db.get(SyncState, key)
+    if state is not None:
+        db.delete(state)
+
+
+# Lado central
+
+
+def receive_push(db: Session, payload: bytes, node: str) -> dict:
+    """Aplica um lote enviado por uma unidade e faz commit."""
+    started = time.perf_counter()
+    delta = decode(payload)
+    result = apply_changes(db, delta["changes"], node)
+    # A unidade recebe de volta as linhas em que a versão do central venceu
+    now = datetime.now(timezone.utc)
+    for row in result.pop("rejected"):
+        if sa_inspect(row).deleted:
+            continue
+        _log(db, row, UPSERT, node_id(db), now)
+    db.commit()
+    metrics.increment("sync.received", len(delta["changes"]))
+    metrics.observe("sync.push", time.perf_counter() - started)
+    return {**result, "cursor": delta["cursor"]}
+
+
+def serve_pull(
+    db: Session,
+    node: str,
+    cursor,
+    limit: int = SYNC_BATCH_SIZE,
+    snapshot: bool = False,
+    position: Optional[str] = None
+) -> bytes:
+    """Lote comprimido com as alterações que ``node`` ainda não recebeu."""
+    if snapshot:
+        delta = export_snapshot(db, cursor, position, limit)
+    else:
+        delta = export_changes(db, cursor, limit, exclude_origin=node)
+    metrics.increment("sync.served", len(delta["changes"]))
+    return encode(delta)
+
+
+# Transportes usados pela unidade
+
+
+class HttpTransport:
+    """Fala com o central pela API (``/api/sync``)."""
+
+    def __init__(self, base_url: str = SYNC_CENTRAL_URL, token: str = SYNC_TOKEN, timeout: float = SYNC_TIMEOUT):
+        self.base_url = base_url
+        self.token = token
+        self.timeout = timeout
+
+    def _request(self, path: str, params: dict, data: Optional[bytes] = None) -> bytes:
+        url = f"{self.base_url}/api/sync/{path}?{urllib.parse.urlencode(params)}"
+        request = urllib.request.Request(url, data=data, method="POST" if data is not None else "GET")
+        request.add_header("X-Sync-Token", self.token)
+        if data is not None:
+            request.add_header("Content-Type", "application/octet-stream")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+    def push(self, node: str, payload: bytes) -> dict:
+        return json.loads(self._request("push", {"node": node}, payload))
+
+    def pull(self, node: str, cursor: str, limit: int, snapshot: bool, position: str = "") -> bytes:
+        params = {"node": node, "cursor": cursor, "limit": limit, "snapshot": str(snapshot).lower()}
+        if position:
+            params["position"] = position
+        return self._request("pull", params)
+
+
+class DatabaseTransport:
+    """Fala direto com o banco central (CLI com ``--central-database`` e benchmark)."""
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+
+    def push(self, node: str, payload: bytes) -> dict:
+        with self.session_factory() as db:
+            return receive_push(db, payload, node)
+
+    def pull(self, node: str, cursor: str, limit: int, snapshot: bool, position: str = "") -> bytes:
+        with self.session_factory() as db:
+            return serve_pull(db, node, cursor, limit, snapshot, position or None)
+
+
+# Lado da unidade
+
+
+def push_changes(db: Session, transport) -> dict:
+    """Envia as escritas locais ainda não enviadas, em lotes."""
+    node = node_id(db)
+    sent, size, conflicts = 0, 0, 0
+    while True:
+        cursor = int(get_state(db, "pushed_seq") or 0)
+        delta = export_changes(db, cursor, SYNC_BATCH_SIZE, only_origin=node)
+        if delta["changes"]:
+            payload = encode(delta)
+            result = transport.push(node, payload)
+            sent += len(delta["changes"])
+            size += len(payload)
+            conflicts += len(result["conflicts"])
+        set_state(db, "pushed_seq", delta["cursor"])
+        db.commit()
+        if not delta["more"]:
+            return {"sent": sent, "bytes": size, "conflicts": conflicts}
+
+
+def pull_changes(db: Session, transport) -> dict:
+    """Aplica as alterações do central; sem cursor salvo, começa pelo snapshot.
+
+    As páginas do snapshot são confirmadas uma a uma; o progresso fica em
+    ``snapshot_cursor``/``snapshot_position`` e um ciclo interrompido continua
+    da última página aplicada.
+    """
+    node = node_id(db)
+    received, size, conflicts = 0, 0, 0
+    while True:
+        saved = get_state(db, "pulled_seq")
+        if saved is None:
+            payload = transport.pull(
+                node, get_state(db, "snapshot_cursor") or "", SYNC_BATCH_SIZE, True,
+                get_state(db, "snapshot_position") or ""
+            )
+        else:
+            payload = transport.pull(node, saved, SYNC_BATCH_SIZE, False)
+        delta = decode(payload)
+        result = apply_changes(db, delta["changes"], delta["node"])
+        if saved is None and delta["more"]:
+            set_state(db, "snapshot_cursor", delta["cursor"])
+            set_state(db, "snapshot_position", delta["position"])
+        else:
+            set_state(db, "pulled_seq", delta["cursor"])
+            if saved is None:
+                clear_state(db, "snapshot_cursor")
+                clear_state(db, "snapshot_position")
+        db.commit()
+        received += len(delta["changes"])
+        size += len(payload)
+        conflicts += len(result["conflicts"])
+        # Fim do snapshot: segue com o log desde o início dele
+        if not delta["more"] and saved is not None:
+            return {"received": received, "bytes": size, "conflicts": conflicts}
+
+
+def sync_once(session_factory: Callable[[], Session] = SessionLocal, transport=None) -> Optional[dict]:
+    """Um ciclo de envio e recepção; sem rede, tenta de novo no próximo ciclo."""
+    transport = transport or HttpTransport()
+    started = time.perf_counter()
+    try:
+        with session_factory() as db:
+            pushed = push_changes(db, transport)
+            pulled = pull_changes(db, transport)
+    except (urllib.error.URLError, OSError) as e:
+        metrics.increment("sync.offline")
+        print(f"[SYNC] Central indisponível: {e}")
+        return None
+    metrics.observe("sync.cycle", time.perf_counter() - started)
+    return {**pushed, **pulled, "bytes": pushed["bytes"] + pulled["bytes"],
+            "conflicts": pushed["conflicts"] + pulled["conflicts"]}
+
+
+def pending_changes(db: Session) -> int:
+    """Escritas locais ainda não enviadas ao central."""
+    cursor = int(get_state(db, "pushed_seq") or 0)
+    return db.query(func.count(SyncChange.seq)).filter(
+        SyncChange.seq > cursor, SyncChange.origin == node_id(db)
+    ).scalar()
+
+
+if SYNC_ROLE == "edge" and SYNC_CENTRAL_URL:
+    jobs.register_job("edge_sync", SYNC_INTERVAL, sync_once, run_on_startup=True, singleton=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sincronização das unidades com o central")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sync = subparsers.add_parser("sync", help="executa um ciclo de envio e recepção")
+    sync.add_argument("--central-database", help="URL do banco central (em vez de SYNC_CENTRAL_URL)")
+    subparsers.add_parser("status", help="mostra cursores e alterações pendentes")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        with SessionLocal() as db:
+            print(f"nó: {node_id(db)}")
+            print(f"enviado até: {get_state(db, 'pushed_seq') or 0}")
+            print(f"recebido até: {get_state(db, 'pulled_seq') or '-'}")
+            print(f"pendentes: {pending_changes(db)}")
+        return
+
+    transport = None
+    if args.central_database:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        central = sessionmaker(bind=create_engine(args.central_database), autoflush=False,
+                               info={"sync_node": "central"})
+        transport = DatabaseTransport(central)
+    elif not SYNC_CENTRAL_URL:
+        raise SystemExit("[SYNC] Defina SYNC_CENTRAL_URL ou --central-database")
+    result = sync_once(transport=transport)
+    if result is None:
+        raise SystemExit(1)
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
-import smtplib
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from typing import List, Optional
-from jinja2 import Template
+
+# smtplib, email.mime e jinja2 são importados sob demanda para não pesar na
+# inicialização da API; só são necessários quando um email é enviado.
 
 class EmailService:
     def __init__(self):
@@ -13,9 +12,19 @@ class EmailService:
         self.smtp_password = os.getenv("SMTP_PASSWORD")
         self.from_email = os.getenv("SMTP_FROM_EMAIL")
         self.from_name = os.getenv("SMTP_FROM_NAME", "OrthoFlow")
+        self._password_reset_template = None
+    
+    def _get_password_reset_template(self):
+        """Compila o template HTML de recuperação de senha uma única vez."""
+        if self._password_reset_template is None:
+            from jinja2 import Template
+            self._password_reset_template = Template(PASSWORD_RESET_HTML_TEMPLATE)
+        return self._password_reset_template
     
     def _create_smtp_connection(self):
         """Cria conexão SMTP."""
+        import smtplib
+        
         try:
             server = smtplib.SMTP(self.smtp_host, self.smtp_port)
             server.starttls()
@@ -39,6 +48,9 @@ class EmailService:
                 print("Configurações de email não definidas")
                 return False
             
+            from email.mime.text import MIMEText
+            from email.mime.multipart import MIMEMultipart
+            
             # Criar mensagem
             msg = MIMEMultipart('alternative')
             msg['Subject'] = subject
@@ -73,8 +85,42 @@ class EmailService:
         frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
         reset_url = f"{frontend_url}/reset-password?token={reset_token}"
         
-        # Template HTML do email
-        html_template = Template("""
+        # Template de texto simples
+        text_content = f"""
+        OrthoFlow - Recuperação de Senha
+        
+        Olá {user_name},
+        
+        Recebemos uma solicitação para redefinir a senha da sua conta no OrthoFlow.
+        
+        Para criar uma nova senha, acesse o link abaixo:
+        {reset_url}
+        
+        IMPORTANTE:
+        - Este link é válido por apenas 1 hora
+        - Se você não solicitou esta alteração, ignore este email
+        - Nunca compartilhe este link com outras pessoas
+        
+        Este é um email automático, não responda.
+        © 2024 OrthoFlow - Sistema de Gestão Ortopédica
+        """
+        
+        # Renderizar template HTML
+        html_content = self._get_password_reset_template().render(
+            user_name=user_name,
+            reset_url=reset_url
+        )
+        
+        # Enviar email
+        return self.send_email(
+            to_email=to_email,
+            subject="🔐 Recuperação de Senha - OrthoFlow",
+            html_content=html_content,
+            text_content=text_content
+        )
+
+# Template HTML do email de recuperação de senha
+PASSWORD_RESET_HTML_TEMPLATE = """
         <!DOCTYPE html>
         <html>
         <head>
@@ -127,41 +173,7 @@ class EmailService:
             </div>
         </body>
         </html>
-        """)
-        
-        # Template de texto simples
-        text_content = f"""
-        OrthoFlow - Recuperação de Senha
-        
-        Olá {user_name},
-        
-        Recebemos uma solicitação para redefinir a senha da sua conta no OrthoFlow.
-        
-        Para criar uma nova senha, acesse o link abaixo:
-        {reset_url}
-        
-        IMPORTANTE:
-        - Este link é válido por apenas 1 hora
-        - Se você não solicitou esta alteração, ignore este email
-        - Nunca compartilhe este link com outras pessoas
-        
-        Este é um email automático, não responda.
-        © 2024 OrthoFlow - Sistema de Gestão Ortopédica
         """
-        
-        # Renderizar template HTML
-        html_content = html_template.render(
-            user_name=user_name,
-            reset_url=reset_url
-        )
-        
-        # Enviar email
-        return self.send_email(
-            to_email=to_email,
-            subject="🔐 Recuperação de Senha - OrthoFlow",
-            html_content=html_content,
-            text_content=text_content
-        )
 
 # Instância global do serviço de email
 email_service = EmailService()
\ No newline at end of file
@@ -0,0 +1,286 @@
+"""Eventos de alteração da agenda para atualização ao vivo das telas.
+
+Os handlers de escrita chamam ``publish`` antes do ``commit``; o evento só é
+entregue se a transação for confirmada. A entrega entre workers passa por um
+backend:
+
+- ``PostgresNotifyBackend``: ``pg_notify`` na mesma transação da escrita e uma
+  conexão dedicada em ``LISTEN`` por worker.
+- ``LocalBackend``: entrega dentro do processo (um único worker ou SQLite).
+
+O número de sequência é dado pelo worker ao receber o evento, na ordem de
+entrega (a dos commits): um número tirado na transação seguiria a ordem de
+início e o evento de uma transação mais lenta chegaria depois de números
+maiores. O id do evento é ``<época>-<seq>``, com a época sorteada na
+inicialização do worker. Cada worker mantém os últimos ``EVENTS_BUFFER_SIZE``
+eventos para que um cliente reconectado receba o que perdeu; um id de outra
+época (outro worker ou reinício) recebe ``reset``.
+"""
+import asyncio
+import json
+import os
+import select
+import threading
+import uuid
+from collections import deque
+from typing import Deque, List, Optional, Set
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+import metrics
+from database import engine
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "auto").lower()
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", "1000"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+CHANNEL = "appointment_events"
+
+# Aviso aos clientes de que eventos podem ter sido perdidos
+RESET = {"type": "reset"}
+
+
+def _str(value) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def appointment_event(kind: str, appointment, before: Optional[dict] = None) -> dict:
+    """Evento compacto de alteração de um agendamento.
+
+    ``before`` guarda médico, sala e data anteriores para que quem acompanha a
+    agenda antiga também seja avisado de uma remarcação.
+    """
+    payload = {
+        "type": kind,
+        "id": _str(appointment.id),
+        "doctor_id": _str(appointment.doctor_id),
+        "room_id": _str(appointment.room_id),
+        "date": appointment.appointment_date,
+        "time": appointment.appointment_time,
+        "status": appointment.status,
+    }
+    if before and any(payload[key] != value for key, value in before.items()):
+        payload["before"] = before
+    return payload
+
+
+def snapshot(appointment) -> dict:
+    """Campos de filtro do agendamento antes de uma alteração."""
+    return {
+        "doctor_id": _str(appointment.doctor_id),
+        "room_id": _str(appointment.room_id),
+        "date": appointment.appointment_date,
+    }
+
+
+class Subscription:
+    def __init__(self, doctor_id: Optional[str], room_id: Optional[str], date: Optional[str]):
+        self.doctor_id = doctor_id
+        self.room_id = room_id
+        self.date = date
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def matches(self, payload: dict) -> bool:
+        for values in (payload, payload.get("before") or {}):
+            if not values:
+                continue
+            if self.doctor_id and values.get("doctor_id") != self.doctor_id:
+                continue
+            if self.room_id and values.get("room_id") != self.room_id:
+                continue
+            if self.date and values.get("date") != self.date:
+                continue
+            return True
+        return False
+
+
+class Broker:
+    """Distribui os eventos recebidos do backend às assinaturas do worker."""
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.buffer: Deque[dict] = deque(maxlen=EVENTS_BUFFER_SIZE)
+        self.subscriptions: Set[Subscription] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def dispatch(self, payload: dict) -> None:
+        """Entrega um evento; pode ser chamado de qualquer thread."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._deliver, payload)
+
+    def dispatch_reset(self) -> None:
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.reset)
+
+    def _deliver(self, payload: dict) -> None:
+        # Só o event loop numera: a sequência segue a ordem de entrega, sem lacunas
+        self.seq += 1
+        payload = dict(payload, seq=self.seq)
+        self.buffer.append(payload)
+        metrics.increment("events.delivered")
+        for subscription in list(self.subscriptions):
+            if subscription.overflowed or not subscription.matches(payload):
+                continue
+            try:
+                subscription.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Cliente lento: encerra o stream e ele retoma pelo último seq
+                subscription.overflowed = True
+                metrics.increment("events.overflows")
+
+    def event_id(self, payload: dict) -> str:
+        return f"{self.epoch}-{payload['seq']}"
+
+    def parse_event_id(self, value: str) -> Optional[int]:
+        """Seq de um id deste worker; None para ids de outra época ou inválidos."""
+        epoch, _, seq = value.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def replay(self, subscription: Subscription, last_event_id: str) -> Optional[List[dict]]:
+        """Eventos posteriores a ``last_event_id``; None se o buffer não cobre o intervalo."""
+        last_seq = self.parse_event_id(last_event_id)
+        if last_seq is None or last_seq > self.seq:
+            return None
+        first_seq = self.buffer[0]["seq"] if self.buffer else self.seq + 1
+        if first_seq > last_seq + 1:
+            return None
+        return [payload for payload in self.buffer if payload["seq"] > last_seq and subscription.matches(payload)]
+
+    def reset(self) -> None:
+        """Eventos podem ter sido perdidos: avisa os clientes para recarregarem."""
+        self.buffer.clear()
+        metrics.increment("events.resets")
+        for subscription in list(self.subscriptions):
+            try:
+                subscription.queue.put_nowait(RESET)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+
+    def subscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.add(subscription)
+        metrics.increment("events.subscriptions")
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+
+broker = Broker()
+
+
+class LocalBackend:
+    """Entrega no próprio processo, após o commit da sessão."""
+
+    def publish(self, db: Session, payload: dict) -> None:
+        db.info.setdefault("pending_events", []).append(payload)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class PostgresNotifyBackend:
+    """NOTIFY na transação da escrita e LISTEN em uma conexão dedicada."""
+
+    def __init__(self):
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reconnecting = False
+
+    def publish(self, db: Session, payload: dict) -> None:
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {
+            "channel": CHANNEL,
+            "payload": json.dumps(payload, separators=(",", ":")),
+        })
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen_forever, name="events-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _listen_forever(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                metrics.increment("events.listener_errors")
+                print(f"[EVENTS] Conexão LISTEN perdida: {e}")
+                self._stopping.wait(1)
+
+    def _listen(self) -> None:
+        # Conexão fora do pool: fica presa ao LISTEN enquanto o worker vive
+        pooled = engine.raw_connection()
+        pooled.detach()
+        connection = pooled.driver_connection
+        try:
+            # O pre-ping do checkout pode ter aberto uma transação
+            connection.rollback()
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            if self._reconnecting:
+                broker.dispatch_reset()
+            self._reconnecting = True
+            while not self._stopping.is_set():
+                if select.select([connection], [], [], 1.0) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    broker.dispatch(json.loads(notify.payload))
+        finally:
+            connection.close()
+
+
+def _select_backend():
+    if EVENTS_BACKEND == "postgres" or (EVENTS_BACKEND == "auto" and engine.dialect.name == "postgresql"):
+        return PostgresNotifyBackend()
+    return LocalBackend()
+
+
+backend = _select_backend()
+
+
+def publish(db: Session, kind: str, appointment, before: Optional[dict] = None) -> None:
+    """Publica a alteração junto com a transação de ``db`` (chamar antes do commit)."""
+    backend.publish(db, appointment_event(kind, appointment, before))
+    metrics.increment("events.published")
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending(session):
+    for payload in session.info.pop("pending_events", ()):
+        broker.dispatch(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("pending_events", None)
+
+
+def start() -> None:
+    """Inicia o backend; chamado no lifespan, dentro do event loop."""
+    broker.loop = asyncio.get_running_loop()
+    backend.start()
+
+
+async def stop() -> None:
+    await asyncio.to_thread(backend.stop)
+    broker.loop = None
+
+
+def new_subscription(doctor_id: Optional[uuid.UUID], room_id: Optional[uuid.UUID], date: Optional[str]) -> Subscription:
+    return Subscription(_str(doctor_id), _str(room_id), date)
@@ -0,0 +1,299 @@
+"""Suporte ao cabeçalho ``Idempotency-Key`` nos POST de criação.
+
+A primeira resposta de um POST com ``Idempotency-Key`` fica guardada por
+``IDEMPOTENCY_TTL_SECONDS``, identificada pelo usuário do token e pela chave.
+Repetições com a mesma chave recebem a resposta guardada sem executar a rota
+(cabeçalho ``Idempotent-Replayed: true``); repetições concorrentes aguardam a
+requisição original. A mesma chave com outro corpo responde 422.
+
+Respostas 5xx não são guardadas: a chave é liberada para uma nova tentativa.
+
+Armazenamento (``IDEMPOTENCY_STORE``):
+- ``memory``: LRU limitado a ``IDEMPOTENCY_MAX_ENTRIES`` por worker;
+- ``database``: tabela ``idempotency_keys``, compartilhada entre workers.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import jobs
+import metrics
+from auth import verify_token
+from database import engine
+from models import IdempotencyKey
+
+IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE", "memory").lower()
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+IDEMPOTENCY_MAX_BODY_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BODY_BYTES", str(256 * 1024)))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+
+# Rotas POST que aceitam Idempotency-Key
+IDEMPOTENT_PATHS = {"/api/appointments/", "/api/patients/"}
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+# Cabeçalhos que não são repetidos no replay
+SKIPPED_HEADERS = {b"content-length", b"set-cookie", b"date", b"server"}
+
+
+@dataclass
+class StoredResponse:
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+@dataclass
+class Record:
+    fingerprint: str
+    response: Optional[StoredResponse]
+
+
+class MemoryStore:
+    """LRU com TTL no próprio worker."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Record]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, key: str, fingerprint: str) -> Optional[Record]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+            self._entries[key] = (now + IDEMPOTENCY_TTL_SECONDS, Record(fingerprint, None))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.increment("idempotency.evictions")
+            return None
+
+    def complete(self, key: str, response: StoredResponse) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry[1].response = response
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class DatabaseStore:
+    """Tabela idempotency_keys; a inserção da chave é o que garante a exclusividade."""
+
+    blocking = True
+
+    def claim(self, key: str, fingerprint: str) -> Optional[Record]:
+        now = datetime.now(timezone.utc)
+        with engine.begin() as connection:
+            # Chave expirada ainda não removida pela limpeza
+            connection.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.key == key, IdempotencyKey.expires_at <= now
+            ))
+        try:
+            with engine.begin() as connection:
+                connection.execute(IdempotencyKey.__table__.insert().values(
+                    key=key,
+                    fingerprint=fingerprint,
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+                ))
+            return None
+        except IntegrityError:
+            pass
+        with engine.connect() as connection:
+            row = connection.execute(select(
+                IdempotencyKey.fingerprint,
+                IdempotencyKey.status_code,
+                IdempotencyKey.headers,
+                IdempotencyKey.body
+            ).where(IdempotencyKey.key == key)).first()
+        if row is None:
+            # Liberada entre o INSERT e o SELECT
+            return self.claim(key, fingerprint)
+        response = None
+        if row.status_code is not None:
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(row.headers)]
+            response = StoredResponse(row.status_code, headers, row.body)
+        return Record(row.fingerprint, response)
+
+    def complete(self, key: str, response: StoredResponse) -> None:
+        headers = json.dumps([(name.decode("latin-1"), value.decode("latin-1")) for name, value in response.headers])
+        with engine.begin() as connection:
+            connection.execute(update(IdempotencyKey).where(IdempotencyKey.key == key).values(
+                status_code=response.status, headers=headers, body=response.body
+            ))
+
+    def release(self, key: str) -> None:
+        with engine.begin() as connection:
+            connection.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+
+
+def purge_expired_keys(batch_size: int = 1000) -> int:
+    """Remove chaves expiradas da tabela em lotes."""
+    total = 0
+    while True:
+        with engine.begin() as connection:
+            expired = select(IdempotencyKey.key).where(
+                IdempotencyKey.expires_at <= datetime.now(timezone.utc)
+            ).limit(batch_size)
+            deleted = connection.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.key.in_(expired.scalar_subquery()))
+            ).rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+store = DatabaseStore() if IDEMPOTENCY_STORE == "database" else MemoryStore(IDEMPOTENCY_MAX_ENTRIES)
+
+if IDEMPOTENCY_STORE == "database":
+    jobs.register_job("idempotency_cleanup", 3600, purge_expired_keys, singleton=True)
+
+
+async def _call(method, *args):
+    if store.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+def _subject(scope: Scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                return verify_token(token.strip())
+    return None
+
+
+class IdempotencyMiddleware:
+    """Middleware ASGI que guarda e repete respostas por Idempotency-Key."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Requisições em andamento neste worker: repetições aguardam o futuro
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in IDEMPOTENT_PATHS:
+            return await self.app(scope, receive, send)
+
+        idempotency_key = dict(scope["headers"]).get(HEADER)
+        subject = _subject(scope) if idempotency_key else None
+        if not idempotency_key or subject is None:
+            # Sem chave ou sem token válido a rota decide (inclusive o 401)
+            return await self.app(scope, receive, send)
+
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return await JSONResponse(
+                {"detail": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"}, status_code=400
+            )(scope, receive, send)
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        key = hashlib.sha256(subject.encode() + b"\0" + scope["path"].encode() + b"\0" + idempotency_key).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record = await _call(store.claim, key, fingerprint)
+            if record is None:
+                return await self._run(key, body, scope, send)
+            if record.fingerprint != fingerprint:
+                metrics.increment("idempotency.mismatches")
+                return await JSONResponse(
+                    {"detail": "Idempotency-Key was already used with a different request body"}, status_code=422
+                )(scope, receive, send)
+            if record.response is not None:
+                metrics.increment("idempotency.replays")
+                return await self._replay(record.response, send)
+
+            # Original ainda em andamento: aguarda neste worker ou consulta de novo
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return await JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is still in progress"}, status_code=409
+                )(scope, receive, send)
+            metrics.increment("idempotency.waits")
+            future = self._inflight.get(key)
+            try:
+                if future is not None:
+                    await asyncio.wait_for(asyncio.shield(future), timeout=remaining)
+                else:
+                    await asyncio.sleep(min(0.1, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, key: str, body: bytes, scope: Scope, send: Send) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        captured = {"status": 500, "headers": [], "body": b"", "too_large": False}
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return {"type": "http.disconnect"}
+
+        async def capture_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in SKIPPED_HEADERS
+                ]
+            elif message["type"] == "http.response.body" and not captured["too_large"]:
+                captured["body"] += message.get("body", b"")
+                if len(captured["body"]) > IDEMPOTENCY_MAX_BODY_BYTES:
+                    captured["too_large"] = True
+                    captured["body"] = b""
+            await send(message)
+
+        stored = False
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            if captured["status"] < 500 and not captured["too_large"]:
+                response = StoredResponse(captured["status"], captured["headers"], captured["body"])
+                await _call(store.complete, key, response)
+                stored = True
+        finally:
+            try:
+                if not stored:
+                    await _call(store.release, key)
+            finally:
+                self._inflight.pop(key, None)
+                future.set_result(None)
+
+    async def _replay(self, response: StoredResponse, send: Send) -> None:
+        headers = list(response.headers) + [
+            (b"content-length", str(len(response.body)).encode()),
+            (b"idempotent-replayed", b"true"),
+        ]
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
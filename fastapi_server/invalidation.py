@@ -0,0 +1,322 @@
+"""Invalidação dos caches em memória entre workers.
+
+Cada worker guarda caches próprios (planos de saúde, índice TUSS). Quem altera
+os dados chama ``publish`` antes do ``commit``: a mensagem ``(entidade,
+chave)`` entra em ``cache_invalidations`` na mesma transação, o próprio worker
+remove a entrada logo após o commit e os demais a recebem pelo backend:
+
+- ``PostgresNotifyBackend``: ``pg_notify`` na transação e uma conexão
+  dedicada em ``LISTEN`` por worker.
+- ``PollBackend``: cada worker lê o log a cada ``INVALIDATION_POLL_INTERVAL``
+  segundos (SQLite com vários workers sobre o mesmo arquivo; as escritas são
+  serializadas, então os ids chegam em ordem).
+- ``LocalBackend``: só o próprio processo (um worker, testes), sem log.
+
+A versão da mensagem é o id no log. Ela é tirada no ``publish``, não no
+commit, e não segue a ordem dos commits: uma versão menor pode chegar depois de
+uma maior para a mesma chave. Por isso ela só identifica a mensagem: o worker
+ignora uma versão que já aplicou (o eco da própria escrita, as repetições da
+ressincronização), mas qualquer mensagem nova remove a entrada.
+
+Depois de perder a conexão, o worker relê o log a partir de pouco antes da
+queda (``INVALIDATION_RESYNC_MARGIN``). Se a queda durou mais que a retenção
+do log (``INVALIDATION_RETENTION_SECONDS``), todos os caches são esvaziados.
+"""
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import os
+import select
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Hashable, List, Optional
+
+from sqlalchemy import delete, event, func, insert, select as sa_select, text
+from sqlalchemy.orm import Session
+
+import database
+import jobs
+import metrics
+from models import CacheInvalidation
+
+INVALIDATION_BACKEND = os.getenv("INVALIDATION_BACKEND", "auto").lower()
+INVALIDATION_POLL_INTERVAL = float(os.getenv("INVALIDATION_POLL_INTERVAL", "1"))
+INVALIDATION_RESYNC_MARGIN = float(os.getenv("INVALIDATION_RESYNC_MARGIN", "30"))
+INVALIDATION_RETENTION_SECONDS = float(os.getenv("INVALIDATION_RETENTION_SECONDS", "3600"))
+INVALIDATION_PRUNE_INTERVAL = float(os.getenv("INVALIDATION_PRUNE_INTERVAL", "600"))
+INVALIDATION_TRACKED_KEYS = int(os.getenv("INVALIDATION_TRACKED_KEYS", "10000"))
+
+CHANNEL = "cache_invalidations"
+
+Handler = Callable[[Optional[str]], None]
+
+_handlers: Dict[str, List[Handler]] = {}
+# Versões já aplicadas (as ``INVALIDATION_TRACKED_KEYS`` mais recentes)
+_applied: "OrderedDict[int, None]" = OrderedDict()
+_applied_lock = threading.Lock()
+
+
+def register(entity: str, handler: Handler) -> None:
+    """``handler(chave)`` remove a entrada do cache; chave ``None`` esvazia tudo."""
+    _handlers.setdefault(entity, []).append(handler)
+
+
+def apply(message: dict) -> bool:
+    """Remove dos caches do worker o que a mensagem invalida; False se já aplicada."""
+    entity, key, version = message["entity"], message["key"], message.get("version")
+    if version is not None:
+        with _applied_lock:
+            # Só a mesma mensagem é repetição; uma versão menor ainda pode ser uma escrita nova
+            if version in _applied:
+                metrics.increment("invalidation.duplicates")
+                return False
+            _applied[version] = None
+            while len(_applied) > INVALIDATION_TRACKED_KEYS:
+                _applied.popitem(last=False)
+    for handler in _handlers.get(entity, ()):
+        try:
+            handler(key)
+        except Exception as e:
+            print(f"[CACHE] Erro ao invalidar {entity}:{key}: {e}")
+    metrics.increment("invalidation.applied")
+    return True
+
+
+def flush_all() -> None:
+    """Esvazia todos os caches registrados (mensagens podem ter sido perdidas)."""
+    with _applied_lock:
+        _applied.clear()
+    for entity in _handlers:
+        apply({"entity": entity, "key": None})
+    metrics.increment("invalidation.flushes")
+    print("[CACHE] Caches esvaziados após perda de mensagens de invalidação")
+
+
+def _insert_log(db, message: dict) -> int:
+    result = db.execute(insert(CacheInvalidation).values(
+        entity=message["entity"],
+        key=message["key"],
+        created_at=datetime.now(timezone.utc),
+    ))
+    return result.inserted_primary_key[0]
+
+
+def _row_message(row) -> dict:
+    return {"entity": row.entity, "key": row.key, "version": row.id}
+
+
+class LocalBackend:
+    """Apenas o próprio processo: nada a enviar."""
+
+    def publish(self, db, message: dict) -> Optional[int]:
+        return None
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class _LogReader(ABC):
+    """Thread que recebe as mensagens dos outros workers, reiniciada após falhas."""
+
+    def __init__(self, read_engine):
+        self._read_engine = read_engine
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Último instante em que as mensagens estavam chegando
+        self.last_ok = datetime.now(timezone.utc)
+        self._disconnected = False
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self.last_ok = datetime.now(timezone.utc)
+        self._thread = threading.Thread(target=self._run_forever, name="invalidation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run_forever(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._run()
+            except Exception as e:
+                self._disconnected = True
+                metrics.increment("invalidation.listener_errors")
+                print(f"[CACHE] Conexão de invalidação perdida: {e}")
+                self._stopping.wait(1)
+
+    def _lost_messages(self) -> bool:
+        """A queda durou mais que a retenção: o log não cobre o que se perdeu."""
+        horizon = datetime.now(timezone.utc) - timedelta(seconds=INVALIDATION_RETENTION_SECONDS)
+        return self.last_ok - timedelta(seconds=INVALIDATION_RESYNC_MARGIN) < horizon
+
+    @abstractmethod
+    def _run(self) -> None:
+        """Recebe mensagens até ``stop``; uma exceção reinicia a leitura."""
+
+
+class PostgresNotifyBackend(_LogReader):
+    """Log + NOTIFY na transação da escrita e LISTEN em uma conexão dedicada."""
+
+    def __init__(self):
+        super().__init__(database.engine)
+
+    def publish(self, db, message: dict) -> Optional[int]:
+        version = _insert_log(db, message)
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {
+            "channel": CHANNEL,
+            "payload": json.dumps(dict(message, version=version), separators=(",", ":")),
+        })
+        return version
+
+    def resync(self) -> None:
+        """Reaplica o log desde pouco antes da queda (as versões já aplicadas são puladas)."""
+        metrics.increment("invalidation.resyncs")
+        if self._lost_messages():
+            flush_all()
+            return
+        # Por horário, não por id: transações concorrentes fazem commit fora de ordem
+        since = self.last_ok - timedelta(seconds=INVALIDATION_RESYNC_MARGIN)
+        with self._read_engine.connect() as connection:
+            rows = connection.execute(
+                sa_select(CacheInvalidation.id, CacheInvalidation.entity, CacheInvalidation.key)
+                .where(CacheInvalidation.created_at >= since)
+                .order_by(CacheInvalidation.id)
+            ).all()
+        for row in rows:
+            apply(_row_message(row))
+
+    def _run(self) -> None:
+        # Conexão fora do pool: fica presa ao LISTEN enquanto o worker vive
+        pooled = database.engine.raw_connection()
+        pooled.detach()
+        connection = pooled.driver_connection
+        try:
+            # O pre-ping do checkout pode ter aberto uma transação
+            connection.rollback()
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            if self._disconnected:
+                self.resync()
+                self._disconnected = False
+            while not self._stopping.is_set():
+                self.last_ok = datetime.now(timezone.utc)
+                if select.select([connection], [], [], 1.0) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    apply(json.loads(notify.payload))
+        finally:
+            connection.close()
+
+
+class PollBackend(_LogReader):
+    """Log lido periodicamente por id (SQLite: um escritor, ids em ordem)."""
+
+    def __init__(self, read_engine):
+        super().__init__(read_engine)
+        self._last_id: Optional[int] = None
+
+    def publish(self, db, message: dict) -> Optional[int]:
+        return _insert_log(db, message)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self.poll()
+            self._stopping.wait(INVALIDATION_POLL_INTERVAL)
+
+    def poll(self) -> int:
+        """Aplica as mensagens novas do log; retorna quantas leu."""
+        if self._disconnected:
+            metrics.increment("invalidation.resyncs")
+            if self._lost_messages():
+                flush_all()
+            self._disconnected = False
+        with self._read_engine.connect() as connection:
+            if self._last_id is None:
+                # Início do worker: os caches estão vazios, só importa o que vier depois
+                self._last_id = connection.execute(sa_select(func.max(CacheInvalidation.id))).scalar() or 0
+                rows = []
+            else:
+                # Os ids não são reaproveitados, então a leitura continua de onde parou
+                rows = connection.execute(
+                    sa_select(CacheInvalidation.id, CacheInvalidation.entity, CacheInvalidation.key)
+                    .where(CacheInvalidation.id > self._last_id)
+                    .order_by(CacheInvalidation.id)
+                ).all()
+        for row in rows:
+            apply(_row_message(row))
+            self._last_id = row.id
+        self.last_ok = datetime.now(timezone.utc)
+        return len(rows)
+
+
+def _select_backend():
+    if INVALIDATION_BACKEND == "local":
+        return LocalBackend()
+    if INVALIDATION_BACKEND == "postgres" or (
+        INVALIDATION_BACKEND == "auto" and database.engine.dialect.name == "postgresql"
+    ):
+        return PostgresNotifyBackend()
+    return PollBackend(database.reader_engine if database.IS_SQLITE else database.engine)
+
+
+backend = _select_backend()
+
+
+def publish(db: Session, entity: str, key: Optional[Hashable] = None) -> None:
+    """Invalida ``entidade:chave`` em todos os workers quando ``db`` fizer commit."""
+    message = {"entity": entity, "key": str(key) if key is not None else None}
+    message["version"] = backend.publish(db, message)
+    db.info.setdefault("pending_invalidations", []).append(message)
+    metrics.increment("invalidation.published")
+
+
+def send(entity: str, key: Optional[Hashable] = None) -> None:
+    """Invalidação fora de uma sessão, em transação própria."""
+    message = {"entity": entity, "key": str(key) if key is not None else None}
+    with database.engine.begin() as connection:
+        message["version"] = backend.publish(connection, message)
+    apply(message)
+    metrics.increment("invalidation.published")
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    for message in session.info.pop("pending_invalidations", ()):
+        apply(message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("pending_invalidations", None)
+
+
+def start() -> None:
+    backend.start()
+
+
+async def stop() -> None:
+    await asyncio.to_thread(backend.stop)
+
+
+def prune() -> int:
+    """Remove do log as mensagens mais antigas que a retenção."""
+    horizon = datetime.now(timezone.utc) - timedelta(seconds=INVALIDATION_RETENTION_SECONDS)
+    with database.engine.begin() as connection:
+        removed = connection.execute(
+            delete(CacheInvalidation).where(CacheInvalidation.created_at < horizon)
+        ).rowcount
+    metrics.increment("invalidation.pruned", removed)
+    return removed
+
+
+jobs.register_job("cache_invalidation_prune", INVALIDATION_PRUNE_INTERVAL, prune, singleton=True)
@@ -0,0 +1,132 @@
+"""Execução periódica de tarefas de manutenção em segundo plano.
+
+Os módulos registram funções síncronas com ``register_job`` e o lifespan da
+API inicia e encerra os loops com ``start_jobs``/``stop_jobs``. Cada execução
+roda em uma thread para não bloquear o event loop. Tarefas ``singleton`` rodam
+em apenas um worker por vez (advisory lock no PostgreSQL).
+"""
+import asyncio
+import hashlib
+import time
+from typing import Callable, Dict, List, Optional
+
+import metrics
+
+
+class Job:
+    def __init__(
+        self,
+        name: str,
+        interval: float,
+        func: Callable[[], object],
+        run_on_startup: bool,
+        singleton: bool
+    ):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_on_startup = run_on_startup
+        self.singleton = singleton
+        self.last_run: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+
+_jobs: Dict[str, Job] = {}
+_tasks: List[asyncio.Task] = []
+
+
+def register_job(
+    name: str,
+    interval: float,
+    func: Callable[[], object],
+    run_on_startup: bool = False,
+    singleton: bool = False
+) -> Job:
+    """Registra (ou substitui) uma tarefa executada a cada ``interval`` segundos."""
+    job = Job(name, interval, func, run_on_startup, singleton)
+    _jobs[name] = job
+    return job
+
+
+def _lock_key(name: str) -> int:
+    digest = hashlib.blake2b(f"job:{name}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _run_singleton(job: Job) -> object:
+    """Executa a tarefa apenas se nenhum outro worker estiver executando."""
+    from sqlalchemy import text
+    from database import engine
+
+    if engine.dialect.name != "postgresql":
+        return job.func()
+
+    with engine.connect() as connection:
+        key = _lock_key(job.name)
+        acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+        # O lock é de sessão; encerra a transação para não ficar "idle in transaction"
+        connection.commit()
+        if not acquired:
+            metrics.increment(f"jobs.{job.name}.skipped")
+            return None
+        try:
+            return job.func()
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+            connection.commit()
+
+
+def run_job(name: str) -> object:
+    """Executa uma tarefa imediatamente na thread atual, registrando métricas."""
+    job = _jobs[name]
+    started = time.perf_counter()
+    try:
+        result = _run_singleton(job) if job.singleton else job.func()
+        job.last_error = None
+        return result
+    except Exception as e:
+        job.last_error = str(e)
+        metrics.increment(f"jobs.{name}.errors")
+        raise
+    finally:
+        job.last_run = time.time()
+        metrics.increment(f"jobs.{name}.runs")
+        metrics.observe(f"jobs.{name}.duration", time.perf_counter() - started)
+
+
+async def _loop(job: Job) -> None:
+    if not job.run_on_startup:
+        await asyncio.sleep(job.interval)
+    while True:
+        try:
+            await asyncio.to_thread(run_job, job.name)
+        except Exception as e:
+            print(f"[JOBS] Erro na tarefa {job.name}: {e}")
+        await asyncio.sleep(job.interval)
+
+
+def start_jobs() -> None:
+    """Inicia os loops de todas as tarefas registradas."""
+    for job in _jobs.values():
+        _tasks.append(asyncio.create_task(_loop(job), name=f"job:{job.name}"))
+
+
+async def stop_jobs() -> None:
+    """Cancela os loops e aguarda o término."""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+def get_status() -> List[dict]:
+    """Estado das tarefas registradas."""
+    return [
+        {
+            "name": job.name,
+            "interval": job.interval,
+            "last_run": job.last_run,
+            "last_error": job.last_error,
+        }
+        for job in _jobs.values()
+    ]
@@ -1,26 +1,52 @@
+import time
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
-import uvicorn
 import os
 from dotenv import load_dotenv
 
 # Importar módulos locais
-from database import engine, Base
-from routers import auth, patients, doctors, appointments, clinic_rooms, appointment_types, insurance_plans
-from auth import get_current_user
+from routers import auth, patients, doctors, appointments, clinic_rooms, appointment_types, insurance_plans, stats, analytics, tuss, sync
+from routers import audit as audit_router, waitlist as waitlist_router
+from routers import events as events_router, profiles as profiles_router
+from auth import get_current_user, get_current_superuser
+from startup import run_startup
+import audit
+import events
+import invalidation
+import jobs
+from idempotency import IdempotencyMiddleware
+from rate_limit import RateLimitMiddleware
+from profiling import ProfilingMiddleware
+import metrics
+import partitions  # registra a manutenção das partições de agendamentos
+import status_transitions  # registra a transição automática para concluído/falta
 
 load_dotenv()
 
-# Criar tabelas no banco de dados
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+# O schema é gerenciado pelo Alembic; na inicialização apenas verificamos a revisão
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    Base.metadata.create_all(bind=engine)
+    app.state.startup_timings = await run_startup(IMPORT_SECONDS)
+    jobs.start_jobs()
+    events.start()
+    invalidation.start()
     yield
     # Shutdown
-    pass
+    await invalidation.stop()
+    await events.stop()
+    await jobs.stop_jobs()
+    # Registros de auditoria ainda no buffer
+    written = audit.flush()
+    if written:
+        print(f"[AUDIT] {written} registros gravados no encerramento")
 
 app = FastAPI(
     title="OrthoFlow API",
@@ -29,6 +55,13 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Replays de POST com Idempotency-Key não chegam às rotas (o CORS fica por fora)
+app.add_middleware(IdempotencyMiddleware)
+# Limites das rotas de autenticação, antes de qualquer consulta ou bcrypt
+app.add_middleware(RateLimitMiddleware)
+# X-Profile de superusuários: perfila a requisição inteira, inclusive os middlewares internos
+app.add_middleware(ProfilingMiddleware)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -40,6 +73,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Total-Count-Kind", "X-Profile-Id"],
 )
 
 # Include routers
@@ -50,6 +84,14 @@ app.include_router(appointments.router, prefix="/api/appointments", tags=["appoi
 app.include_router(clinic_rooms.router, prefix="/api/clinic-rooms", tags=["clinic-rooms"])
 app.include_router(appointment_types.router, prefix="/api/appointment-types", tags=["appointment-types"])
 app.include_router(insurance_plans.router, prefix="/api/insurance-plans", tags=["insurance-plans"])
+app.include_router(stats.router, prefix="/api/stats", tags=["stats"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(events_router.router, prefix="/api/events", tags=["events"])
+app.include_router(tuss.router, prefix="/api/tuss", tags=["tuss"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
+app.include_router(audit_router.router, prefix="/api/audit", tags=["audit"])
+app.include_router(waitlist_router.router, prefix="/api/waitlist", tags=["waitlist"])
+app.include_router(profiles_router.router, prefix="/api/profiles", tags=["profiles"])
 
 @app.get("/")
 async def root():
@@ -59,7 +101,14 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "OrthoFlow API"}
 
+@app.get("/api/metrics")
+async def get_metrics(current_user=Depends(get_current_superuser)):
+    """Métricas internas deste worker (pool de conexões, limitador, jobs); só superusuários."""
+    return metrics.snapshot()
+
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -0,0 +1,55 @@
+"""Métricas internas do processo (contadores, tempos e gauges).
+
+Registro simples e sem dependências, exportado em ``/api/metrics``. Cada
+worker do uvicorn mantém suas próprias métricas.
+"""
+import threading
+from typing import Callable, Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_timers: Dict[str, Dict[str, float]] = {}
+_gauges: Dict[str, Callable[[], float]] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+    """Soma ``value`` ao contador ``name``."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name: str, seconds: float) -> None:
+    """Registra uma duração (em segundos) no timer ``name``."""
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            timer = _timers[name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+        ms = seconds * 1000
+        timer["count"] += 1
+        timer["total_ms"] += ms
+        if ms > timer["max_ms"]:
+            timer["max_ms"] = ms
+
+
+def register_gauge(name: str, func: Callable[[], float]) -> None:
+    """Registra uma função lida a cada exportação das métricas."""
+    _gauges[name] = func
+
+
+def snapshot() -> dict:
+    """Retorna uma cópia de todas as métricas."""
+    with _lock:
+        counters = dict(_counters)
+        timers = {}
+        for name, timer in _timers.items():
+            timers[name] = dict(timer)
+            timers[name]["avg_ms"] = timer["total_ms"] / timer["count"] if timer["count"] else 0.0
+
+    gauges = {}
+    for name, func in _gauges.items():
+        try:
+            gauges[name] = func()
+        except Exception:
+            gauges[name] = None
+
+    return {"counters": counters, "timers": timers, "gauges": gauges}
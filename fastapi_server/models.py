@@ -1,12 +1,37 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float, Index, LargeBinary, BigInteger, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func, text
+from sqlalchemy.types import CHAR, TypeDecorator
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 import uuid
 
 Base = declarative_base()
 
+class UUID(TypeDecorator):
+    """UUID nativo no PostgreSQL; nos demais bancos (SQLite), texto ``xxxxxxxx-xxxx-...``."""
+    impl = CHAR(36)
+    cache_ok = True
+
+    def __init__(self, as_uuid: bool = True):
+        super().__init__()
+        self.as_uuid = as_uuid
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(PG_UUID(as_uuid=self.as_uuid))
+        return dialect.type_descriptor(CHAR(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        return str(value if isinstance(value, uuid.UUID) else uuid.UUID(str(value)))
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        return uuid.UUID(str(value)) if self.as_uuid else str(value)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -32,6 +57,8 @@ class Doctor(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Incrementado a cada escrita local; usado na sincronização (edge_sync)
+    row_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relacionamentos
     appointments = relationship("Appointment", back_populates="doctor")
@@ -48,6 +75,8 @@ class InsurancePlan(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Incrementado a cada escrita local; usado na sincronização (edge_sync)
+    row_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relacionamentos
     patients = relationship("Patient", back_populates="insurance_plan")
@@ -55,7 +84,7 @@ class InsurancePlan(Base):
 class Patient(Base):
     __tablename__ = "patients"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     cpf = Column(String(11), unique=True, nullable=False)
@@ -71,6 +100,8 @@ class Patient(Base):
     insurance_number = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Incrementado a cada escrita local; usado na sincronização (edge_sync)
+    row_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relacionamentos
     insurance_plan = relationship("InsurancePlan", back_populates="patients")
@@ -87,6 +118,8 @@ class ClinicRoom(Base):
     is_available = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Incrementado a cada escrita local; usado na sincronização (edge_sync)
+    row_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relacionamentos
     appointments = relationship("Appointment", back_populates="room")
@@ -98,14 +131,27 @@ class AppointmentType(Base):
     type_name = Column(String, unique=True, nullable=False)
     duration = Column(String, nullable=False)
     description = Column(Text)
+    # Sala exigida pela consulta (room_assignment): tipo e equipamentos separados por vírgula
+    required_room_type = Column(String)
+    required_equipment = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Incrementado a cada escrita local; usado na sincronização (edge_sync)
+    row_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relacionamentos
     appointments = relationship("Appointment", back_populates="appointment_type")
 
 class Appointment(Base):
+    # No PostgreSQL a tabela é particionada por mês de appointment_date e a chave
+    # primária no banco é (id, appointment_date); para o ORM basta o id.
     __tablename__ = "appointments"
+    __table_args__ = (
+        Index("ix_appointments_doctor_date", "doctor_id", "appointment_date"),
+        Index("ix_appointments_room_date", "room_id", "appointment_date"),
+        Index("ix_appointments_patient_date", "patient_id", "appointment_date"),
+        Index("ix_appointments_status_date", "status", "appointment_date"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=False)
@@ -117,8 +163,12 @@ class Appointment(Base):
     status = Column(String, default="scheduled", nullable=False)
     reason = Column(Text)
     notes = Column(Text)
+    # Chegada do paciente; define completed/no_show na transição automática
+    checked_in_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Incrementado a cada escrita local; usado na sincronização (edge_sync)
+    row_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relacionamentos
     patient = relationship("Patient", back_populates="appointments")
@@ -130,11 +180,188 @@ class PasswordResetToken(Base):
     __tablename__ = "password_reset_tokens"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    token_hash = Column(String(255), nullable=False)
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(255), nullable=False, unique=True, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
     used = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relacionamento
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+class AppointmentDailyStat(Base):
+    # Contagem de agendamentos por dia, médico, sala e status, mantida pelos
+    # handlers de agendamento. Sem sala, room_id recebe o UUID nulo (stats.NO_ROOM).
+    __tablename__ = "appointment_daily_stats"
+    
+    stat_date = Column(String, primary_key=True)
+    doctor_id = Column(UUID(as_uuid=True), primary_key=True)
+    room_id = Column(UUID(as_uuid=True), primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class IdempotencyKey(Base):
+    # Respostas guardadas por Idempotency-Key (IDEMPOTENCY_STORE=database).
+    # key é o SHA-256 de usuário + rota + chave; status_code nulo = em andamento.
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(64), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer)
+    headers = Column(Text)
+    body = Column(LargeBinary)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class BookingLock(Base):
+    # Uma linha por agenda (médico ou sala + data) travada durante a marcação.
+    # Usada fora do PostgreSQL, onde as marcações usam advisory locks.
+    __tablename__ = "booking_locks"
+    
+    key = Column(String, primary_key=True)
+    locked_at = Column(DateTime(timezone=True), nullable=False)
+
+class TussCatalogVersion(Base):
+    # Cada carga do catálogo TUSS; apenas uma versão fica ativa por vez.
+    __tablename__ = "tuss_catalog_versions"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String, nullable=False)
+    checksum = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=False, default=0)
+    loaded_at = Column(DateTime(timezone=True), nullable=False)
+    is_active = Column(Boolean, nullable=False, default=False)
+
+class TussProcedure(Base):
+    __tablename__ = "tuss_procedures"
+    
+    version_id = Column(Integer, ForeignKey("tuss_catalog_versions.id", ondelete="CASCADE"), primary_key=True)
+    code = Column(String(10), primary_key=True)
+    description = Column(Text, nullable=False)
+    valid_from = Column(String(10))
+    valid_until = Column(String(10))
+
+class AppointmentProcedure(Base):
+    # Procedimentos TUSS de um agendamento. Sem chave estrangeira: agendamentos
+    # arquivados saem da tabela, mas os procedimentos continuam consultáveis.
+    __tablename__ = "appointment_procedures"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    appointment_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    procedure_code = Column(String(10), nullable=False)
+    quantity = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Janela da lista de espera como intervalo de dias, indexável por GiST
+WAITLIST_WINDOW_SQL = "int4range(replace(earliest_date, '-', '')::int, replace(latest_date, '-', '')::int, '[]')"
+
+class WaitlistEntry(Base):
+    # Paciente aguardando um horário mais cedo com um médico (ou qualquer médico da
+    # especialidade) dentro de uma janela de datas e horários. Os índices parciais
+    # cobrem só as entradas em espera, que são as lidas a cada cancelamento.
+    __tablename__ = "waitlist_entries"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=False, index=True)
+    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctors.id"))
+    specialty = Column(String)
+    appointment_type_id = Column(UUID(as_uuid=True), ForeignKey("appointment_types.id"), nullable=False)
+    earliest_date = Column(String, nullable=False)
+    latest_date = Column(String, nullable=False)
+    earliest_time = Column(String, nullable=False, default="00:00")
+    latest_time = Column(String, nullable=False, default="23:59")
+    # Marca direto, sem oferta, quando surge um horário compatível
+    auto_book = Column(Boolean, nullable=False, default=False)
+    # Agendamento atual do paciente, cancelado quando o encaixe é marcado (sem FK, como em appointment_procedures)
+    current_appointment_id = Column(UUID(as_uuid=True))
+    reason = Column(Text)
+    status = Column(String, nullable=False, default="waiting")
+    offered_doctor_id = Column(UUID(as_uuid=True))
+    offered_room_id = Column(UUID(as_uuid=True))
+    offered_date = Column(String)
+    offered_time = Column(String)
+    offer_expires_at = Column(DateTime(timezone=True))
+    appointment_id = Column(UUID(as_uuid=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # PostgreSQL: GiST sobre a janela (dias como AAAAMMDD; o cast de texto para
+        # date não é imutável) e o índice responde "a janela contém a data" direto
+        Index(
+            "ix_waitlist_doctor_range", "doctor_id", text(WAITLIST_WINDOW_SQL),
+            postgresql_using="gist", postgresql_where=text("status = 'waiting'"),
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_waitlist_specialty_range", "specialty", text(WAITLIST_WINDOW_SQL),
+            postgresql_using="gist", postgresql_where=text("status = 'waiting' AND doctor_id IS NULL"),
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_waitlist_doctor_window", "doctor_id", "earliest_date", "latest_date",
+            sqlite_where=text("status = 'waiting'"),
+        ).ddl_if(dialect="sqlite"),
+        Index(
+            "ix_waitlist_specialty_window", "specialty", "earliest_date", "latest_date",
+            sqlite_where=text("status = 'waiting' AND doctor_id IS NULL"),
+        ).ddl_if(dialect="sqlite"),
+    )
+
+class CacheInvalidation(Base):
+    # Log das invalidações de cache entre workers (invalidation); o id é a
+    # versão da mensagem. key nula invalida a entidade inteira.
+    __tablename__ = "cache_invalidations"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(64), nullable=False)
+    key = Column(String(64))
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    # Ids nunca reaproveitados no SQLite: os workers leem o log por id
+    __table_args__ = {"sqlite_autoincrement": True}
+
+class SyncChange(Base):
+    # Registro das escritas nas tabelas sincronizadas (edge_sync). origin é o nó
+    # que fez a escrita; row_version guarda a versão da linha (inclusive ao remover).
+    __tablename__ = "sync_changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(64), nullable=False)
+    row_id = Column(String(36), nullable=False)
+    op = Column(String(8), nullable=False)
+    row_version = Column(Integer, nullable=False)
+    origin = Column(String(64), nullable=False)
+    changed_at = Column(DateTime(timezone=True), nullable=False)
+    # Transação que gravou o registro; no PostgreSQL o default da coluna é
+    # pg_current_xact_id() (migração), nos demais bancos fica nulo
+    txid = Column(BigInteger, nullable=True)
+
+    __table_args__ = (
+        Index("ix_sync_changes_row", "table_name", "row_id", "seq"),
+        Index("ix_sync_changes_txid", "txid", "seq"),
+    )
+
+class SyncState(Base):
+    # Cursores da sincronização no nó (último seq enviado e recebido)
+    __tablename__ = "sync_state"
+
+    key = Column(String(64), primary_key=True)
+    value = Column(String, nullable=False)
+
+class AuditLog(Base):
+    # Alterações em pacientes e agendamentos feitas pela API (LGPD). Gravado em
+    # lotes por audit.py; changes guarda os campos alterados como [antes, depois].
+    __tablename__ = "audit_log"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    table_name = Column(String(64), nullable=False)
+    row_id = Column(String(36), nullable=False)
+    action = Column(String(8), nullable=False)
+    user_id = Column(UUID(as_uuid=True))
+    user_email = Column(String)
+    changes = Column(JSON, nullable=False)
+    changed_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_audit_log_row", "table_name", "row_id", "changed_at"),
+        Index("ix_audit_log_user", "user_id", "changed_at"),
+    )
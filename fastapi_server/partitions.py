@@ -0,0 +1,104 @@
+"""Manutenção das partições mensais de ``appointments`` (PostgreSQL).
+
+A migração c3d8e1f2a7b4 particiona a tabela por mês de ``appointment_date``.
+Esta tarefa cria antecipadamente as partições dos próximos meses; se já
+houver linhas daquele mês na partição default, elas são movidas para a nova
+partição na mesma transação.
+"""
+import os
+from datetime import date
+from typing import List, Tuple
+
+from sqlalchemy import text
+
+import jobs
+import metrics
+from database import engine
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_CHECK_INTERVAL = float(os.getenv("PARTITION_CHECK_INTERVAL", str(6 * 3600)))
+
+PARENT_TABLE = "appointments"
+DEFAULT_PARTITION = "appointments_default"
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"{PARENT_TABLE}_y{year:04d}m{month:02d}"
+
+
+def month_bounds(year: int, month: int) -> Tuple[str, str]:
+    """Limites [início, fim) do mês no formato usado em appointment_date."""
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01", f"{next_year:04d}-{next_month:02d}-01"
+
+
+def upcoming_months(start: date, months: int) -> List[Tuple[int, int]]:
+    """O mês de ``start`` e os ``months`` meses seguintes."""
+    result = []
+    year, month = start.year, start.month
+    for _ in range(months + 1):
+        result.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return result
+
+
+def is_partitioned(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass(:table))"
+    ), {"table": PARENT_TABLE}).scalar()
+
+
+def ensure_partition(connection, year: int, month: int) -> bool:
+    """Cria a partição do mês se não existir. Retorna True se criou."""
+    name = partition_name(year, month)
+    start, end = month_bounds(year, month)
+    bounds = {"start": start, "end": end}
+    with connection.begin():
+        if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+            return False
+
+        # Impede inserções na default enquanto as linhas do mês são movidas
+        connection.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE"))
+        connection.execute(text(
+            f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        moved = connection.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE appointment_date >= :start AND appointment_date < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ), bounds).rowcount
+        connection.execute(text(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        ))
+
+    metrics.increment("partitions.created")
+    if moved:
+        metrics.increment("partitions.rows_moved_from_default", moved)
+    print(f"[PARTITIONS] Criada {name} ({moved} linhas movidas da default)")
+    return True
+
+
+def maintain_appointment_partitions(months_ahead: int = PARTITION_MONTHS_AHEAD) -> int:
+    """Garante partições do mês atual até ``months_ahead`` meses à frente."""
+    created = 0
+    with engine.connect() as connection:
+        if not is_partitioned(connection):
+            return 0
+        connection.commit()
+        for year, month in upcoming_months(date.today(), months_ahead):
+            if ensure_partition(connection, year, month):
+                created += 1
+    return created
+
+
+jobs.register_job(
+    "appointment_partitions",
+    PARTITION_CHECK_INTERVAL,
+    maintain_appointment_partitions,
+    run_on_startup=True,
+    singleton=True,
+)
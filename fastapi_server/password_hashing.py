@@ -0,0 +1,207 @@
+"""Configuração e calibração do hash de senhas.
+
+Esquemas (``PASSWORD_HASH_SCHEME``): ``bcrypt`` (padrão) ou ``argon2`` (argon2id).
+Hashes do outro esquema continuam válidos e são convertidos no próximo login.
+
+O custo é fixado por ``BCRYPT_ROUNDS`` / ``ARGON2_TIME_COST`` ou calibrado para
+``PASSWORD_HASH_TARGET_MS`` neste hardware:
+- ``python password_hashing.py --calibrate`` mede e imprime as variáveis;
+- ``PASSWORD_HASH_CALIBRATE=startup`` calibra na inicialização e guarda o
+  resultado em ``PASSWORD_HASH_CALIBRATION_FILE``, reaproveitado pelos demais
+  workers e reinícios.
+
+Hashes com parâmetros diferentes dos configurados (esquema, custo, memória)
+são refeitos no login bem-sucedido; veja ``verify_and_update``.
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt").lower()
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250"))
+PASSWORD_HASH_CALIBRATE = os.getenv("PASSWORD_HASH_CALIBRATE", "off").lower()
+PASSWORD_HASH_CALIBRATION_FILE = os.getenv("PASSWORD_HASH_CALIBRATION_FILE", "data/password_hash.json")
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+ARGON2_TIME_COST = os.getenv("ARGON2_TIME_COST")
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "2"))
+
+SCHEMES = ("bcrypt", "argon2")
+# Limites aceitos pela calibração
+MIN_BCRYPT_ROUNDS, MAX_BCRYPT_ROUNDS = 10, 16
+MIN_ARGON2_TIME_COST, MAX_ARGON2_TIME_COST = 1, 10
+
+
+@dataclass
+class HashSettings:
+    scheme: str
+    bcrypt_rounds: int = 12
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = ARGON2_MEMORY_COST
+    argon2_parallelism: int = ARGON2_PARALLELISM
+
+
+def build_context(settings: HashSettings) -> CryptContext:
+    """CryptContext em que só o esquema e os parâmetros configurados estão em dia."""
+    if settings.scheme not in SCHEMES:
+        raise ValueError(f"PASSWORD_HASH_SCHEME inválido: {settings.scheme}")
+    other = "bcrypt" if settings.scheme == "argon2" else "argon2"
+    rounds = settings.bcrypt_rounds
+    time_cost = settings.argon2_time_cost
+    return CryptContext(
+        schemes=[settings.scheme, other],
+        default=settings.scheme,
+        deprecated=[other],
+        # min == max: custo diferente do configurado marca o hash para atualização
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+        argon2__type="ID",
+        argon2__default_rounds=time_cost,
+        argon2__min_rounds=time_cost,
+        argon2__max_rounds=time_cost,
+        argon2__memory_cost=settings.argon2_memory_cost,
+        argon2__parallelism=settings.argon2_parallelism,
+    )
+
+
+def _measure_ms(settings: HashSettings, samples: int = 3) -> float:
+    context = build_context(settings)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash("calibration-password")
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(settings: HashSettings, target_ms: float) -> HashSettings:
+    """Maior custo cujo hash fica dentro de ``target_ms`` neste hardware."""
+    if settings.scheme == "bcrypt":
+        # Cada round a mais dobra o tempo: mede no mínimo e extrapola
+        base = _measure_ms(replace(settings, bcrypt_rounds=MIN_BCRYPT_ROUNDS))
+        rounds = MIN_BCRYPT_ROUNDS + max(0, math.floor(math.log2(target_ms / base)))
+        rounds = min(rounds, MAX_BCRYPT_ROUNDS)
+        while rounds > MIN_BCRYPT_ROUNDS and _measure_ms(replace(settings, bcrypt_rounds=rounds), 1) > target_ms:
+            rounds -= 1
+        return replace(settings, bcrypt_rounds=rounds)
+
+    # argon2: memória fixa, o tempo cresce linearmente com time_cost
+    base = _measure_ms(replace(settings, argon2_time_cost=MIN_ARGON2_TIME_COST))
+    time_cost = max(MIN_ARGON2_TIME_COST, min(MAX_ARGON2_TIME_COST, math.floor(target_ms / base)))
+    return replace(settings, argon2_time_cost=time_cost)
+
+
+def configured_settings() -> HashSettings:
+    settings = HashSettings(PASSWORD_HASH_SCHEME)
+    if BCRYPT_ROUNDS:
+        settings.bcrypt_rounds = int(BCRYPT_ROUNDS)
+    if ARGON2_TIME_COST:
+        settings.argon2_time_cost = int(ARGON2_TIME_COST)
+    return settings
+
+
+def _load_calibration(settings: HashSettings) -> Optional[HashSettings]:
+    try:
+        with open(PASSWORD_HASH_CALIBRATION_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("target_ms") != PASSWORD_HASH_TARGET_MS:
+        return None
+    stored = HashSettings(**data["settings"])
+    # Só vale para o mesmo esquema e a mesma memória/paralelismo
+    if (stored.scheme, stored.argon2_memory_cost, stored.argon2_parallelism) != \
+            (settings.scheme, settings.argon2_memory_cost, settings.argon2_parallelism):
+        return None
+    return stored
+
+
+def _save_calibration(settings: HashSettings, target_ms: float = PASSWORD_HASH_TARGET_MS) -> None:
+    directory = os.path.dirname(PASSWORD_HASH_CALIBRATION_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{PASSWORD_HASH_CALIBRATION_FILE}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"target_ms": target_ms, "settings": asdict(settings)}, f)
+    os.replace(temp_path, PASSWORD_HASH_CALIBRATION_FILE)
+
+
+def calibrated_settings() -> HashSettings:
+    """Configuração com o custo calibrado (do arquivo ou medido agora)."""
+    settings = configured_settings()
+    stored = _load_calibration(settings)
+    if stored is None:
+        stored = calibrate(settings, PASSWORD_HASH_TARGET_MS)
+        # Outro worker pode ter calibrado ao mesmo tempo: prevalece o arquivo
+        stored = _load_calibration(settings) or stored
+        _save_calibration(stored)
+    # Valores explícitos no ambiente têm prioridade
+    if BCRYPT_ROUNDS:
+        stored.bcrypt_rounds = int(BCRYPT_ROUNDS)
+    if ARGON2_TIME_COST:
+        stored.argon2_time_cost = int(ARGON2_TIME_COST)
+    return stored
+
+
+settings = configured_settings()
+context = build_context(settings)
+
+
+def configure(new_settings: HashSettings) -> None:
+    global settings, context
+    context = build_context(new_settings)
+    settings = new_settings
+
+
+def hash_password(password: str) -> str:
+    return context.hash(password)
+
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Verifica a senha; se o hash estiver desatualizado, retorna também o novo."""
+    return context.verify_and_update(password, hashed)
+
+
+def dummy_verify() -> None:
+    """Gasta o mesmo tempo de uma verificação (usuário inexistente)."""
+    context.dummy_verify()
+
+
+def calibrate_on_startup() -> None:
+    """Aquecimento registrado por ``startup`` com ``PASSWORD_HASH_CALIBRATE=startup``."""
+    calibrated = calibrated_settings()
+    configure(calibrated)
+    print(f"[PASSWORDS] {calibrated.scheme} calibrado: {asdict(calibrated)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Calibra o custo do hash de senhas")
+    parser.add_argument("--calibrate", action="store_true", required=True)
+    parser.add_argument("--scheme", choices=SCHEMES, default=PASSWORD_HASH_SCHEME)
+    parser.add_argument("--target-ms", type=float, default=PASSWORD_HASH_TARGET_MS)
+    parser.add_argument("--write", action="store_true", help=f"grava em {PASSWORD_HASH_CALIBRATION_FILE}")
+    args = parser.parse_args()
+
+    result = calibrate(replace(configured_settings(), scheme=args.scheme), args.target_ms)
+    print(f"Hash medido: {_measure_ms(result):.0f} ms (alvo {args.target_ms:.0f} ms)")
+    print(f"PASSWORD_HASH_SCHEME={result.scheme}")
+    if result.scheme == "bcrypt":
+        print(f"BCRYPT_ROUNDS={result.bcrypt_rounds}")
+    else:
+        print(f"ARGON2_TIME_COST={result.argon2_time_cost}")
+        print(f"ARGON2_MEMORY_COST={result.argon2_memory_cost}")
+        print(f"ARGON2_PARALLELISM={result.argon2_parallelism}")
+    if args.write:
+        _save_calibration(result, args.target_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Perfil de uma requisição sob demanda, para superusuários.
+
+Uma requisição com ``X-Profile: 1`` e token de superusuário roda com:
+
+- um amostrador de pilhas: uma thread lê a pilha do event loop a cada
+  ``PROFILE_SAMPLE_INTERVAL_MS`` ms (``sys._current_frames``), contando só as
+  amostras em que a task da requisição está executando. As pilhas ficam no
+  formato "folded" (``a;b;c N``), aberto por flamegraph.pl e speedscope;
+- uma linha do tempo do SQL: início, duração e texto de cada comando (sem os
+  parâmetros, que podem conter dados de pacientes), inclusive os executados
+  no threadpool.
+
+O resultado vai para ``PROFILE_DIR``, que guarda no máximo
+``PROFILE_MAX_FILES`` perfis (os mais antigos são apagados), e a resposta traz
+``X-Profile-Id`` para baixar em ``GET /api/profiles/{id}``.
+
+Sem o cabeçalho o custo é só procurá-lo na lista de cabeçalhos: os listeners
+do SQLAlchemy existem apenas enquanto algum perfil está em andamento. Trechos
+executados em threads (``run_in_threadpool``) aparecem na linha do tempo do
+SQL, mas não nas pilhas amostradas.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import metrics
+from auth import verify_token
+from database import SessionLocal
+from models import User
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("data", "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "1"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_MAX_SQL = int(os.getenv("PROFILE_MAX_SQL", "5000"))
+
+HEADER = b"x-profile"
+ID_HEADER = b"x-profile-id"
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$")
+SQL_TEXT_LIMIT = 2000
+
+_current: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("profile", default=None)
+_active = 0
+_active_lock = threading.Lock()
+
+
+class Profile:
+    """Estado de uma requisição perfilada: amostras de pilha e linha do tempo do SQL."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, task: asyncio.Task):
+        started = datetime.now(timezone.utc)
+        self.id = f"{started.strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        self.started_at = started
+        self.started = time.perf_counter()
+        self.loop = loop
+        self.task = task
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.other_tasks = 0
+        self.sql: List[dict] = []
+        self.sql_dropped = 0
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name=f"profile-{self.id}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> float:
+        self._stopping.set()
+        self._thread.join(timeout=1)
+        return time.perf_counter() - self.started
+
+    def _sample(self) -> None:
+        interval = PROFILE_SAMPLE_INTERVAL_MS / 1000
+        deadline = self.started + PROFILE_MAX_SECONDS
+        while not self._stopping.wait(interval) and time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            if asyncio.current_task(self.loop) is not self.task:
+                # O event loop está atendendo outra requisição
+                self.other_tasks += 1
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def record_sql(self, statement: str, started: float, seconds: float, rowcount: int) -> None:
+        if len(self.sql) >= PROFILE_MAX_SQL:
+            self.sql_dropped += 1
+            return
+        self.sql.append({
+            "start_ms": round((started - self.started) * 1000, 3),
+            "duration_ms": round(seconds * 1000, 3),
+            "rows": rowcount,
+            "thread": threading.current_thread().name,
+            "statement": statement[:SQL_TEXT_LIMIT],
+        })
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is None or not conn.info.get("profile_started"):
+        return
+    started = conn.info["profile_started"].pop()
+    profile.record_sql(statement, started, time.perf_counter() - started, cursor.rowcount)
+
+
+def _attach_listeners() -> None:
+    global _active
+    with _active_lock:
+        _active += 1
+        if _active == 1:
+            event.listen(Engine, "before_cursor_execute", _before_execute)
+            event.listen(Engine, "after_cursor_execute", _after_execute)
+
+
+def _detach_listeners() -> None:
+    global _active
+    with _active_lock:
+        _active -= 1
+        if _active == 0:
+            event.remove(Engine, "before_cursor_execute", _before_execute)
+            event.remove(Engine, "after_cursor_execute", _after_execute)
+
+
+def _superuser(scope: Scope) -> Optional[str]:
+    """E-mail do token Bearer se ele for de um superusuário ativo."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            email = verify_token(token.strip()) if scheme.lower() == "bearer" else None
+            if email is None:
+                return None
+            with SessionLocal() as db:
+                user = db.query(User.is_active, User.is_superuser).filter(User.email == email).first()
+            return email if user and user.is_active and user.is_superuser else None
+    return None
+
+
+def save(profile: Profile, scope: Scope, status: int, seconds: float, email: str) -> str:
+    """Grava o perfil no diretório e apaga os mais antigos além do limite."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    data = {
+        "id": profile.id,
+        "started_at": profile.started_at.isoformat(),
+        "method": scope["method"],
+        "path": scope["path"],
+        # Só os nomes: valores de busca podem identificar pacientes
+        "query_params": sorted({part.split(b"=")[0].decode("latin-1") for part in scope["query_string"].split(b"&") if part}),
+        "status": status,
+        "user": email,
+        "duration_ms": round(seconds * 1000, 3),
+        "sample_interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+        "samples": sum(profile.stacks.values()),
+        "samples_other_tasks": profile.other_tasks,
+        "sql_count": len(profile.sql) + profile.sql_dropped,
+        "sql_ms": round(sum(entry["duration_ms"] for entry in profile.sql), 3),
+        "sql_dropped": profile.sql_dropped,
+        "stacks": profile.folded(),
+        "sql": profile.sql,
+    }
+    path = os.path.join(PROFILE_DIR, f"{profile.id}.json")
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(data, handle, ensure_ascii=False)
+    os.replace(temporary, path)
+
+    # Os nomes começam pelo horário: a ordem alfabética é a cronológica
+    for name in list_profiles()[PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, f"{name}.json"))
+        except FileNotFoundError:
+            pass
+    return path
+
+
+def list_profiles() -> List[str]:
+    """Ids dos perfis guardados, do mais recente para o mais antigo."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = [name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json")]
+    return sorted((name for name in names if PROFILE_ID.match(name)), reverse=True)
+
+
+def load(profile_id: str) -> Optional[dict]:
+    """Perfil guardado, ou ``None`` se o id não existe (ou já saiu do buffer)."""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI que perfila as requisições com ``X-Profile: 1`` de superusuários."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        for name, value in scope["headers"]:
+            if name == HEADER:
+                break
+        else:
+            return await self.app(scope, receive, send)
+        email = await asyncio.to_thread(_superuser, scope) if value.strip() in (b"1", b"true") else None
+        if email is None:
+            # Sem permissão o cabeçalho é ignorado e a requisição segue normal
+            metrics.increment("profiling.denied")
+            return await self.app(scope, receive, send)
+
+        profile = Profile(asyncio.get_running_loop(), asyncio.current_task())
+        status = 500
+
+        async def profile_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(ID_HEADER, profile.id.encode())]
+            await send(message)
+
+        token = _current.set(profile)
+        _attach_listeners()
+        profile.start()
+        try:
+            await self.app(scope, receive, profile_send)
+        finally:
+            seconds = profile.stop()
+            _detach_listeners()
+            _current.reset(token)
+            try:
+                await asyncio.to_thread(save, profile, scope, status, seconds, email)
+                metrics.increment("profiling.captured")
+                print(f"[PROFILE] {scope['method']} {scope['path']} em {seconds * 1000:.0f} ms: {profile.id}")
+            except OSError as e:
+                print(f"[PROFILE] Erro ao gravar o perfil {profile.id}: {e}")
@@ -0,0 +1,263 @@
+"""Limites de requisições nas rotas de autenticação.
+
+Login, cadastro e recuperação de senha fazem hash bcrypt ou enviam email.
+Antes de a rota rodar (sem consulta ao banco nem bcrypt), cada requisição
+consome um token dos baldes do IP e, quando o corpo traz ``email``, da conta.
+Sem token disponível a resposta é 429 com ``Retry-After``.
+
+Os limites são configurados como ``"N/S"``: até N requisições em rajada,
+repostas à taxa de N a cada S segundos. Vazio ou ``0`` desliga a regra.
+
+Baldes (``RATE_LIMIT_BACKEND``):
+- ``memory``: por worker, LRU limitado a ``RATE_LIMIT_MAX_KEYS``;
+- ``redis``: compartilhado entre workers (``RATE_LIMIT_REDIS_URL``, requer o
+  pacote ``redis``). Se o Redis falhar as requisições são liberadas.
+
+Além disso, as rotas que calculam hash de senha passam por um limite de
+concorrência por worker; quando a fila passa de ``RATE_LIMIT_HASH_QUEUE`` a
+resposta é 503 imediato em vez de acumular trabalho de CPU.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import metrics
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Atrás de um proxy reverso o IP do cliente vem em X-Forwarded-For
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() in ("1", "true", "yes")
+RATE_LIMIT_HASH_CONCURRENCY = int(os.getenv("RATE_LIMIT_HASH_CONCURRENCY", str(os.cpu_count() or 2)))
+RATE_LIMIT_HASH_QUEUE = int(os.getenv("RATE_LIMIT_HASH_QUEUE", "32"))
+RATE_LIMIT_HASH_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_HASH_WAIT_SECONDS", "5"))
+
+# Corpo lido para extrair o email; corpos maiores só passam pelo limite de IP
+MAX_BODY_BYTES = 16 * 1024
+
+
+@dataclass
+class Rule:
+    name: str
+    capacity: float
+    rate: float  # tokens por segundo
+
+
+def parse_rule(name: str, default: str) -> Optional[Rule]:
+    value = os.getenv(f"RATE_LIMIT_{name.upper()}", default).strip()
+    if not value or value == "0":
+        return None
+    count, _, seconds = value.partition("/")
+    capacity = float(count)
+    return Rule(name, capacity, capacity / float(seconds or 60))
+
+
+@dataclass
+class PathLimits:
+    ip: Optional[Rule]
+    account: Optional[Rule]
+    hashes: bool
+
+
+PATHS: Dict[str, PathLimits] = {
+    "/api/auth/login": PathLimits(
+        parse_rule("login_ip", "30/60"), parse_rule("login_account", "5/60"), hashes=True
+    ),
+    "/api/auth/register": PathLimits(parse_rule("register_ip", "5/600"), None, hashes=True),
+    "/api/auth/forgot-password": PathLimits(
+        parse_rule("forgot_ip", "5/600"), parse_rule("forgot_account", "3/3600"), hashes=False
+    ),
+    "/api/auth/reset-password": PathLimits(parse_rule("reset_ip", "10/600"), None, hashes=True),
+}
+
+
+class MemoryBuckets:
+    """Baldes do próprio worker; os menos usados são descartados."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rule: Rule) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (rule.capacity, now))
+            tokens = min(rule.capacity, tokens + (now - updated) * rule.rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rule.rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+
+# Balde atômico no Redis, com o relógio do servidor (igual para todos os workers)
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisBuckets:
+    """Baldes compartilhados no Redis; erros liberam a requisição."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, rule: Rule) -> float:
+        try:
+            result = await self._script(keys=[f"ratelimit:{key}"], args=[rule.capacity, rule.rate])
+            return float(result)
+        except Exception as e:
+            metrics.increment("rate_limit.backend_errors")
+            print(f"[RATE_LIMIT] Erro no Redis, requisição liberada: {e}")
+            return 0.0
+
+
+class ConcurrencyGate:
+    """Limita as requisições simultâneas com hash de senha e recusa o excesso."""
+
+    def __init__(self, limit: int, max_waiting: int):
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self, timeout: float) -> bool:
+        if not self._semaphore.locked():
+            # Vaga livre: adquire sem ceder o event loop
+            return await self._semaphore.acquire()
+        if self.waiting >= self.max_waiting:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+
+def client_ip(scope: Scope) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                # Último endereço: o que o nosso proxy viu
+                return value.decode("latin-1").split(",")[-1].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _account(body: bytes) -> Optional[str]:
+    try:
+        email = json.loads(body).get("email")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(email, str) or not email:
+        return None
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()
+
+
+def _too_many(retry_after: float, status_code: int = 429, detail: str = "Too many requests, try again later"):
+    return JSONResponse(
+        {"detail": detail}, status_code=status_code, headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class RateLimitMiddleware:
+    """Middleware ASGI que aplica os limites antes de a rota ser executada."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.buckets = RedisBuckets(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_BACKEND == "redis" \
+            else MemoryBuckets(RATE_LIMIT_MAX_KEYS)
+        self._gate: Optional[ConcurrencyGate] = None
+
+    @property
+    def gate(self) -> ConcurrencyGate:
+        # Criado no event loop do servidor
+        if self._gate is None:
+            self._gate = ConcurrencyGate(RATE_LIMIT_HASH_CONCURRENCY, RATE_LIMIT_HASH_QUEUE)
+            metrics.register_gauge("rate_limit.hash_waiting", lambda: self._gate.waiting)
+        return self._gate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limits = PATHS.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limits is None or not RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+
+        if limits.ip:
+            retry_after = await self.buckets.take(f"{limits.ip.name}:{client_ip(scope)}", limits.ip)
+            if retry_after:
+                metrics.increment(f"rate_limit.rejected.{limits.ip.name}")
+                return await _too_many(retry_after)(scope, receive, send)
+
+        messages: List[Message] = []
+        if limits.account:
+            size = 0
+            while True:
+                message = await receive()
+                messages.append(message)
+                size += len(message.get("body", b""))
+                if not message.get("more_body") or size > MAX_BODY_BYTES:
+                    break
+            account = _account(b"".join(m.get("body", b"") for m in messages)) if size <= MAX_BODY_BYTES else None
+            if account:
+                retry_after = await self.buckets.take(f"{limits.account.name}:{account}", limits.account)
+                if retry_after:
+                    metrics.increment(f"rate_limit.rejected.{limits.account.name}")
+                    return await _too_many(retry_after)(scope, receive, send)
+
+        async def replay_receive() -> Message:
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        if not limits.hashes:
+            return await self.app(scope, replay_receive, send)
+
+        gate = self.gate
+        if not await gate.acquire(RATE_LIMIT_HASH_WAIT_SECONDS):
+            metrics.increment("rate_limit.shed")
+            return await _too_many(1, 503, "Server is busy, try again")(scope, receive, send)
+        try:
+            await self.app(scope, replay_receive, send)
+        finally:
+            gate.release()
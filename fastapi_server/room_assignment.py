@@ -0,0 +1,274 @@
+"""Distribuição automática de salas para os agendamentos de um dia.
+
+``assign_rooms`` é particionamento de intervalos guloso: os agendamentos sem
+sala são percorridos por horário de início e cada um fica com uma sala livre
+compatível. Compatível é a sala disponível (``is_available``) do tipo exigido
+pelo tipo de consulta (``required_room_type``) que tem todos os equipamentos
+exigidos (``required_equipment``). Entre as livres, vence a de menor sobra de
+equipamentos, deixando as salas mais equipadas para quem precisa delas.
+
+Cada grupo de exigências tem dois heaps de salas: as ocupadas, por horário em
+que ficam livres, e as livres, pela sobra de equipamentos. Quando uma sala é
+usada por um grupo, as entradas dela nos outros grupos ficam obsoletas (versão
+da sala) e são descartadas ao sair do heap. O custo é O(n log n) por grupo.
+Agendamentos que já têm sala ocupam a sala no dia e não são movidos.
+
+``assign_day`` lê o dia com as agendas das salas travadas (como numa marcação)
+e grava tudo em um único ``UPDATE``. Estatísticas, eventos, auditoria e o log
+da sincronização seguem as linhas devolvidas pelo ``RETURNING``: um agendamento
+cancelado ou que ganhou sala depois da leitura fica de fora.
+"""
+import heapq
+import re
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, literal, select, update
+from sqlalchemy.orm import Session
+
+import audit
+import booking
+import edge_sync
+import events
+import metrics
+import stats
+from models import Appointment, AppointmentType, ClinicRoom
+
+
+@dataclass(frozen=True)
+class Need:
+    """Agendamento sem sala: intervalo em minutos do dia e exigências."""
+    id: object
+    start: int
+    end: int
+    room_type: Optional[str] = None
+    equipment: FrozenSet[str] = frozenset()
+
+
+@dataclass(frozen=True)
+class Room:
+    id: object
+    room_number: str
+    room_type: str
+    equipment: FrozenSet[str] = frozenset()
+
+
+def parse_equipment(value: Optional[str]) -> FrozenSet[str]:
+    """Lista de equipamentos em texto livre ("raio-x, maca; ultrassom")."""
+    return frozenset(item.strip().casefold() for item in re.split(r"[,;\n]", value or "") if item.strip())
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _fits(room: Room, need_type: Optional[str], need_equipment: FrozenSet[str]) -> bool:
+    if need_type and room.room_type.strip().casefold() != need_type:
+        return False
+    return need_equipment <= room.equipment
+
+
+def _group_key(need: Need) -> Tuple[Optional[str], FrozenSet[str]]:
+    return (need.room_type.strip().casefold() if need.room_type else None, need.equipment)
+
+
+def _merged(intervals: Sequence[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    """Intervalos ocupados unidos e ordenados (inícios, fins), para busca binária."""
+    starts: List[int] = []
+    ends: List[int] = []
+    for start, end in sorted(intervals):
+        if ends and start < ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def assign_rooms(
+    needs: Sequence[Need],
+    rooms: Sequence[Room],
+    occupied: Optional[Dict[object, Sequence[Tuple[int, int]]]] = None
+) -> Tuple[Dict[object, object], List[object]]:
+    """Escolhe uma sala para cada agendamento.
+
+    ``occupied`` traz, por sala, os intervalos já ocupados no dia. Retorna
+    ``{agendamento: sala}`` e os agendamentos que ficaram sem sala compatível.
+    """
+    occupied = occupied or {}
+    fixed = [_merged(occupied.get(room.id, ())) for room in rooms]
+
+    groups: Dict[Tuple[Optional[str], FrozenSet[str]], List[int]] = {}
+    for need in needs:
+        key = _group_key(need)
+        if key not in groups:
+            groups[key] = [index for index, room in enumerate(rooms) if _fits(room, *key)]
+
+    room_groups: Dict[int, List[tuple]] = defaultdict(list)
+    busy: Dict[tuple, list] = {}
+    idle: Dict[tuple, list] = {}
+    for key, compatible in groups.items():
+        for index in compatible:
+            room_groups[index].append(key)
+        busy[key] = []
+        # (sobra de equipamentos, número da sala, índice, versão)
+        idle[key] = [(len(rooms[index].equipment - key[1]), rooms[index].room_number, index, 0) for index in compatible]
+        heapq.heapify(idle[key])
+    version = [0] * len(rooms)
+
+    # Mais restritos primeiro entre os que começam no mesmo horário
+    ordered = sorted(needs, key=lambda need: (need.start, len(groups[_group_key(need)]), -need.end))
+    result: Dict[object, object] = {}
+    unassigned: List[object] = []
+    for need in ordered:
+        key = _group_key(need)
+        waiting, free = busy[key], idle[key]
+        while waiting and waiting[0][0] <= need.start:
+            _, index, room_version = heapq.heappop(waiting)
+            if room_version == version[index]:
+                heapq.heappush(free, (len(rooms[index].equipment - key[1]), rooms[index].room_number, index, room_version))
+
+        chosen = None
+        skipped = []
+        while free:
+            entry = heapq.heappop(free)
+            index = entry[2]
+            if entry[3] != version[index]:
+                continue
+            starts, ends = fixed[index]
+            position = bisect_left(starts, need.end)
+            if position and ends[position - 1] > need.start:
+                # Livre na varredura, mas já ocupada por um agendamento com sala
+                skipped.append(entry)
+                continue
+            chosen = index
+            break
+        for entry in skipped:
+            heapq.heappush(free, entry)
+
+        if chosen is None:
+            unassigned.append(need.id)
+            continue
+        version[chosen] += 1
+        for other in room_groups[chosen]:
+            heapq.heappush(busy[other], (need.end, chosen, version[chosen]))
+        result[need.id] = rooms[chosen].id
+    return result, unassigned
+
+
+def assign_day(db: Session, appointment_date: str, dry_run: bool = False) -> Tuple[Dict[object, object], List[object]]:
+    """Distribui salas aos agendamentos ativos sem sala da data e faz commit."""
+    started = time.perf_counter()
+    rooms = [
+        Room(id=room.id, room_number=room.room_number, room_type=room.room_type,
+             equipment=parse_equipment(room.equipment))
+        for room in db.query(ClinicRoom).filter(ClinicRoom.is_available == True).order_by(ClinicRoom.room_number)
+    ]
+    if not dry_run:
+        # Mesmas chaves das marcações: ninguém ocupa uma sala do dia enquanto isso
+        booking.lock_keys_blocking(db, [f"room:{room.id}:{appointment_date}" for room in rooms])
+
+    types = {
+        row.id: row for row in db.execute(select(
+            AppointmentType.id,
+            AppointmentType.duration,
+            AppointmentType.required_room_type,
+            AppointmentType.required_equipment,
+        )).all()
+    }
+    rows = db.execute(
+        select(
+            Appointment.id,
+            Appointment.doctor_id,
+            Appointment.room_id,
+            Appointment.appointment_type_id,
+            Appointment.appointment_date,
+            Appointment.appointment_time,
+        ).where(
+            Appointment.appointment_date == appointment_date,
+            Appointment.status.in_(booking.ACTIVE_STATUSES),
+        )
+    ).all()
+
+    def interval(row) -> Tuple[int, int]:
+        appointment_type = types.get(row.appointment_type_id)
+        start = _minutes(row.appointment_time)
+        return start, start + booking.parse_duration(appointment_type.duration if appointment_type else None)
+
+    occupied: Dict[object, List[Tuple[int, int]]] = defaultdict(list)
+    needs = []
+    for row in rows:
+        if row.room_id is not None:
+            occupied[row.room_id].append(interval(row))
+            continue
+        appointment_type = types.get(row.appointment_type_id)
+        start, end = interval(row)
+        needs.append(Need(
+            id=row.id, start=start, end=end,
+            room_type=appointment_type.required_room_type if appointment_type else None,
+            equipment=parse_equipment(appointment_type.required_equipment if appointment_type else None),
+        ))
+
+    assignments, unassigned = assign_rooms(needs, rooms, occupied)
+    metrics.observe("rooms.assign", time.perf_counter() - started)
+    if dry_run or not assignments:
+        db.rollback()
+        return assignments, unassigned
+
+    updated = db.execute(
+        update(Appointment)
+        .where(
+            Appointment.id.in_(list(assignments)),
+            Appointment.appointment_date == appointment_date,
+            Appointment.room_id.is_(None),
+            Appointment.status.in_(booking.ACTIVE_STATUSES),
+        )
+        .values(
+            # Parâmetros com o tipo das colunas (no SQLite o UUID é gravado como texto)
+            room_id=case(*(
+                (Appointment.id == appointment_id, literal(room_id, Appointment.room_id.type))
+                for appointment_id, room_id in assignments.items()
+            )),
+            updated_at=datetime.now(timezone.utc),
+            row_version=Appointment.row_version + 1,
+        )
+        .returning(
+            Appointment.id,
+            Appointment.doctor_id,
+            Appointment.appointment_date,
+            Appointment.appointment_time,
+            Appointment.status,
+            Appointment.row_version,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    # Só as linhas realmente alteradas, com os valores atuais (não os da leitura)
+    assignments = {row.id: assignments[row.id] for row in updated}
+    deltas: Counter = Counter()
+    for row in updated:
+        room_id = assignments[row.id]
+        before = SimpleNamespace(
+            id=row.id, doctor_id=row.doctor_id, room_id=None,
+            appointment_date=row.appointment_date, appointment_time=row.appointment_time, status=row.status,
+        )
+        assigned = SimpleNamespace(**{**vars(before), "room_id": room_id})
+        deltas[stats.appointment_key(before)] -= 1
+        deltas[stats.appointment_key(assigned)] += 1
+        events.publish(db, "updated", assigned, events.snapshot(before))
+        audit.record(db, Appointment, row.id, "update", {"room_id": [None, str(room_id)]})
+    for key, delta in deltas.items():
+        if delta:
+            stats.apply_delta(db, key, delta)
+    edge_sync.log_rows(db, Appointment, [(row.id, row.row_version) for row in updated])
+    db.commit()
+
+    metrics.increment("rooms.assigned", len(assignments))
+    metrics.increment("rooms.unassigned", len(unassigned))
+    print(f"[ROOMS] {appointment_date}: {len(assignments)} salas distribuídas, {len(unassigned)} sem sala compatível")
+    return assignments, unassigned
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from datetime import date
+
+from database import get_read_db
+from schemas import UtilizationReport, User as UserSchema
+from auth import get_current_active_user
+
+router = APIRouter()
+
+@router.get("/utilization", response_model=UtilizationReport)
+async def get_utilization(
+    start_date: date = Query(..., description="Data inicial, inclusiva (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Data final, inclusiva (YYYY-MM-DD)"),
+    resource: str = Query("room", pattern="^(room|doctor)$", description="room ou doctor"),
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Ocupação semanal, mapa de calor (dia da semana x hora) e intervalos ociosos."""
+    
+    # NumPy só é carregado quando o relatório é pedido
+    import analytics
+    
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must be on or after start_date"
+        )
+    
+    if (end_date - start_date).days + 1 > analytics.ANALYTICS_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Period must be at most {analytics.ANALYTICS_MAX_DAYS} days"
+        )
+    
+    return analytics.utilization_report(db, resource, start_date, end_date)
@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import uuid
 
-from database import get_db
+import batch
+import counts
+from database import get_db, get_read_db
 from models import AppointmentType
 from schemas import (
     AppointmentType as AppointmentTypeSchema,
     AppointmentTypeCreate,
     AppointmentTypeUpdate,
+    BatchRequest,
+    BatchResult,
     User as UserSchema
 )
 from auth import get_current_active_user
@@ -17,10 +21,12 @@ router = APIRouter()
 
 @router.get("/", response_model=List[AppointmentTypeSchema])
 async def get_appointment_types(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     is_active: Optional[bool] = Query(None, description="Filtrar por status ativo"),
-    db: Session = Depends(get_db),
+    include_total: bool = Query(False, description="Incluir X-Total-Count na resposta"),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Listar tipos de consulta com filtros."""
@@ -31,13 +37,27 @@ async def get_appointment_types(
     if is_active is not None:
         query = query.filter(AppointmentType.is_active == is_active)
     
+    if include_total:
+        counts.set_total_header(response, db, query, AppointmentType, filtered=is_active is not None)
+    
     appointment_types = query.offset(skip).limit(limit).all()
     return appointment_types
 
+@router.post("/batch", response_model=BatchResult[AppointmentTypeSchema])
+async def batch_get_appointment_types(
+    request: BatchRequest,
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Obter vários tipos de consulta por ID, na ordem pedida."""
+    
+    items, missing = batch.fetch_by_ids(db, AppointmentType, request.ids)
+    return {"items": items, "missing": missing}
+
 @router.get("/{type_id}", response_model=AppointmentTypeSchema)
 async def get_appointment_type(
     type_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Obter tipo de consulta por ID."""
@@ -202,7 +222,7 @@ async def toggle_appointment_type_status(
 @router.get("/search/by-name", response_model=List[AppointmentTypeSchema])
 async def search_appointment_types_by_name(
     name: str = Query(..., description="Nome ou parte do nome do tipo de consulta"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Buscar tipos de consulta por nome."""
@@ -1,45 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Response
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 import uuid
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 
-from database import get_db
-from models import Appointment, Patient, Doctor, ClinicRoom, AppointmentType
+import archive
+import batch
+import booking
+import counts
+import events
+import room_assignment
+import stats
+import tuss
+import waitlist
+from audit import get_audited_db
+from database import get_read_db
+from models import Appointment, Patient, Doctor, ClinicRoom, AppointmentType, AppointmentProcedure
 from schemas import (
     Appointment as AppointmentSchema,
     AppointmentCreate,
     AppointmentUpdate,
+    AppointmentProcedure as AppointmentProcedureSchema,
+    AppointmentProcedureItem,
+    BatchRequest,
+    BatchResult,
+    RoomAssignmentResult,
     User as UserSchema
 )
 from auth import get_current_active_user
 
 router = APIRouter()
 
+# Relacionamentos serializados em AppointmentSchema, inclusive o plano do paciente
+APPOINTMENT_RELATIONS = (
+    joinedload(Appointment.patient).joinedload(Patient.insurance_plan),
+    joinedload(Appointment.doctor),
+    joinedload(Appointment.room),
+    joinedload(Appointment.appointment_type),
+)
+
 @router.get("/", response_model=List[AppointmentSchema])
 async def get_appointments(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     date_filter: Optional[str] = Query(None, description="Filtrar por data (YYYY-MM-DD)"),
+    start_date: Optional[str] = Query(None, description="Data inicial, inclusiva (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Data final, inclusiva (YYYY-MM-DD)"),
     doctor_id: Optional[uuid.UUID] = Query(None, description="Filtrar por médico"),
     patient_id: Optional[uuid.UUID] = Query(None, description="Filtrar por paciente"),
     status: Optional[str] = Query(None, description="Filtrar por status"),
-    db: Session = Depends(get_db),
+    include_total: bool = Query(False, description="Incluir X-Total-Count na resposta"),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Listar agendamentos com filtros."""
     
-    query = db.query(Appointment).options(
-        joinedload(Appointment.patient),
-        joinedload(Appointment.doctor),
-        joinedload(Appointment.room),
-        joinedload(Appointment.appointment_type)
-    )
+    query = db.query(Appointment).options(*APPOINTMENT_RELATIONS)
     
-    # Aplicar filtros
+    # Aplicar filtros (filtros por data limitam as partições mensais lidas)
     if date_filter:
         query = query.filter(Appointment.appointment_date == date_filter)
     
+    if start_date:
+        query = query.filter(Appointment.appointment_date >= start_date)
+    
+    if end_date:
+        query = query.filter(Appointment.appointment_date <= end_date)
+    
     if doctor_id:
         query = query.filter(Appointment.doctor_id == doctor_id)
     
@@ -49,23 +79,87 @@ async def get_appointments(
     if status:
         query = query.filter(Appointment.status == status)
     
-    appointments = query.offset(skip).limit(limit).all()
-    return appointments
+    # Períodos anteriores ao corte do arquivamento também leem os arquivos frios
+    keyed = bool(doctor_id or patient_id)
+    if end_date and not (start_date or date_filter or keyed) and end_date < archive.archive_cutoff():
+        # Sem data inicial nem paciente/médico seria preciso ler todo o arquivo
+        raise HTTPException(
+            status_code=400,
+            detail="start_date, doctor_id or patient_id is required for archived periods"
+        )
+    archived = []
+    if archive.archive_applies(start_date, end_date, date_filter, keyed):
+        archived = archive.query_archive(start_date, end_date, date_filter, doctor_id, patient_id, status)
+    
+    if include_total:
+        filtered = any((date_filter, start_date, end_date, doctor_id, patient_id, status))
+        counts.set_total_header(response, db, query, Appointment, filtered=filtered, extra=len(archived))
+    
+    return _paginate_with_archive(db, query, archived, skip, limit)
+
+def _paginate_with_archive(db: Session, query, archived: list, skip: int, limit: int) -> list:
+    """Pagina os arquivados (mais antigos) seguidos das linhas da tabela."""
+    page = archive.hydrate(db, archived[skip:skip + limit]) if skip < len(archived) else []
+    remaining = limit - min(limit, max(0, len(archived) - skip))
+    if remaining:
+        page.extend(query.offset(max(0, skip - len(archived))).limit(remaining).all())
+    return page
+
+@router.post("/batch", response_model=BatchResult[AppointmentSchema])
+async def batch_get_appointments(
+    request: BatchRequest,
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Obter vários agendamentos por ID, na ordem pedida."""
+    
+    items, missing = batch.fetch_by_ids(db, Appointment, request.ids, *APPOINTMENT_RELATIONS)
+    return {"items": items, "missing": missing}
+
+@router.post("/assign-rooms/{date}", response_model=RoomAssignmentResult)
+async def assign_rooms(
+    date: str,
+    dry_run: bool = Query(False, description="Apenas calcular, sem gravar"),
+    db: Session = Depends(get_audited_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Distribuir salas compatíveis aos agendamentos do dia que ainda não têm sala."""
+    
+    try:
+        valid = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d") == date
+    except ValueError:
+        valid = False
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Date must be in YYYY-MM-DD format"
+        )
+    
+    async def attempt():
+        # A trava das salas espera na thread, fora do event loop
+        return await run_in_threadpool(room_assignment.assign_day, db, date, dry_run)
+    
+    assignments, unassigned = await booking.run_with_retries(db, attempt)
+    return {
+        "date": date,
+        "dry_run": dry_run,
+        "assigned": len(assignments),
+        "assignments": [
+            {"appointment_id": appointment_id, "room_id": room_id}
+            for appointment_id, room_id in assignments.items()
+        ],
+        "unassigned": unassigned,
+    }
 
 @router.get("/{appointment_id}", response_model=AppointmentSchema)
 async def get_appointment(
     appointment_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Obter agendamento por ID."""
     
-    appointment = db.query(Appointment).options(
-        joinedload(Appointment.patient),
-        joinedload(Appointment.doctor),
-        joinedload(Appointment.room),
-        joinedload(Appointment.appointment_type)
-    ).filter(Appointment.id == appointment_id).first()
+    appointment = db.query(Appointment).options(*APPOINTMENT_RELATIONS).filter(Appointment.id == appointment_id).first()
     if not appointment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -77,7 +171,7 @@ async def get_appointment(
 @router.post("/", response_model=AppointmentSchema, status_code=status.HTTP_201_CREATED)
 async def create_appointment(
     appointment_data: AppointmentCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_audited_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Criar novo agendamento."""
@@ -123,69 +217,46 @@ async def create_appointment(
             detail="Appointment type not found"
         )
     
-    # Verificar conflito de horário para o médico
-    # Buscar todas as consultas do médico na mesma data
-    existing_appointments = db.query(Appointment).filter(
-        Appointment.doctor_id == str(appointment_data.doctor_id),
-        Appointment.appointment_date == appointment_data.appointment_date,
-        Appointment.status.in_(["scheduled", "confirmed"])
-    ).all()
-    
-    # Verificar se há conflito de horário (considerando duração padrão de 30 minutos)
-    from datetime import datetime, timedelta
-    
-    new_start_time = datetime.strptime(appointment_data.appointment_time, "%H:%M")
-    new_end_time = new_start_time + timedelta(minutes=30)  # Duração padrão de 30 minutos
-    
-    for existing in existing_appointments:
-        existing_start_time = datetime.strptime(existing.appointment_time, "%H:%M")
-        existing_end_time = existing_start_time + timedelta(minutes=30)
+    async def book():
+        # Agendas do médico e da sala travadas até o commit: a verificação de
+        # conflito e a gravação não se intercalam com outra marcação
+        await booking.lock_schedules(
+            db, appointment_data.doctor_id, appointment_data.room_id, appointment_data.appointment_date
+        )
+        booking.ensure_available(
+            db,
+            appointment_data.doctor_id,
+            appointment_data.room_id,
+            appointment_data.appointment_date,
+            appointment_data.appointment_time
+        )
         
-        # Verificar sobreposição de horários
-        if (new_start_time < existing_end_time and new_end_time > existing_start_time):
+        # Criar agendamento
+        try:
+            db_appointment = Appointment(**appointment_data.dict())
+            db.add(db_appointment)
+            db.flush()
+            stats.record_change(db, None, stats.appointment_key(db_appointment))
+            events.publish(db, "created", db_appointment)
+            db.commit()
+            db.refresh(db_appointment)
+            return db_appointment
+        except OperationalError:
+            raise
+        except Exception as e:
+            db.rollback()
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Doctor already has an appointment from {existing.appointment_time} to {existing_end_time.strftime('%H:%M')} on this date"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error creating appointment"
             )
     
-    # Verificar conflito de horário para a sala (se fornecida)
-    if appointment_data.room_id:
-        existing_room_appointments = db.query(Appointment).filter(
-            Appointment.room_id == str(appointment_data.room_id),
-            Appointment.appointment_date == appointment_data.appointment_date,
-            Appointment.status.in_(["scheduled", "confirmed"])
-        ).all()
-        
-        for existing_room in existing_room_appointments:
-            existing_room_start_time = datetime.strptime(existing_room.appointment_time, "%H:%M")
-            existing_room_end_time = existing_room_start_time + timedelta(minutes=30)
-            
-            # Verificar sobreposição de horários para a sala
-            if (new_start_time < existing_room_end_time and new_end_time > existing_room_start_time):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Room is already booked from {existing_room.appointment_time} to {existing_room_end_time.strftime('%H:%M')} on this date"
-                )
-    
-    # Criar agendamento
-    try:
-        db_appointment = Appointment(**appointment_data.dict())
-        db.add(db_appointment)
-        db.commit()
-        db.refresh(db_appointment)
-        return db_appointment
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error creating appointment"
-        )
+    return await booking.run_with_retries(db, book)
 
 @router.put("/{appointment_id}", response_model=AppointmentSchema)
 async def update_appointment(
     appointment_id: uuid.UUID,
     appointment_data: AppointmentUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_audited_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Atualizar agendamento."""
@@ -201,53 +272,61 @@ async def update_appointment(
     # Verificações similares ao create, mas apenas para campos alterados
     update_data = appointment_data.dict(exclude_unset=True)
     
-    # Verificar conflitos de horário se data/hora/médico foram alterados
-    if any(field in update_data for field in ['doctor_id', 'appointment_date', 'appointment_time']):
-        doctor_id = update_data.get('doctor_id', appointment.doctor_id)
-        appointment_date = update_data.get('appointment_date', appointment.appointment_date)
-        appointment_time = update_data.get('appointment_time', appointment.appointment_time)
-        
-        # Buscar todas as consultas do médico na mesma data (exceto a atual)
-        existing_appointments = db.query(Appointment).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.appointment_date == appointment_date,
-            Appointment.status.in_(["scheduled", "confirmed"]),
-            Appointment.id != appointment_id
-        ).all()
-        
-        # Verificar sobreposição de horários
-        new_start_time = datetime.strptime(appointment_time, "%H:%M")
-        new_end_time = new_start_time + timedelta(minutes=30)
+    # Verificar se a nova sala existe e está disponível
+    if update_data.get('room_id') and update_data['room_id'] != appointment.room_id:
+        room = db.query(ClinicRoom).filter(
+            ClinicRoom.id == update_data['room_id'],
+            ClinicRoom.is_available == True
+        ).first()
+        if not room:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Room not found or unavailable"
+            )
+    
+    async def save():
+        # Verificar conflitos de horário se médico/sala/data/hora/status foram alterados
+        schedule_fields = ['doctor_id', 'room_id', 'appointment_date', 'appointment_time', 'status']
+        new_status = update_data.get('status') or appointment.status
+        if any(field in update_data for field in schedule_fields) and new_status in booking.ACTIVE_STATUSES:
+            doctor_id = update_data.get('doctor_id', appointment.doctor_id)
+            room_id = update_data.get('room_id', appointment.room_id)
+            appointment_date = update_data.get('appointment_date', appointment.appointment_date)
+            appointment_time = update_data.get('appointment_time', appointment.appointment_time)
+            
+            await booking.lock_schedules(db, doctor_id, room_id, appointment_date)
+            booking.ensure_available(
+                db, doctor_id, room_id, appointment_date, appointment_time, exclude_id=appointment_id
+            )
         
-        for existing in existing_appointments:
-            existing_start_time = datetime.strptime(existing.appointment_time, "%H:%M")
-            existing_end_time = existing_start_time + timedelta(minutes=30)
+        # Atualizar campos
+        try:
+            stats_before = stats.appointment_key(appointment)
+            event_before = events.snapshot(appointment)
+            for field, value in update_data.items():
+                setattr(appointment, field, value)
+            stats.record_change(db, stats_before, stats.appointment_key(appointment))
+            events.publish(db, "updated", appointment, event_before)
             
-            if (new_start_time < existing_end_time and new_end_time > existing_start_time):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Doctor already has an appointment from {existing.appointment_time} to {existing_end_time.strftime('%H:%M')} on this date"
-                )
+            db.commit()
+            db.refresh(appointment)
+            return appointment
+        except OperationalError:
+            raise
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error updating appointment"
+            )
     
-    # Atualizar campos
-    try:
-        for field, value in update_data.items():
-            setattr(appointment, field, value)
-        
-        db.commit()
-        db.refresh(appointment)
-        return appointment
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error updating appointment"
-        )
+    return await booking.run_with_retries(db, save)
 
 @router.delete("/{appointment_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def cancel_appointment(
     appointment_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_audited_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Cancelar agendamento."""
@@ -262,7 +341,11 @@ async def cancel_appointment(
     
     # Marcar como cancelado em vez de deletar
     try:
+        freed = waitlist.freed_slot(appointment) if appointment.status in booking.ACTIVE_STATUSES else None
+        stats_before = stats.appointment_key(appointment)
         appointment.status = "cancelled"
+        stats.record_change(db, stats_before, stats.appointment_key(appointment))
+        events.publish(db, "cancelled", appointment)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -270,17 +353,20 @@ async def cancel_appointment(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error cancelling appointment"
         )
+    
+    # A lista de espera é consultada depois que a resposta for enviada
+    waitlist.schedule_match(background_tasks, db, freed)
 
 @router.get("/doctor/{doctor_id}/date/{date}", response_model=List[AppointmentSchema])
 async def get_doctor_appointments_by_date(
     doctor_id: uuid.UUID,
     date: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Obter agendamentos de um médico em uma data específica."""
     
-    appointments = db.query(Appointment).filter(
+    appointments = db.query(Appointment).options(*APPOINTMENT_RELATIONS).filter(
         Appointment.doctor_id == doctor_id,
         Appointment.appointment_date == date,
         Appointment.status.in_(["scheduled", "confirmed"])
@@ -288,11 +374,40 @@ async def get_doctor_appointments_by_date(
     
     return appointments
 
+@router.get("/patient/{patient_id}/history", response_model=List[AppointmentSchema])
+async def get_patient_history(
+    patient_id: uuid.UUID,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    start_date: Optional[str] = Query(None, description="Data inicial, inclusiva (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Data final, inclusiva (YYYY-MM-DD)"),
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Histórico de agendamentos do paciente, incluindo os arquivados."""
+    
+    query = db.query(Appointment).options(*APPOINTMENT_RELATIONS).filter(Appointment.patient_id == patient_id)
+    
+    if start_date:
+        query = query.filter(Appointment.appointment_date >= start_date)
+    
+    if end_date:
+        query = query.filter(Appointment.appointment_date <= end_date)
+    
+    query = query.order_by(Appointment.appointment_date, Appointment.appointment_time)
+    
+    archived = []
+    if not start_date or start_date < archive.archive_cutoff():
+        archived = archive.query_archive(start_date, end_date, patient_id=patient_id)
+    
+    return _paginate_with_archive(db, query, archived, skip, limit)
+
 @router.patch("/{appointment_id}/status", response_model=AppointmentSchema)
 async def update_appointment_status(
     appointment_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     new_status: str = Query(..., description="Novo status do agendamento"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_audited_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Atualizar apenas o status do agendamento."""
@@ -313,9 +428,73 @@ async def update_appointment_status(
             detail="Appointment not found"
         )
     
-    # Atualizar status
+    async def save():
+        # Reativar um agendamento volta a ocupar o horário
+        if new_status in booking.ACTIVE_STATUSES and appointment.status not in booking.ACTIVE_STATUSES:
+            await booking.lock_schedules(db, appointment.doctor_id, appointment.room_id, appointment.appointment_date)
+            booking.ensure_available(
+                db,
+                appointment.doctor_id,
+                appointment.room_id,
+                appointment.appointment_date,
+                appointment.appointment_time,
+                exclude_id=appointment_id
+            )
+        
+        # Atualizar status
+        try:
+            freed = None
+            if new_status == "cancelled" and appointment.status in booking.ACTIVE_STATUSES:
+                freed = waitlist.freed_slot(appointment)
+            stats_before = stats.appointment_key(appointment)
+            appointment.status = new_status
+            stats.record_change(db, stats_before, stats.appointment_key(appointment))
+            events.publish(db, "status", appointment)
+            db.commit()
+            db.refresh(appointment)
+            waitlist.schedule_match(background_tasks, db, freed)
+            return appointment
+        except OperationalError:
+            raise
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error updating appointment status"
+            )
+    
+    return await booking.run_with_retries(db, save)
+
+@router.post("/{appointment_id}/check-in", response_model=AppointmentSchema)
+async def check_in_appointment(
+    appointment_id: uuid.UUID,
+    db: Session = Depends(get_audited_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Registrar a chegada do paciente (o agendamento passa a concluído, não falta)."""
+    
+    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    if not appointment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Appointment not found"
+        )
+    if appointment.status not in booking.ACTIVE_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only scheduled or confirmed appointments can be checked in"
+        )
+    if appointment.appointment_date != date.today().isoformat():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Appointments can only be checked in on their date"
+        )
+    if appointment.checked_in_at is not None:
+        return appointment
+    
     try:
-        appointment.status = new_status
+        appointment.checked_in_at = datetime.now(timezone.utc)
+        events.publish(db, "checked_in", appointment)
         db.commit()
         db.refresh(appointment)
         return appointment
@@ -323,5 +502,85 @@ async def update_appointment_status(
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error updating appointment status"
-        )
\ No newline at end of file
+            detail="Error checking in appointment"
+        )
+
+@router.get("/{appointment_id}/procedures", response_model=List[AppointmentProcedureSchema])
+async def get_appointment_procedures(
+    appointment_id: uuid.UUID,
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Procedimentos TUSS do agendamento (inclusive de agendamentos arquivados)."""
+    
+    procedures = db.query(AppointmentProcedure).filter(
+        AppointmentProcedure.appointment_id == appointment_id
+    ).order_by(AppointmentProcedure.procedure_code).all()
+    
+    return [
+        AppointmentProcedureSchema(
+            procedure_code=procedure.procedure_code,
+            quantity=procedure.quantity,
+            description=tuss.describe(procedure.procedure_code)
+        )
+        for procedure in procedures
+    ]
+
+@router.put("/{appointment_id}/procedures", response_model=List[AppointmentProcedureSchema])
+async def set_appointment_procedures(
+    appointment_id: uuid.UUID,
+    procedures: List[AppointmentProcedureItem],
+    db: Session = Depends(get_audited_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Substituir os procedimentos TUSS do agendamento."""
+    
+    appointment = db.query(Appointment.id).filter(Appointment.id == appointment_id).first()
+    if not appointment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Appointment not found"
+        )
+    
+    codes = [procedure.procedure_code for procedure in procedures]
+    if len(set(codes)) != len(codes):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Duplicate procedure codes"
+        )
+    
+    unknown = tuss.unknown_codes(db, codes)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown TUSS procedure codes: {', '.join(unknown)}"
+        )
+    
+    try:
+        db.query(AppointmentProcedure).filter(
+            AppointmentProcedure.appointment_id == appointment_id
+        ).delete(synchronize_session=False)
+        db.add_all([
+            AppointmentProcedure(
+                appointment_id=appointment_id,
+                procedure_code=procedure.procedure_code,
+                quantity=procedure.quantity
+            )
+            for procedure in procedures
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error updating appointment procedures"
+        )
+    
+    return [
+        AppointmentProcedureSchema(
+            procedure_code=procedure.procedure_code,
+            quantity=procedure.quantity,
+            description=tuss.describe(procedure.procedure_code)
+        )
+        for procedure in sorted(procedures, key=lambda procedure: procedure.procedure_code)
+    ]
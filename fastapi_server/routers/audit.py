@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+import uuid
+
+from database import get_read_db
+from models import AuditLog
+from schemas import AuditLogEntry, User as UserSchema
+from auth import get_current_superuser
+
+router = APIRouter()
+
+AUDITED_TABLES = ("patients", "appointments")
+
+@router.get("/", response_model=List[AuditLogEntry])
+async def list_audit_log(
+    table: Optional[str] = Query(None, description="patients ou appointments"),
+    row_id: Optional[uuid.UUID] = Query(None, description="Registro auditado (exige table)"),
+    user_id: Optional[uuid.UUID] = Query(None, description="Usuário que fez a alteração"),
+    start: Optional[datetime] = Query(None, description="Alterações a partir de"),
+    end: Optional[datetime] = Query(None, description="Alterações até"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_superuser)
+):
+    """Trilha de auditoria, da alteração mais recente para a mais antiga.
+
+    Consultas por registro (``table`` + ``row_id``) usam ``ix_audit_log_row`` e
+    por usuário ``ix_audit_log_user``; sem esses filtros a ordem é a da chave primária.
+    """
+    if table is not None and table not in AUDITED_TABLES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"table must be one of: {', '.join(AUDITED_TABLES)}"
+        )
+    if row_id is not None and table is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="row_id requires table"
+        )
+
+    query = db.query(AuditLog)
+    if table is not None:
+        query = query.filter(AuditLog.table_name == table)
+    if row_id is not None:
+        query = query.filter(AuditLog.row_id == str(row_id))
+    if user_id is not None:
+        query = query.filter(AuditLog.user_id == user_id)
+    if start is not None:
+        query = query.filter(AuditLog.changed_at >= start)
+    if end is not None:
+        query = query.filter(AuditLog.changed_at <= end)
+
+    if row_id is not None or user_id is not None:
+        query = query.order_by(AuditLog.changed_at.desc(), AuditLog.id.desc())
+    else:
+        query = query.order_by(AuditLog.id.desc())
+    return query.offset(skip).limit(limit).all()
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from database import get_db
 from schemas import (
@@ -11,7 +12,7 @@ from schemas import (
 from auth import (
     authenticate_user, create_user, get_current_user, get_current_active_user, create_access_token,
     get_user_by_email, create_password_reset_token, validate_reset_token,
-    use_reset_token, update_user_password, ACCESS_TOKEN_EXPIRE_MINUTES
+    consume_reset_token, update_user_password, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from datetime import timedelta
 from models import User
@@ -34,7 +35,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     
     # Criar novo usuário
     try:
-        user = create_user(
+        # bcrypt fora do event loop (a concorrência é limitada em rate_limit.py)
+        user = await run_in_threadpool(
+            create_user,
             db=db,
             email=user_data.email,
             password=user_data.password,
@@ -63,7 +66,7 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     """Endpoint para login de usuários."""
     
     # Autenticar usuário
-    user = authenticate_user(db, user_credentials.email, user_credentials.password)
+    user = await run_in_threadpool(authenticate_user, db, user_credentials.email, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -193,36 +196,26 @@ async def validate_reset_token_endpoint(request: ValidateResetTokenRequest, db:
 async def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
     """Endpoint para redefinir senha usando token de recuperação."""
     
-    # Validar token
-    reset_token = validate_reset_token(db, token=request.token)
+    # Consumir token (UPDATE ... RETURNING); o commit acontece junto com a nova senha
+    user_id = consume_reset_token(db, request.token)
     
-    if not reset_token:
+    if not user_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Token inválido ou expirado"
         )
     
-    # Buscar usuário
-    user = db.query(User).filter(User.id == reset_token.user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Usuário não encontrado"
-        )
-    
     # Atualizar senha
-    success = update_user_password(db, str(user.id), request.new_password)
+    success = await run_in_threadpool(update_user_password, db, str(user_id), request.new_password)
     
     if not success:
+        db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Erro ao atualizar senha"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuário não encontrado"
         )
     
-    # Marcar token como usado
-    use_reset_token(db, request.token)
-    
     return ResetPasswordResponse(
         message="Senha redefinida com sucesso",
         success=True
-    )
\ No newline at end of file
+    )
@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import uuid
 
-from database import get_db
+import batch
+import counts
+from database import get_db, get_read_db
 from models import ClinicRoom
 from schemas import (
     ClinicRoom as ClinicRoomSchema,
     ClinicRoomCreate,
     ClinicRoomUpdate,
+    BatchRequest,
+    BatchResult,
     User as UserSchema
 )
 from auth import get_current_active_user
@@ -17,11 +21,13 @@ router = APIRouter()
 
 @router.get("/", response_model=List[ClinicRoomSchema])
 async def get_clinic_rooms(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     is_available: Optional[bool] = Query(None, description="Filtrar por disponibilidade"),
     room_type: Optional[str] = Query(None, description="Filtrar por tipo de sala"),
-    db: Session = Depends(get_db),
+    include_total: bool = Query(False, description="Incluir X-Total-Count na resposta"),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Listar salas clínicas com filtros."""
@@ -35,13 +41,27 @@ async def get_clinic_rooms(
     if room_type:
         query = query.filter(ClinicRoom.room_type.ilike(f"%{room_type}%"))
     
+    if include_total:
+        counts.set_total_header(response, db, query, ClinicRoom, filtered=is_available is not None or bool(room_type))
+    
     rooms = query.offset(skip).limit(limit).all()
     return rooms
 
+@router.post("/batch", response_model=BatchResult[ClinicRoomSchema])
+async def batch_get_clinic_rooms(
+    request: BatchRequest,
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Obter várias salas por ID, na ordem pedida."""
+    
+    items, missing = batch.fetch_by_ids(db, ClinicRoom, request.ids)
+    return {"items": items, "missing": missing}
+
 @router.get("/{room_id}", response_model=ClinicRoomSchema)
 async def get_clinic_room(
     room_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Obter sala clínica por ID."""
@@ -208,7 +228,7 @@ async def toggle_room_availability(
 async def get_available_rooms_by_date(
     date: str,
     time_slot: Optional[str] = Query(None, description="Horário específico (HH:MM)"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Obter salas disponíveis em uma data específica."""
@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import uuid
 
-from database import get_db
+import batch
+import counts
+from database import get_db, get_read_db
 from models import Doctor
 from schemas import (
     Doctor as DoctorSchema,
     DoctorCreate,
     DoctorUpdate,
+    BatchRequest,
+    BatchResult,
     User as UserSchema
 )
 from auth import get_current_active_user
@@ -17,11 +21,13 @@ router = APIRouter()
 
 @router.get("/", response_model=List[DoctorSchema])
 async def get_doctors(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     search: Optional[str] = Query(None, description="Buscar por nome ou especialidade"),
     active_only: bool = Query(True, description="Apenas médicos ativos"),
-    db: Session = Depends(get_db),
+    include_total: bool = Query(False, description="Incluir X-Total-Count na resposta"),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Listar médicos com paginação e busca."""
@@ -41,13 +47,29 @@ async def get_doctors(
             (Doctor.specialty.ilike(search_term))
         )
     
+    if include_total:
+        counts.set_total_header(
+            response, db, query, Doctor, filtered=bool(search), variant="active" if active_only else None
+        )
+    
     doctors = query.offset(skip).limit(limit).all()
     return doctors
 
+@router.post("/batch", response_model=BatchResult[DoctorSchema])
+async def batch_get_doctors(
+    request: BatchRequest,
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Obter vários médicos por ID, na ordem pedida."""
+    
+    items, missing = batch.fetch_by_ids(db, Doctor, request.ids)
+    return {"items": items, "missing": missing}
+
 @router.get("/{doctor_id}", response_model=DoctorSchema)
 async def get_doctor(
     doctor_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Obter médico por ID."""
@@ -189,7 +211,7 @@ async def delete_doctor(
 @router.get("/search/license/{license_number}", response_model=DoctorSchema)
 async def search_doctor_by_license(
     license_number: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Buscar médico por número de licença."""
@@ -207,7 +229,7 @@ async def search_doctor_by_license(
 async def get_doctors_by_specialty(
     specialty: str,
     active_only: bool = Query(True, description="Apenas médicos ativos"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Buscar médicos por especialidade."""
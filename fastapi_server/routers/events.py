@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, status, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import Optional
+import asyncio
+import json
+import uuid
+
+import events
+from database import SessionLocal
+from auth import verify_token, get_user_by_email
+
+router = APIRouter()
+
+# O EventSource do navegador não envia cabeçalhos; aceita também ?token=
+optional_security = HTTPBearer(auto_error=False)
+
+def _active_user_exists(email: str) -> bool:
+    # Sessão curta: o stream não pode manter uma conexão do pool aberta
+    db = SessionLocal()
+    try:
+        user = get_user_by_email(db, email=email)
+        return user is not None and user.is_active
+    finally:
+        db.close()
+
+def _format(payload: dict) -> str:
+    data = json.dumps(payload, separators=(",", ":"))
+    if payload is events.RESET:
+        return f"event: reset\ndata: {data}\n\n"
+    return f"id: {events.broker.event_id(payload)}\nevent: appointment\ndata: {data}\n\n"
+
+@router.get("/appointments")
+async def stream_appointment_events(
+    request: Request,
+    doctor_id: Optional[uuid.UUID] = Query(None, description="Acompanhar um médico"),
+    room_id: Optional[uuid.UUID] = Query(None, description="Acompanhar uma sala"),
+    date: Optional[str] = Query(None, description="Acompanhar uma data (YYYY-MM-DD)"),
+    last_event_id: Optional[str] = Query(None, description="Retomar após este id de evento"),
+    token: Optional[str] = Query(None, description="Token JWT (alternativa ao cabeçalho Authorization)"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    """Stream (Server-Sent Events) das alterações de agendamentos.
+
+    Cada evento traz um id ``<época>-<seq>``; ao reconectar, o navegador envia
+    Last-Event-ID e recebe os eventos perdidos. Um evento ``reset`` indica que o
+    cliente deve recarregar a agenda pela API REST.
+    """
+
+    email = verify_token(credentials.credentials if credentials else token or "")
+    if email is None or not await asyncio.to_thread(_active_user_exists, email):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    if last_event_id is None:
+        last_event_id = last_event_id_header
+
+    subscription = events.new_subscription(doctor_id, room_id, date)
+    events.broker.subscribe(subscription)
+    backlog = events.broker.replay(subscription, last_event_id) if last_event_id is not None else []
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            if backlog is None:
+                yield _format(events.RESET)
+            else:
+                for payload in backlog:
+                    yield _format(payload)
+
+            while True:
+                try:
+                    payload = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=events.EVENTS_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if subscription.overflowed or await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+
+                yield _format(payload)
+                if subscription.overflowed and subscription.queue.empty():
+                    # O cliente reconecta com Last-Event-ID e recebe o restante do buffer
+                    break
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
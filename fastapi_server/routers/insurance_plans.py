@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import uuid
 
-from database import get_db
+import batch
+import counts
+import invalidation
+from database import get_db, get_read_db
 from models import InsurancePlan
 from schemas import (
     InsurancePlan as InsurancePlanSchema,
     InsurancePlanCreate,
     InsurancePlanUpdate,
+    BatchRequest,
+    BatchResult,
     User as UserSchema
 )
 from auth import get_current_active_user
@@ -17,10 +22,12 @@ router = APIRouter()
 
 @router.get("/", response_model=List[InsurancePlanSchema])
 async def get_insurance_plans(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     is_active: Optional[bool] = Query(None, description="Filtrar por status ativo"),
-    db: Session = Depends(get_db),
+    include_total: bool = Query(False, description="Incluir X-Total-Count na resposta"),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Listar planos de saúde com filtros."""
@@ -31,13 +38,27 @@ async def get_insurance_plans(
     if is_active is not None:
         query = query.filter(InsurancePlan.is_active == is_active)
     
+    if include_total:
+        counts.set_total_header(response, db, query, InsurancePlan, filtered=is_active is not None)
+    
     insurance_plans = query.offset(skip).limit(limit).all()
     return insurance_plans
 
+@router.post("/batch", response_model=BatchResult[InsurancePlanSchema])
+async def batch_get_insurance_plans(
+    request: BatchRequest,
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Obter vários planos de saúde por ID, na ordem pedida."""
+    
+    items, missing = batch.fetch_by_ids(db, InsurancePlan, request.ids)
+    return {"items": items, "missing": missing}
+
 @router.get("/{plan_id}", response_model=InsurancePlanSchema)
 async def get_insurance_plan(
     plan_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Obter plano de saúde por ID."""
@@ -120,6 +141,7 @@ async def update_insurance_plan(
         for field, value in update_data.items():
             setattr(insurance_plan, field, value)
         
+        invalidation.publish(db, "insurance_plans", plan_id)
         db.commit()
         db.refresh(insurance_plan)
         return insurance_plan
@@ -161,6 +183,7 @@ async def delete_insurance_plan(
     # Deletar plano de saúde
     try:
         db.delete(insurance_plan)
+        invalidation.publish(db, "insurance_plans", plan_id)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -189,6 +212,7 @@ async def toggle_insurance_plan_status(
     # Atualizar status
     try:
         insurance_plan.is_active = is_active
+        invalidation.publish(db, "insurance_plans", plan_id)
         db.commit()
         db.refresh(insurance_plan)
         return insurance_plan
@@ -202,7 +226,7 @@ async def toggle_insurance_plan_status(
 @router.get("/search/by-name", response_model=List[InsurancePlanSchema])
 async def search_insurance_plans_by_name(
     name: str = Query(..., description="Nome ou parte do nome do plano de saúde"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Buscar planos de saúde por nome."""
@@ -216,7 +240,7 @@ async def search_insurance_plans_by_name(
 
 @router.get("/active/list", response_model=List[InsurancePlanSchema])
 async def get_active_insurance_plans(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Listar apenas planos de saúde ativos."""
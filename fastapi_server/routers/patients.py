@@ -1,31 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List, Optional
 import uuid
 
-from database import get_db
-from models import Patient, InsurancePlan
+import batch
+import counts
+import cache
+from audit import get_audited_db
+from database import get_read_db
+from models import Patient
 from schemas import (
     Patient as PatientSchema,
     PatientCreate,
     PatientUpdate,
+    BatchRequest,
+    BatchResult,
     User as UserSchema
 )
 from auth import get_current_active_user
 
 router = APIRouter()
 
+def _get_patient(db: Session, **filters) -> Optional[Patient]:
+    # O schema de resposta inclui o plano de saúde: carregado na mesma query
+    return db.query(Patient).options(
+        joinedload(Patient.insurance_plan)
+    ).filter_by(**filters).first()
+
 @router.get("/", response_model=List[PatientSchema])
 async def get_patients(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     search: Optional[str] = Query(None, description="Buscar por nome ou CPF"),
-    db: Session = Depends(get_db),
+    include_total: bool = Query(False, description="Incluir X-Total-Count na resposta"),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Listar pacientes com paginação e busca."""
     
-    query = db.query(Patient)
+    # Planos em uma única query extra (IN), qualquer que seja o tamanho da página
+    query = db.query(Patient).options(selectinload(Patient.insurance_plan))
     
     # Aplicar filtro de busca se fornecido
     if search:
@@ -36,18 +51,32 @@ async def get_patients(
             (Patient.cpf.ilike(search_term))
         )
     
+    if include_total:
+        counts.set_total_header(response, db, query, Patient, filtered=bool(search))
+    
     patients = query.offset(skip).limit(limit).all()
     return patients
 
+@router.post("/batch", response_model=BatchResult[PatientSchema])
+async def batch_get_patients(
+    request: BatchRequest,
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Obter vários pacientes por ID, na ordem pedida."""
+    
+    items, missing = batch.fetch_by_ids(db, Patient, request.ids, selectinload(Patient.insurance_plan))
+    return {"items": items, "missing": missing}
+
 @router.get("/{patient_id}", response_model=PatientSchema)
 async def get_patient(
     patient_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Obter paciente por ID."""
     
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient = _get_patient(db, id=patient_id)
     if not patient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -59,7 +88,7 @@ async def get_patient(
 @router.post("/", response_model=PatientSchema, status_code=status.HTTP_201_CREATED)
 async def create_patient(
     patient_data: PatientCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_audited_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Criar novo paciente."""
@@ -74,9 +103,7 @@ async def create_patient(
     
     # Verificar se plano de saúde existe (se fornecido)
     if patient_data.insurance_plan_id:
-        insurance_plan = db.query(InsurancePlan).filter(
-            InsurancePlan.id == patient_data.insurance_plan_id
-        ).first()
+        insurance_plan = cache.get_insurance_plan(db, patient_data.insurance_plan_id)
         if not insurance_plan:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -88,8 +115,7 @@ async def create_patient(
         db_patient = Patient(**patient_data.dict())
         db.add(db_patient)
         db.commit()
-        db.refresh(db_patient)
-        return db_patient
+        return _get_patient(db, id=db_patient.id)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -101,7 +127,7 @@ async def create_patient(
 async def update_patient(
     patient_id: uuid.UUID,
     patient_data: PatientUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_audited_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Atualizar paciente."""
@@ -135,9 +161,7 @@ async def update_patient(
     # Verificar se plano de saúde existe (se fornecido)
     if patient_data.insurance_plan_id:
         print(f"[DEBUG] Checking insurance plan: {patient_data.insurance_plan_id}")
-        insurance_plan = db.query(InsurancePlan).filter(
-            InsurancePlan.id == patient_data.insurance_plan_id
-        ).first()
+        insurance_plan = cache.get_insurance_plan(db, patient_data.insurance_plan_id)
         if not insurance_plan:
             print(f"[ERROR] Insurance plan {patient_data.insurance_plan_id} not found")
             raise HTTPException(
@@ -163,9 +187,8 @@ async def update_patient(
         
         print(f"[DEBUG] Committing changes to database")
         db.commit()
-        db.refresh(patient)
         print(f"[DEBUG] Patient updated successfully")
-        return patient
+        return _get_patient(db, id=patient_id)
     except Exception as e:
         print(f"[ERROR] Exception during patient update: {str(e)}")
         print(f"[ERROR] Exception type: {type(e).__name__}")
@@ -180,7 +203,7 @@ async def update_patient(
 @router.delete("/{patient_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_patient(
     patient_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_audited_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Deletar paciente."""
@@ -207,7 +230,7 @@ async def delete_patient(
 @router.get("/search/cpf/{cpf}", response_model=PatientSchema)
 async def search_patient_by_cpf(
     cpf: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ):
     """Buscar paciente por CPF."""
@@ -216,7 +239,7 @@ async def search_patient_by_cpf(
     import re
     clean_cpf = re.sub(r'\D', '', cpf)
     
-    patient = db.query(Patient).filter(Patient.cpf == clean_cpf).first()
+    patient = _get_patient(db, cpf=clean_cpf)
     if not patient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
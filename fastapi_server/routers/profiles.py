@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import PlainTextResponse
+from typing import List, Optional
+
+import profiling
+from schemas import ProfileSummary, User as UserSchema
+from auth import get_current_superuser
+
+router = APIRouter()
+
+@router.get("/", response_model=List[ProfileSummary])
+def list_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: UserSchema = Depends(get_current_superuser)
+):
+    """Perfis guardados (requisições com ``X-Profile: 1``), do mais recente para o mais antigo."""
+    profiles = []
+    for profile_id in profiling.list_profiles()[:limit]:
+        # Pode ter saído do buffer entre a listagem e a leitura
+        profile = profiling.load(profile_id)
+        if profile is not None:
+            profiles.append(profile)
+    return profiles
+
+@router.get("/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: Optional[str] = Query(None, pattern="^(json|folded)$", description="folded: pilhas para flamegraph.pl/speedscope"),
+    current_user: UserSchema = Depends(get_current_superuser)
+):
+    """Perfil completo: pilhas amostradas e linha do tempo do SQL."""
+    profile = profiling.load(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    if format == "folded":
+        return PlainTextResponse(
+            profile["stacks"] + "\n",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'}
+        )
+    return profile
@@ -0,0 +1,148 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+import uuid
+
+import archive
+import stats
+from database import get_db, get_read_db
+from models import AppointmentDailyStat
+from schemas import (
+    DailyStat,
+    MonthlyStats,
+    StatGroup,
+    StatsRebuildResponse,
+    User as UserSchema
+)
+from auth import get_current_active_user, get_current_superuser
+
+router = APIRouter()
+
+def _room_or_none(room_id: uuid.UUID) -> Optional[uuid.UUID]:
+    return None if room_id == stats.NO_ROOM else room_id
+
+def _groups(counts: Dict[str, Dict[str, int]]) -> List[StatGroup]:
+    return [
+        StatGroup(key=key, total=sum(by_status.values()), by_status=by_status)
+        for key, by_status in sorted(counts.items())
+    ]
+
+@router.get("/daily", response_model=List[DailyStat])
+async def get_daily_stats(
+    start_date: str = Query(..., description="Data inicial, inclusiva (YYYY-MM-DD)"),
+    end_date: str = Query(..., description="Data final, inclusiva (YYYY-MM-DD)"),
+    doctor_id: Optional[uuid.UUID] = Query(None, description="Filtrar por médico"),
+    room_id: Optional[uuid.UUID] = Query(None, description="Filtrar por sala"),
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Contagens diárias por médico, sala e status."""
+
+    query = db.query(AppointmentDailyStat).filter(
+        AppointmentDailyStat.stat_date >= start_date,
+        AppointmentDailyStat.stat_date <= end_date,
+        AppointmentDailyStat.count != 0
+    )
+
+    if doctor_id:
+        query = query.filter(AppointmentDailyStat.doctor_id == doctor_id)
+
+    if room_id:
+        query = query.filter(AppointmentDailyStat.room_id == room_id)
+
+    rows = query.order_by(AppointmentDailyStat.stat_date).all()
+    return [
+        DailyStat(
+            stat_date=row.stat_date,
+            doctor_id=row.doctor_id,
+            room_id=_room_or_none(row.room_id),
+            status=row.status,
+            count=row.count
+        )
+        for row in rows
+    ]
+
+@router.get("/month/{year}/{month}", response_model=MonthlyStats)
+async def get_monthly_stats(
+    year: int,
+    month: int,
+    doctor_id: Optional[uuid.UUID] = Query(None, description="Filtrar por médico"),
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Dashboard do mês: totais por status, dia, médico e sala."""
+
+    if not 1 <= month <= 12:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid month"
+        )
+
+    prefix = f"{year:04d}-{month:02d}"
+    query = db.query(
+        AppointmentDailyStat.stat_date,
+        AppointmentDailyStat.doctor_id,
+        AppointmentDailyStat.room_id,
+        AppointmentDailyStat.status,
+        func.sum(AppointmentDailyStat.count)
+    ).filter(
+        AppointmentDailyStat.stat_date >= f"{prefix}-01",
+        AppointmentDailyStat.stat_date <= f"{prefix}-31"
+    )
+
+    if doctor_id:
+        query = query.filter(AppointmentDailyStat.doctor_id == doctor_id)
+
+    rows = query.group_by(
+        AppointmentDailyStat.stat_date,
+        AppointmentDailyStat.doctor_id,
+        AppointmentDailyStat.room_id,
+        AppointmentDailyStat.status
+    ).all()
+
+    by_status: Dict[str, int] = {}
+    by_day: Dict[str, Dict[str, int]] = {}
+    by_doctor: Dict[str, Dict[str, int]] = {}
+    by_room: Dict[str, Dict[str, int]] = {}
+    for stat_date, row_doctor, row_room, row_status, count in rows:
+        if not count:
+            continue
+        by_status[row_status] = by_status.get(row_status, 0) + count
+        for groups, key in (
+            (by_day, stat_date),
+            (by_doctor, str(row_doctor)),
+            (by_room, str(row_room) if row_room != stats.NO_ROOM else "none"),
+        ):
+            group = groups.setdefault(key, {})
+            group[row_status] = group.get(row_status, 0) + count
+
+    return MonthlyStats(
+        year=year,
+        month=month,
+        total=sum(by_status.values()),
+        by_status=by_status,
+        by_day=_groups(by_day),
+        by_doctor=_groups(by_doctor),
+        by_room=_groups(by_room)
+    )
+
+@router.post("/rebuild", response_model=StatsRebuildResponse)
+async def rebuild_stats(
+    start_date: Optional[str] = Query(None, description="Data inicial (padrão: corte do arquivamento)"),
+    end_date: str = Query(..., description="Data final, inclusiva (YYYY-MM-DD)"),
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_superuser)
+):
+    """Recalcula os agregados a partir da tabela de agendamentos."""
+
+    cutoff = archive.archive_cutoff()
+    start_date = start_date or cutoff
+    if start_date < cutoff:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Period before {cutoff} is archived and cannot be rebuilt"
+        )
+
+    keys = stats.rebuild(db, start_date, end_date)
+    return StatsRebuildResponse(start_date=start_date, end_date=end_date, keys=keys)
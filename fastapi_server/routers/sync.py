@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, status, Query
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import hmac
+
+import edge_sync
+from database import get_db
+from schemas import User as UserSchema
+from auth import get_current_superuser
+
+router = APIRouter()
+
+def _require_central(x_sync_token: str = Header("", alias="X-Sync-Token")) -> None:
+    # Nas unidades (ou sem token configurado) as rotas de sincronização não existem
+    if edge_sync.SYNC_ROLE != "central" or not edge_sync.SYNC_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not Found"
+        )
+    if not hmac.compare_digest(x_sync_token.encode(), edge_sync.SYNC_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid sync token"
+        )
+
+@router.post("/push", dependencies=[Depends(_require_central)])
+async def push_changes(
+    request: Request,
+    node: str = Query(..., min_length=1, max_length=64, description="Identificador da unidade"),
+    db: Session = Depends(get_db)
+):
+    """Recebe um lote comprimido de alterações de uma unidade."""
+    payload = await request.body()
+    try:
+        # A reverificação de horários duplos espera os locks das agendas na thread
+        return await run_in_threadpool(edge_sync.receive_push, db, payload, node)
+    except (OSError, ValueError, KeyError) as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid sync payload: {e}"
+        )
+
+@router.get("/pull", dependencies=[Depends(_require_central)])
+async def pull_changes(
+    node: str = Query(..., min_length=1, max_length=64, description="Identificador da unidade"),
+    cursor: str = Query("0", max_length=64, description="Cursor do log recebido pela unidade"),
+    limit: int = Query(edge_sync.SYNC_BATCH_SIZE, ge=1, le=5000),
+    snapshot: bool = Query(False, description="Enviar todas as linhas (primeira sincronização)"),
+    position: str = Query("", max_length=128, description="Última linha recebida do snapshot (tabela:id)"),
+    db: Session = Depends(get_db)
+):
+    """Lote comprimido com as alterações que a unidade ainda não recebeu."""
+    try:
+        edge_sync.parse_cursor(cursor)
+        # Leitura e compressão do lote fora do event loop
+        payload = await run_in_threadpool(edge_sync.serve_pull, db, node, cursor, limit, snapshot, position or None)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid sync cursor: {e}"
+        )
+    return Response(content=payload, media_type="application/octet-stream")
+
+@router.get("/status")
+async def sync_status(
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_superuser)
+):
+    """Papel do nó, cursores e escritas locais ainda não enviadas."""
+    return {
+        "role": edge_sync.SYNC_ROLE,
+        "node": edge_sync.node_id(db),
+        "pushed_seq": int(edge_sync.get_state(db, "pushed_seq") or 0),
+        "pulled_seq": edge_sync.get_state(db, "pulled_seq"),
+        "pending": edge_sync.pending_changes(db),
+    }
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import List
+
+import tuss
+from database import get_read_db
+from models import TussCatalogVersion
+from schemas import (
+    TussProcedure,
+    TussCatalogVersion as TussCatalogVersionSchema,
+    TussLoadResult,
+    User as UserSchema
+)
+from auth import get_current_active_user, get_current_superuser
+
+router = APIRouter()
+
+@router.get("/autocomplete", response_model=List[TussProcedure])
+async def autocomplete_procedures(
+    q: str = Query(..., min_length=2, description="Início do código ou palavras da descrição"),
+    limit: int = Query(20, ge=1, le=100),
+    include_expired: bool = Query(False, description="Incluir procedimentos fora de vigência"),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Sugestões de procedimentos TUSS (índice em memória, sem consulta ao banco)."""
+    
+    if not tuss.is_loaded():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="TUSS catalog not loaded"
+        )
+    
+    return tuss.autocomplete(q, limit, include_expired)
+
+@router.get("/versions", response_model=List[TussCatalogVersionSchema])
+async def get_catalog_versions(
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_superuser)
+):
+    """Versões carregadas do catálogo."""
+    
+    return db.query(TussCatalogVersion).order_by(TussCatalogVersion.id.desc()).all()
+
+@router.post("/reload", response_model=TussLoadResult)
+async def reload_catalog(
+    force: bool = Query(False, description="Recarregar mesmo se o arquivo não mudou"),
+    current_user: UserSchema = Depends(get_current_superuser)
+):
+    """Carrega o arquivo TUSS_SOURCE em uma nova versão do catálogo."""
+    
+    try:
+        return await run_in_threadpool(tuss.load_catalog, tuss.TUSS_SOURCE, force)
+    except tuss.CatalogError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
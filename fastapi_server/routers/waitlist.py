@@ -0,0 +1,227 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from datetime import datetime, timezone
+import uuid
+
+import booking
+import waitlist
+from audit import get_audited_db
+from database import get_read_db
+from models import Appointment, AppointmentType, Doctor, Patient, WaitlistEntry
+from schemas import (
+    WaitlistEntry as WaitlistEntrySchema,
+    WaitlistEntryCreate,
+    User as UserSchema
+)
+from auth import get_current_active_user
+
+router = APIRouter()
+
+def _get_entry(db: Session, entry_id: uuid.UUID) -> WaitlistEntry:
+    entry = db.query(WaitlistEntry).filter(WaitlistEntry.id == entry_id).first()
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Waitlist entry not found"
+        )
+    return entry
+
+@router.get("/", response_model=List[WaitlistEntrySchema])
+async def get_waitlist(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    patient_id: Optional[uuid.UUID] = Query(None),
+    doctor_id: Optional[uuid.UUID] = Query(None),
+    status_filter: Optional[str] = Query(None, alias="status", description="waiting, offered, booked, cancelled ou expired"),
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Listar entradas da lista de espera, da mais antiga para a mais nova."""
+
+    query = db.query(WaitlistEntry)
+    if patient_id:
+        query = query.filter(WaitlistEntry.patient_id == patient_id)
+    if doctor_id:
+        query = query.filter(WaitlistEntry.doctor_id == doctor_id)
+    if status_filter:
+        query = query.filter(WaitlistEntry.status == status_filter)
+
+    return query.order_by(WaitlistEntry.created_at).offset(skip).limit(limit).all()
+
+@router.get("/{entry_id}", response_model=WaitlistEntrySchema)
+async def get_waitlist_entry(
+    entry_id: uuid.UUID,
+    db: Session = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Obter entrada da lista de espera por ID."""
+    return _get_entry(db, entry_id)
+
+@router.post("/", response_model=WaitlistEntrySchema, status_code=status.HTTP_201_CREATED)
+async def create_waitlist_entry(
+    entry_data: WaitlistEntryCreate,
+    db: Session = Depends(get_audited_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Incluir paciente na lista de espera de um médico ou especialidade."""
+
+    if entry_data.doctor_id is None and not entry_data.specialty:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either doctor_id or specialty is required"
+        )
+    if entry_data.earliest_date > entry_data.latest_date or entry_data.earliest_time > entry_data.latest_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Waitlist window must start before it ends"
+        )
+    if not db.query(Patient.id).filter(Patient.id == entry_data.patient_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Patient not found"
+        )
+    if entry_data.doctor_id and not db.query(Doctor.id).filter(
+        Doctor.id == entry_data.doctor_id,
+        Doctor.is_active == True
+    ).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Doctor not found or inactive"
+        )
+    if not db.query(AppointmentType.id).filter(AppointmentType.id == entry_data.appointment_type_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Appointment type not found"
+        )
+    if entry_data.current_appointment_id and not db.query(Appointment.id).filter(
+        Appointment.id == entry_data.current_appointment_id,
+        Appointment.patient_id == entry_data.patient_id
+    ).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Current appointment not found for this patient"
+        )
+
+    try:
+        entry = WaitlistEntry(**entry_data.dict())
+        db.add(entry)
+        db.commit()
+        db.refresh(entry)
+        return entry
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error creating waitlist entry"
+        )
+
+@router.post("/{entry_id}/accept", response_model=WaitlistEntrySchema)
+async def accept_waitlist_offer(
+    entry_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_audited_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Aceitar o horário oferecido: marca o agendamento se o horário continuar livre."""
+
+    entry = _get_entry(db, entry_id)
+    if entry.status != waitlist.OFFERED or entry.offer_expires_at is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Waitlist entry has no pending offer"
+        )
+
+    def accept_locked():
+        # A entrada é relida com trava: outra resposta pode ter chegado antes
+        locked = waitlist.lock_entry(db, entry_id)
+        if locked is None:
+            return "answered", None, None
+        expires_at = locked.offer_expires_at
+        if expires_at is not None and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at is None or expires_at < datetime.now(timezone.utc):
+            return "expired", locked, None
+        slot = {
+            "doctor_id": locked.offered_doctor_id,
+            "room_id": locked.offered_room_id,
+            "date": locked.offered_date,
+            "time": locked.offered_time,
+        }
+        appointment, released = waitlist.book_entry(db, locked, slot)
+        return ("booked" if appointment is not None else "taken"), locked, released
+
+    async def accept():
+        # As travas da entrada e da agenda esperam na thread, fora do event loop
+        outcome, locked, released = await run_in_threadpool(accept_locked)
+        if outcome == "answered":
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Offer was already answered"
+            )
+        if outcome == "expired":
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Offer has expired"
+            )
+        if outcome == "taken":
+            waitlist.clear_offer(locked, waitlist.WAITING)
+            db.commit()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Offered slot is no longer available"
+            )
+        db.commit()
+        db.refresh(locked)
+        return locked, released
+
+    entry, released = await booking.run_with_retries(db, accept)
+    waitlist.schedule_match(background_tasks, db, released)
+    return entry
+
+@router.post("/{entry_id}/decline", response_model=WaitlistEntrySchema)
+async def decline_waitlist_offer(
+    entry_id: uuid.UUID,
+    db: Session = Depends(get_audited_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Recusar o horário oferecido; a entrada volta a esperar."""
+
+    entry = _get_entry(db, entry_id)
+    if entry.status != waitlist.OFFERED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Waitlist entry has no pending offer"
+        )
+    entry = await run_in_threadpool(waitlist.lock_entry, db, entry_id)
+    if entry is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Offer was already answered"
+        )
+    waitlist.clear_offer(entry, waitlist.WAITING)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+@router.delete("/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_waitlist_entry(
+    entry_id: uuid.UUID,
+    db: Session = Depends(get_audited_db),
+    current_user: UserSchema = Depends(get_current_active_user)
+):
+    """Retirar paciente da lista de espera."""
+
+    entry = _get_entry(db, entry_id)
+    if entry.status in waitlist.OPEN_STATUSES:
+        # Um aceite concorrente pode ter marcado o horário: a entrada marcada não é cancelada
+        entry = await run_in_threadpool(waitlist.lock_entry, db, entry_id, waitlist.OPEN_STATUSES)
+        if entry is None:
+            db.rollback()
+            return
+        waitlist.clear_offer(entry, waitlist.CANCELLED)
+        db.commit()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, validator
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, validator
+from typing import Any, Generic, Optional, List, Dict, TypeVar
 from datetime import datetime
 import uuid
 import re
@@ -227,6 +227,8 @@ class AppointmentTypeBase(BaseModel):
     type_name: str
     duration: str
     description: Optional[str] = None
+    required_room_type: Optional[str] = None
+    required_equipment: Optional[str] = None
 
 class AppointmentTypeCreate(AppointmentTypeBase):
     pass
@@ -235,6 +237,8 @@ class AppointmentTypeUpdate(BaseModel):
     type_name: Optional[str] = None
     duration: Optional[str] = None
     description: Optional[str] = None
+    required_room_type: Optional[str] = None
+    required_equipment: Optional[str] = None
 
 class AppointmentType(AppointmentTypeBase):
     id: uuid.UUID
@@ -272,12 +276,14 @@ class AppointmentUpdate(BaseModel):
 
 class Appointment(AppointmentBase):
     id: uuid.UUID
+    checked_in_at: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
-    patient: Patient
-    doctor: Doctor
+    # None apenas em agendamentos arquivados cujo cadastro foi removido depois
+    patient: Optional[Patient] = None
+    doctor: Optional[Doctor] = None
     room: Optional[ClinicRoom] = None
-    appointment_type: AppointmentType
+    appointment_type: Optional[AppointmentType] = None
     
     class Config:
         from_attributes = True
@@ -318,4 +324,183 @@ class ResetPasswordRequest(BaseModel):
 
 class ResetPasswordResponse(BaseModel):
     message: str
-    success: bool
\ No newline at end of file
+    success: bool
+
+# Schemas de estatísticas (dashboard)
+class DailyStat(BaseModel):
+    stat_date: str
+    doctor_id: uuid.UUID
+    room_id: Optional[uuid.UUID] = None
+    status: str
+    count: int
+
+class StatGroup(BaseModel):
+    key: str
+    total: int
+    by_status: Dict[str, int]
+
+class MonthlyStats(BaseModel):
+    year: int
+    month: int
+    total: int
+    by_status: Dict[str, int]
+    by_day: List[StatGroup]
+    by_doctor: List[StatGroup]
+    by_room: List[StatGroup]
+
+class StatsRebuildResponse(BaseModel):
+    start_date: str
+    end_date: str
+    keys: int
+
+# Schemas de ocupação (analytics)
+class WeeklyUtilization(BaseModel):
+    week_start: str
+    utilization: float
+
+class IdleGaps(BaseModel):
+    count: int
+    total_minutes: int
+    longest_minutes: int
+
+class ResourceUtilization(BaseModel):
+    id: uuid.UUID
+    label: str
+    booked_minutes: int
+    available_minutes: int
+    utilization: float
+    weekly: List[WeeklyUtilization]
+    heatmap: List[List[float]]
+    idle_gaps: IdleGaps
+
+class UtilizationReport(BaseModel):
+    resource: str
+    start_date: str
+    end_date: str
+    workday_start_hour: int
+    workday_end_hour: int
+    heatmap: List[List[float]]
+    resources: List[ResourceUtilization]
+
+# Schemas do catálogo TUSS
+class TussProcedure(BaseModel):
+    code: str
+    description: str
+    valid_until: Optional[str] = None
+
+class TussCatalogVersion(BaseModel):
+    id: int
+    source: str
+    checksum: str
+    row_count: int
+    loaded_at: datetime
+    is_active: bool
+
+    class Config:
+        from_attributes = True
+
+class TussLoadResult(BaseModel):
+    version_id: int
+    procedures: int
+    duplicates: int
+    seconds: float
+    unchanged: bool
+
+class AppointmentProcedureItem(BaseModel):
+    procedure_code: str
+    quantity: int = Field(1, ge=1)
+
+class AppointmentProcedure(AppointmentProcedureItem):
+    description: Optional[str] = None
+
+# Schemas de busca em lote
+T = TypeVar("T")
+
+class BatchRequest(BaseModel):
+    ids: List[uuid.UUID] = Field(..., min_length=1)
+
+class BatchResult(BaseModel, Generic[T]):
+    items: List[T]
+    missing: List[uuid.UUID]
+
+# Schemas de auditoria
+class AuditLogEntry(BaseModel):
+    id: int
+    table_name: str
+    row_id: str
+    action: str
+    user_id: Optional[uuid.UUID] = None
+    user_email: Optional[str] = None
+    changes: Dict[str, Any]
+    changed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Schemas da lista de espera
+class WaitlistEntryBase(BaseModel):
+    patient_id: uuid.UUID
+    doctor_id: Optional[uuid.UUID] = None
+    specialty: Optional[str] = None
+    appointment_type_id: uuid.UUID
+    earliest_date: str
+    latest_date: str
+    earliest_time: str = "00:00"
+    latest_time: str = "23:59"
+    auto_book: bool = False
+    current_appointment_id: Optional[uuid.UUID] = None
+    reason: Optional[str] = None
+
+class WaitlistEntryCreate(WaitlistEntryBase):
+    @validator('earliest_date', 'latest_date')
+    def validate_date(cls, v):
+        if not re.match(r'^\d{4}-\d{2}-\d{2}$', v):
+            raise ValueError('Data deve estar no formato AAAA-MM-DD')
+        return v
+
+    @validator('earliest_time', 'latest_time')
+    def validate_time(cls, v):
+        if not re.match(r'^([01]\d|2[0-3]):[0-5]\d$', v):
+            raise ValueError('Horário deve estar no formato HH:MM')
+        return v
+
+class WaitlistEntry(WaitlistEntryBase):
+    id: uuid.UUID
+    status: str
+    offered_doctor_id: Optional[uuid.UUID] = None
+    offered_room_id: Optional[uuid.UUID] = None
+    offered_date: Optional[str] = None
+    offered_time: Optional[str] = None
+    offer_expires_at: Optional[datetime] = None
+    appointment_id: Optional[uuid.UUID] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# Schemas da distribuição de salas
+class RoomAssignment(BaseModel):
+    appointment_id: uuid.UUID
+    room_id: uuid.UUID
+
+class RoomAssignmentResult(BaseModel):
+    date: str
+    dry_run: bool
+    assigned: int
+    assignments: List[RoomAssignment]
+    unassigned: List[uuid.UUID]
+
+# Perfis de requisição (X-Profile)
+class ProfileSummary(BaseModel):
+    id: str
+    started_at: datetime
+    method: str
+    path: str
+    query_params: List[str]
+    status: int
+    user: str
+    duration_ms: float
+    samples: int
+    sql_count: int
+    sql_ms: float
@@ -0,0 +1,115 @@
+"""Perfil do SQLite para instalações de uma única clínica.
+
+Com ``DATABASE_URL=sqlite:///caminho/orthoflow.db`` o ``database.py`` cria:
+
+- um engine de escrita com uma única conexão: as escritas do worker são
+  serializadas (o ``db_limiter`` aguarda a vez no event loop, sem prender
+  threads) e nunca disputam o lock do arquivo entre si;
+- um pool de ``SQLITE_READERS`` conexões somente leitura para ``get_read_db``.
+  Em WAL as leituras não bloqueiam nem esperam o escritor.
+
+Toda conexão recebe WAL, ``synchronous`` (``NORMAL`` é seguro em WAL: uma queda
+de energia perde no máximo as últimas transações, sem corromper o arquivo),
+``mmap_size``, ``cache_size``, ``busy_timeout`` e ``foreign_keys``.
+
+As migrations do Alembic são específicas do PostgreSQL; num banco SQLite novo
+o schema é criado com ``python sqlite_profile.py init``.
+"""
+import argparse
+import os
+from typing import List
+
+from sqlalchemy import create_engine, event
+
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", "4"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_WRITER_TIMEOUT = float(os.getenv("SQLITE_WRITER_TIMEOUT", "30"))
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def pragmas(readonly: bool = False) -> List[str]:
+    statements = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+        "PRAGMA foreign_keys=ON",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if readonly:
+        # Escrita por engano numa rota de leitura falha em vez de disputar o lock
+        statements.append("PRAGMA query_only=ON")
+    return statements
+
+
+def build_sqlite_engine(url: str, readonly: bool = False, pool_size: int = 1):
+    """Engine com os PRAGMAs aplicados em cada conexão nova."""
+    target_engine = create_engine(
+        url,
+        echo=False,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=SQLITE_WRITER_TIMEOUT,
+        # A sessão é criada no event loop e pode ser usada no threadpool
+        connect_args={"check_same_thread": False},
+    )
+    statements = pragmas(readonly)
+
+    @event.listens_for(target_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return target_engine
+
+
+def build_engines(url: str):
+    """Engine de escrita (uma conexão) e engine de leitura (``SQLITE_READERS`` conexões)."""
+    writer = build_sqlite_engine(url)
+    reader = build_sqlite_engine(url, readonly=True, pool_size=SQLITE_READERS)
+    return writer, reader
+
+
+def init_schema() -> None:
+    """Cria as tabelas a partir dos modelos e marca o Alembic como atualizado."""
+    from alembic import command
+    from alembic.config import Config
+
+    import models
+    from database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic"))
+    command.stamp(config, "head")
+    print(f"[SQLITE] Schema criado em {engine.url.database}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Perfil SQLite do OrthoFlow")
+    parser.add_argument("command", choices=["init", "pragmas"])
+    args = parser.parse_args()
+
+    if args.command == "init":
+        init_schema()
+        return
+
+    from database import engine
+    with engine.connect() as connection:
+        for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size", "foreign_keys"):
+            print(f"{name} = {connection.exec_driver_sql(f'PRAGMA {name}').scalar()}")
+
+
+if __name__ == "__main__":
+    main()
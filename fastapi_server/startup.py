@@ -0,0 +1,167 @@
+"""Rotinas de inicialização da API.
+
+Substitui o antigo ``Base.metadata.create_all`` por uma verificação barata
+da revisão do Alembic e aquece o pool de conexões e os caches em paralelo.
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import text
+
+import password_hashing
+from database import engine
+
+# warn (padrão) apenas registra divergências, strict aborta a inicialização, off desliga
+SCHEMA_CHECK_MODE = os.getenv("SCHEMA_CHECK", "warn").lower()
+POOL_WARMUP_CONNECTIONS = int(os.getenv("POOL_WARMUP_CONNECTIONS", "2"))
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic", "versions")
+
+_REVISION_RE = re.compile(r"^revision\s*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+_DOWN_REVISION_RE = re.compile(r"^down_revision\s*=\s*(.+)$", re.MULTILINE)
+_QUOTED_RE = re.compile(r"['\"]([^'\"]+)['\"]")
+
+# Funções registradas por outros módulos para aquecer caches na inicialização
+_warmups: List[Callable[[], None]] = []
+
+# Tempos da última inicialização (ms), preenchidos por run_startup
+timings: Dict[str, float] = {}
+
+
+class SchemaVersionError(RuntimeError):
+    """Revisão do banco diferente da head das migrações."""
+
+
+def register_warmup(func: Callable[[], None]) -> Callable[[], None]:
+    """Registra uma função síncrona executada em paralelo na inicialização."""
+    _warmups.append(func)
+    return func
+
+
+# O hash de senhas não depende do banco: a calibração é registrada aqui
+if password_hashing.PASSWORD_HASH_CALIBRATE == "startup":
+    register_warmup(password_hashing.calibrate_on_startup)
+
+
+def get_head_revisions(versions_dir: str = VERSIONS_DIR) -> Set[str]:
+    """Lê as heads das migrações sem importar o Alembic nem os scripts."""
+    revisions: Set[str] = set()
+    referenced: Set[str] = set()
+    for filename in os.listdir(versions_dir):
+        if not filename.endswith(".py"):
+            continue
+        with open(os.path.join(versions_dir, filename), encoding="utf-8") as f:
+            source = f.read()
+        revision = _REVISION_RE.search(source)
+        if not revision:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION_RE.search(source)
+        if down_revision:
+            referenced.update(_QUOTED_RE.findall(down_revision.group(1)))
+    return revisions - referenced
+
+
+def get_database_revisions() -> Optional[Set[str]]:
+    """Consulta a revisão aplicada ao banco (uma única query)."""
+    with engine.connect() as connection:
+        try:
+            rows = connection.execute(text("SELECT version_num FROM alembic_version")).fetchall()
+        except Exception:
+            return None
+    return {row[0] for row in rows}
+
+
+def check_schema_version() -> None:
+    """Compara a revisão do banco com a head das migrações."""
+    if SCHEMA_CHECK_MODE == "off":
+        return
+
+    expected = get_head_revisions()
+    current = get_database_revisions()
+    if current == expected:
+        return
+
+    if current is None:
+        message = "Tabela alembic_version não encontrada. Execute 'alembic upgrade head'."
+    else:
+        message = (
+            f"Banco na revisão {', '.join(sorted(current)) or '(vazia)'}, "
+            f"esperado {', '.join(sorted(expected))}. Execute 'alembic upgrade head'."
+        )
+
+    if SCHEMA_CHECK_MODE == "strict":
+        raise SchemaVersionError(message)
+    print(f"[STARTUP] AVISO: {message}")
+
+
+def warm_pool(connections: int = POOL_WARMUP_CONNECTIONS) -> None:
+    """Abre conexões simultâneas para que o pool já comece preenchido."""
+    # Não abre mais conexões do que o pool mantém (o escritor do SQLite tem uma só)
+    size = getattr(engine.pool, "size", None)
+    if callable(size):
+        connections = min(connections, size())
+    if connections <= 0:
+        return
+
+    barrier = threading.Barrier(connections)
+    errors: List[Exception] = []
+
+    def ping():
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                # Segura a conexão até todas estarem abertas para não reutilizar a mesma
+                barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        except Exception as e:
+            errors.append(e)
+            barrier.abort()
+
+    threads = [threading.Thread(target=ping, daemon=True) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+async def _timed(name: str, func: Callable[[], None]) -> None:
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(func)
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+
+async def run_startup(import_seconds: Optional[float] = None) -> Dict[str, float]:
+    """Executa verificação de schema, aquecimento do pool e dos caches em paralelo."""
+    started = time.perf_counter()
+    if import_seconds is not None:
+        timings["imports"] = import_seconds * 1000
+
+    tasks = [
+        _timed("schema_check", check_schema_version),
+        _timed("pool_warmup", warm_pool),
+    ]
+    tasks.extend(_timed(f"warmup:{func.__name__}", func) for func in _warmups)
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    timings["startup"] = (time.perf_counter() - started) * 1000
+
+    for result in results:
+        if isinstance(result, SchemaVersionError):
+            raise result
+        if isinstance(result, Exception):
+            print(f"[STARTUP] Falha no aquecimento: {result}")
+
+    summary = ", ".join(f"{name}={value:.0f}ms" for name, value in timings.items())
+    print(f"[STARTUP] {summary}")
+    return timings
@@ -0,0 +1,99 @@
+"""Agregados diários de agendamentos para o dashboard.
+
+A tabela ``appointment_daily_stats`` guarda a contagem por (dia, médico, sala,
+status). Os handlers de agendamento chamam ``record_change`` com a chave antes
+e depois da alteração, na mesma transação da escrita, e o contador é ajustado
+com um upsert. O arquivamento (``archive.py``) não altera os agregados.
+"""
+import uuid
+from typing import Optional, Tuple
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Session
+
+from models import Appointment, AppointmentDailyStat
+
+# Valor de room_id para agendamentos sem sala (a coluna faz parte da chave)
+NO_ROOM = uuid.UUID(int=0)
+
+StatKey = Tuple[str, uuid.UUID, uuid.UUID, str]
+
+
+def _as_uuid(value) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def appointment_key(appointment) -> StatKey:
+    """Chave do agregado para um agendamento (ou dados de agendamento)."""
+    return (
+        appointment.appointment_date,
+        _as_uuid(appointment.doctor_id),
+        _as_uuid(appointment.room_id) if appointment.room_id else NO_ROOM,
+        appointment.status or "scheduled",
+    )
+
+
+def _insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Banco sem suporte a upsert: {dialect}")
+    return insert(AppointmentDailyStat)
+
+
+def apply_delta(db: Session, key: StatKey, delta: int) -> None:
+    """Soma ``delta`` ao contador da chave (upsert, sem round trip de leitura)."""
+    stat_date, doctor_id, room_id, status = key
+    statement = _insert(db).values(
+        stat_date=stat_date, doctor_id=doctor_id, room_id=room_id, status=status, count=delta
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["stat_date", "doctor_id", "room_id", "status"],
+        set_={"count": AppointmentDailyStat.count + statement.excluded.count},
+    )
+    db.execute(statement)
+
+
+def record_change(db: Session, before: Optional[StatKey], after: Optional[StatKey]) -> None:
+    """Move uma unidade de ``before`` para ``after`` (None = inexistente)."""
+    if before == after:
+        return
+    if before is not None:
+        apply_delta(db, before, -1)
+    if after is not None:
+        apply_delta(db, after, 1)
+
+
+def rebuild(db: Session, start_date: str, end_date: str) -> int:
+    """Recalcula os agregados do período a partir da tabela ``appointments``.
+
+    Períodos já arquivados não devem ser reconstruídos: as linhas arquivadas
+    não estão mais na tabela. Retorna o número de chaves gravadas.
+    """
+    db.query(AppointmentDailyStat).filter(
+        AppointmentDailyStat.stat_date >= start_date,
+        AppointmentDailyStat.stat_date <= end_date
+    ).delete(synchronize_session=False)
+
+    room = func.coalesce(Appointment.room_id, literal(NO_ROOM, Appointment.room_id.type))
+    grouped = select(
+        Appointment.appointment_date,
+        Appointment.doctor_id,
+        room,
+        Appointment.status,
+        func.count(),
+    ).where(
+        Appointment.appointment_date >= start_date,
+        Appointment.appointment_date <= end_date
+    ).group_by(Appointment.appointment_date, Appointment.doctor_id, room, Appointment.status)
+
+    result = db.execute(
+        AppointmentDailyStat.__table__.insert().from_select(
+            ["stat_date", "doctor_id", "room_id", "status", "count"], grouped
+        )
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,141 @@
+"""Transição automática dos agendamentos que já passaram.
+
+Agendamentos ``scheduled``/``confirmed`` cujo horário terminou há mais de
+``AUTO_STATUS_GRACE_MINUTES`` minutos passam a ``completed`` (paciente fez
+check-in) ou ``no_show``. Isso mantém as verificações de conflito e as
+listagens de ativos restritas à agenda real.
+
+A tarefa trabalha em blocos de ``AUTO_STATUS_CHUNK_SIZE`` linhas, cada um em
+uma transação: lê apenas as colunas necessárias (sem carregar objetos do ORM,
+com ``FOR UPDATE SKIP LOCKED`` no PostgreSQL para não esperar por marcações em
+andamento) e aplica dois ``UPDATE ... WHERE id IN (...)``. Os agregados de
+``appointment_daily_stats`` recebem um upsert por chave e o bloco publica os
+eventos de status e o registro da sincronização das unidades.
+
+Datas e horários dos agendamentos estão no fuso local do servidor.
+"""
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+import booking
+import edge_sync
+import events
+import jobs
+import metrics
+import stats
+from database import SessionLocal
+from models import Appointment
+
+AUTO_STATUS_INTERVAL = float(os.getenv("AUTO_STATUS_INTERVAL", "300"))
+AUTO_STATUS_GRACE_MINUTES = int(os.getenv("AUTO_STATUS_GRACE_MINUTES", "60"))
+AUTO_STATUS_CHUNK_SIZE = int(os.getenv("AUTO_STATUS_CHUNK_SIZE", "1000"))
+
+COMPLETED, NO_SHOW = "completed", "no_show"
+
+
+def cutoff(now: Optional[datetime] = None) -> Tuple[str, str]:
+    """Data e horário de início a partir dos quais o agendamento ainda não é transicionado."""
+    now = now or datetime.now()
+    limit = now - booking.DEFAULT_DURATION - timedelta(minutes=AUTO_STATUS_GRACE_MINUTES)
+    return limit.strftime("%Y-%m-%d"), limit.strftime("%H:%M")
+
+
+def _past(cutoff_date: str, cutoff_time: str):
+    # appointment_date <= cutoff_date sozinho já limita as partições lidas
+    return and_(
+        Appointment.status.in_(booking.ACTIVE_STATUSES),
+        Appointment.appointment_date <= cutoff_date,
+        or_(Appointment.appointment_date < cutoff_date, Appointment.appointment_time <= cutoff_time),
+    )
+
+
+def transition_chunk(db: Session, cutoff_date: str, cutoff_time: str, chunk_size: int) -> Dict[str, int]:
+    """Transiciona até ``chunk_size`` agendamentos passados e faz commit."""
+    rows = db.execute(
+        select(
+            Appointment.id,
+            Appointment.doctor_id,
+            Appointment.room_id,
+            Appointment.appointment_date,
+            Appointment.appointment_time,
+            Appointment.status,
+            Appointment.row_version,
+            Appointment.checked_in_at.isnot(None).label("checked_in"),
+        )
+        .where(_past(cutoff_date, cutoff_time))
+        .order_by(Appointment.appointment_date, Appointment.appointment_time)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+    ids = {COMPLETED: [], NO_SHOW: []}
+    deltas: Counter = Counter()
+    for row in rows:
+        new_status = COMPLETED if row.checked_in else NO_SHOW
+        ids[new_status].append(row.id)
+        key = stats.appointment_key(row)
+        deltas[key] -= 1
+        deltas[key[:3] + (new_status,)] += 1
+
+    now = datetime.now(timezone.utc)
+    for new_status, status_ids in ids.items():
+        if status_ids:
+            db.execute(
+                update(Appointment)
+                .where(Appointment.id.in_(status_ids), Appointment.appointment_date <= cutoff_date)
+                .values(status=new_status, updated_at=now, row_version=Appointment.row_version + 1)
+                .execution_options(synchronize_session=False)
+            )
+    for key, delta in deltas.items():
+        if delta:
+            stats.apply_delta(db, key, delta)
+
+    for row in rows:
+        new_status = COMPLETED if row.checked_in else NO_SHOW
+        events.publish(db, "status", SimpleNamespace(
+            id=row.id, doctor_id=row.doctor_id, room_id=row.room_id,
+            appointment_date=row.appointment_date, appointment_time=row.appointment_time, status=new_status,
+        ))
+    edge_sync.log_rows(db, Appointment, [(row.id, (row.row_version or 0) + 1) for row in rows])
+    db.commit()
+    return {COMPLETED: len(ids[COMPLETED]), NO_SHOW: len(ids[NO_SHOW])}
+
+
+def transition_past_appointments(
+    now: Optional[datetime] = None,
+    chunk_size: int = AUTO_STATUS_CHUNK_SIZE
+) -> Dict[str, int]:
+    """Transiciona todos os agendamentos passados, bloco a bloco."""
+    cutoff_date, cutoff_time = cutoff(now)
+    totals = {COMPLETED: 0, NO_SHOW: 0}
+    started = time.perf_counter()
+    while True:
+        with SessionLocal() as db:
+            counts = transition_chunk(db, cutoff_date, cutoff_time, chunk_size)
+        for new_status, count in counts.items():
+            totals[new_status] += count
+        if sum(counts.values()) < chunk_size:
+            break
+
+    metrics.increment("appointments.auto_completed", totals[COMPLETED])
+    metrics.increment("appointments.auto_no_show", totals[NO_SHOW])
+    metrics.observe("appointments.auto_status", time.perf_counter() - started)
+    if totals[COMPLETED] or totals[NO_SHOW]:
+        print(f"[STATUS] {totals[COMPLETED]} concluídos e {totals[NO_SHOW]} faltas até {cutoff_date} {cutoff_time}")
+    return totals
+
+
+jobs.register_job(
+    "appointment_status_transitions",
+    AUTO_STATUS_INTERVAL,
+    transition_past_appointments,
+    run_on_startup=True,
+    singleton=True,
+)
@@ -0,0 +1,15 @@
+"""Configuração dos testes: banco SQLite descartável.
+
+``database`` lê ``DATABASE_URL`` na importação, por isso a variável é definida
+aqui, antes de qualquer módulo da aplicação ser importado.
+"""
+import os
+import sys
+import tempfile
+
+_directory = tempfile.mkdtemp(prefix="orthoflow-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'test.db')}"
+os.environ.pop("DATABASE_REPLICA_URL", None)
+os.environ.setdefault("ARCHIVE_DIR", os.path.join(_directory, "archive"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,96 @@
+"""Marcações concorrentes na mesma agenda não geram horário duplo."""
+import asyncio
+import threading
+from collections import Counter
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+import booking
+import models
+from benchmarks.patient_queries import cpf
+from routers.appointments import create_appointment
+from schemas import AppointmentCreate
+from sqlite_profile import build_sqlite_engine
+
+DATE = "2031-05-06"
+# Horários que se sobrepõem em cadeia (30 minutos cada)
+TIMES = ["09:00", "09:10", "09:20", "09:30", "09:40", "09:50", "10:00", "10:10"]
+ATTEMPTS_PER_TIME = 3
+
+
+@pytest.fixture
+def factory(tmp_path):
+    # Várias conexões de escrita, ao contrário do perfil SQLite da aplicação (uma
+    # só): sem isso o pool serializaria as marcações e o teste não provaria nada
+    engine = build_sqlite_engine(f"sqlite:///{tmp_path / 'booking.db'}", pool_size=len(TIMES) * ATTEMPTS_PER_TIME)
+    models.Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    with factory() as db:
+        plan = models.InsurancePlan(plan_name="Plano", provider="Operadora", coverage_type="total")
+        room = models.ClinicRoom(room_number="C1", room_type="consultório", capacity="1")
+        appointment_type = models.AppointmentType(type_name="Consulta", duration="30")
+        doctor = models.Doctor(
+            first_name="Dr.", last_name="Agenda", specialty="Ortopedia", license_number="CRM00009",
+            phone="11 3000-0000", email="agenda@test.local",
+        )
+        db.add_all([plan, room, appointment_type, doctor])
+        db.flush()
+        patient = models.Patient(
+            first_name="Paciente", last_name="Agenda", cpf=cpf(42), date_of_birth="1980-01-01",
+            phone="11 90000-0000", address="Rua A, 1", emergency_contact="Contato",
+            emergency_phone="11 90000-0001", insurance_plan_id=plan.id,
+        )
+        db.add(patient)
+        db.commit()
+        factory.ids = {
+            "patient_id": patient.id, "doctor_id": doctor.id,
+            "room_id": room.id, "appointment_type_id": appointment_type.id,
+        }
+    yield factory
+    engine.dispose()
+
+
+def test_concurrent_bookings_never_overlap(factory):
+    attempts = [time_ for time_ in TIMES for _ in range(ATTEMPTS_PER_TIME)]
+    barrier = threading.Barrier(len(attempts))
+    outcomes = Counter()
+    outcomes_lock = threading.Lock()
+    errors = []
+
+    def attempt(appointment_time: str) -> None:
+        data = AppointmentCreate(**factory.ids, appointment_date=DATE, appointment_time=appointment_time)
+        with factory() as db:
+            barrier.wait()
+            try:
+                asyncio.run(create_appointment(appointment_data=data, db=db, current_user=None))
+                outcome = "created"
+            except HTTPException as e:
+                outcome = e.status_code
+            except Exception as e:
+                errors.append(e)
+                return
+        with outcomes_lock:
+            outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=attempt, args=(time_,)) for time_ in attempts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert outcomes["created"] >= 1
+    assert outcomes["created"] + outcomes[400] + outcomes[503] == len(attempts)
+    with factory() as db:
+        active = db.query(models.Appointment).filter(
+            models.Appointment.appointment_date == DATE,
+            models.Appointment.status.in_(booking.ACTIVE_STATUSES),
+        ).order_by(models.Appointment.appointment_time).all()
+    assert len(active) == outcomes["created"]
+    for index, first in enumerate(active):
+        for second in active[index + 1:]:
+            assert not booking.overlaps(first.appointment_time, second.appointment_time), (
+                f"horário duplo: {first.appointment_time} e {second.appointment_time}"
+            )
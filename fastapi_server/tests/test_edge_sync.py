@@ -0,0 +1,124 @@
+"""Sincronização entre uma unidade e o central com dois bancos SQLite temporários."""
+import time
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import edge_sync
+import models
+from benchmarks.patient_queries import cpf
+from models import Appointment, AppointmentType, ClinicRoom, Doctor, InsurancePlan, Patient
+from sqlite_profile import build_sqlite_engine
+
+CONFLICT_DATE = "2030-03-04"
+CONFLICT_TIME = "10:00"
+
+
+def make_node(directory, name: str):
+    engine = build_sqlite_engine(f"sqlite:///{directory / (name + '.db')}")
+    models.Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autoflush=False, info={"sync_node": name})
+
+
+def book(factory, doctor_id, patient_id, appointment_type_id, date: str, time_: str, created_at=None, note=None):
+    with factory() as db:
+        appointment = Appointment(
+            patient_id=patient_id, doctor_id=doctor_id, appointment_type_id=appointment_type_id,
+            appointment_date=date, appointment_time=time_, status="scheduled", notes=note,
+        )
+        if created_at is not None:
+            appointment.created_at = created_at
+        db.add(appointment)
+        db.commit()
+        return appointment.id
+
+
+def dump(factory) -> dict:
+    with factory() as db:
+        return {
+            model.__tablename__: {
+                str(row.id): {key: value for key, value in edge_sync.serialize_row(row).items()
+                              if key not in ("created_at", "updated_at")}
+                for row in db.query(model)
+            }
+            for model in edge_sync.SYNCED_MODELS
+        }
+
+
+@pytest.fixture
+def nodes(tmp_path, monkeypatch):
+    # Lotes pequenos: o snapshot e os deltas passam por várias páginas
+    monkeypatch.setattr(edge_sync, "SYNC_BATCH_SIZE", 3)
+    central, edge = make_node(tmp_path, "central"), make_node(tmp_path, "unidade")
+    with central() as db:
+        plan = InsurancePlan(plan_name="Plano Sync", provider="Sync", coverage_type="full")
+        db.add_all([plan, ClinicRoom(room_number="S1", room_type="consultório", capacity="1"),
+                    AppointmentType(type_name="Consulta", duration="30")])
+        db.add(Doctor(
+            first_name="Dr.", last_name="Sync", specialty="Ortopedia", license_number="CRM00001",
+            phone="11 3000-0000", email="dr@sync.test",
+        ))
+        db.flush()
+        for number in range(5):
+            db.add(Patient(
+                first_name="Paciente", last_name=str(number), cpf=cpf(number + 1), date_of_birth="1980-01-01",
+                phone="11 90000-0000", address="Rua A, 1", emergency_contact="Contato",
+                emergency_phone="11 90000-0001", insurance_plan_id=plan.id,
+            ))
+        db.commit()
+    return central, edge, edge_sync.DatabaseTransport(central)
+
+
+def test_round_trip_converges(nodes):
+    central, edge, transport = nodes
+    with central() as db:
+        doctor_id = db.query(Doctor.id).scalar()
+        type_id = db.query(AppointmentType.id).scalar()
+        patient_ids = [row.id for row in db.query(Patient.id).order_by(Patient.cpf)]
+    for number in range(4):
+        book(central, doctor_id, patient_ids[number], type_id, "2030-01-10", f"{8 + number:02d}:00")
+
+    assert edge_sync.sync_once(edge, transport)["received"] == 13
+    assert dump(edge) == dump(central)
+    with edge() as db:
+        assert edge_sync.get_state(db, "snapshot_position") is None
+        assert edge_sync.get_state(db, "pulled_seq") is not None
+
+    # Período offline: os dois lados escrevem
+    for number in range(3):
+        book(central, doctor_id, patient_ids[0], type_id, "2030-02-01", f"{8 + number:02d}:00")
+        book(edge, doctor_id, patient_ids[1], type_id, "2030-02-02", f"{8 + number:02d}:00")
+    kept = book(central, doctor_id, patient_ids[2], type_id, CONFLICT_DATE, CONFLICT_TIME,
+                created_at=datetime(2030, 1, 1, 9, 0, tzinfo=timezone.utc), note="central")
+    cancelled = book(edge, doctor_id, patient_ids[3], type_id, CONFLICT_DATE, CONFLICT_TIME,
+                     created_at=datetime(2030, 1, 1, 9, 5, tzinfo=timezone.utc), note="unidade")
+    with edge() as db:
+        removed = db.query(Appointment).filter(Appointment.appointment_date == "2030-01-10").first()
+        removed_id = removed.id
+        db.delete(removed)
+        db.commit()
+    with edge() as db:
+        db.get(Patient, patient_ids[4]).phone = "11 99999-0001"
+        db.commit()
+    time.sleep(0.01)
+    with central() as db:
+        db.get(Patient, patient_ids[4]).phone = "11 99999-0002"
+        db.commit()
+
+    result = edge_sync.sync_once(edge, transport)
+    assert result["conflicts"] == 1
+    second = edge_sync.sync_once(edge, transport)
+    assert second["sent"] == 0 and second["received"] == 0
+
+    central_rows = dump(central)
+    assert dump(edge) == central_rows
+    appointments = central_rows["appointments"]
+    # Horário duplo: vence a marcação criada primeiro, nos dois nós
+    assert appointments[str(kept)]["status"] == "scheduled"
+    assert appointments[str(cancelled)]["status"] == "cancelled"
+    assert "[SYNC]" in appointments[str(cancelled)]["notes"]
+    assert str(removed_id) not in appointments
+    assert central_rows["patients"][str(patient_ids[4])]["phone"] == "11 99999-0002"
+    with edge() as db:
+        assert edge_sync.pending_changes(db) == 0
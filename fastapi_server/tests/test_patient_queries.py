@@ -0,0 +1,87 @@
+"""A listagem de pacientes faz o mesmo número de queries para qualquer página."""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import models
+from auth import get_current_active_user
+from database import SessionLocal, engine
+from main import app
+
+PATIENTS = 150
+PLANS = 12
+
+
+def cpf(number: int) -> str:
+    """CPF válido (com dígitos verificadores) a partir de um número."""
+    digits = [int(d) for d in f"{number % 10 ** 9:09d}"]
+    for size in (9, 10):
+        total = sum(d * w for d, w in zip(digits, range(size + 1, 1, -1)))
+        digits.append(0 if total % 11 < 2 else 11 - total % 11)
+    return "".join(map(str, digits))
+
+
+@pytest.fixture(scope="module")
+def client():
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        plans = [
+            models.InsurancePlan(plan_name=f"Plano {index}", provider=f"Operadora {index}", coverage_type="total")
+            for index in range(PLANS)
+        ]
+        session.add_all(plans)
+        session.flush()
+        session.add_all(
+            models.Patient(
+                first_name=f"Paciente{index}",
+                last_name="Teste",
+                cpf=cpf(100_000_000 + index),
+                date_of_birth="1980-01-01",
+                phone="11999999999",
+                address="Rua do Teste, 1",
+                emergency_contact="Contato",
+                emergency_phone="11988888888",
+                # Todos com plano: paciente sem plano não dispara a carga dos planos
+                insurance_plan_id=plans[index % PLANS].id,
+            )
+            for index in range(PATIENTS)
+        )
+        session.commit()
+        user = models.User(id=uuid.uuid4(), email="test@example.com", full_name="Teste", hashed_password="-", is_active=True)
+
+    # Sem TestClient como contexto: não dispara warmups nem jobs do startup
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def count_queries(client: TestClient, limit: int) -> int:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/api/patients/", params={"limit": limit})
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert len(response.json()) == limit
+    return len(statements)
+
+
+def test_patient_list_query_count_is_constant(client):
+    # Primeira chamada abre as conexões do pool
+    count_queries(client, 1)
+
+    assert count_queries(client, 1) == count_queries(client, 100)
+
+
+def test_patient_list_includes_insurance_plans(client):
+    patients = client.get("/api/patients/", params={"limit": 20}).json()
+
+    assert all(patient["insurance_plan"]["id"] == patient["insurance_plan_id"] for patient in patients)
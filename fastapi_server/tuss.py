@@ -0,0 +1,477 @@
+"""Catálogo TUSS (Terminologia Unificada da Saúde Suplementar) de procedimentos.
+
+Carga: ``python tuss.py load tmp/TUSS.zip`` ou ``POST /api/tuss/reload``.
+O arquivo (zip com CSV, ou o próprio CSV, como publicado pela ANS) é lido em
+streaming, sem extrair, e gravado em lotes (COPY no PostgreSQL) em uma nova
+versão de ``tuss_procedures``. Só ao final a versão é ativada; as anteriores
+ficam até ``TUSS_KEEP_VERSIONS`` para consulta dos códigos já usados. Um
+arquivo igual ao da versão ativa (mesmo sha256) não é recarregado.
+
+Autocomplete: cada worker mantém em memória um índice de prefixos (listas
+ordenadas + bisect) sobre os códigos e as palavras das descrições sem acento,
+atualizado na inicialização e quando outra versão é ativada (aviso pelo
+``invalidation``, com a verificação a cada ``TUSS_REFRESH_INTERVAL`` segundos
+como garantia).
+"""
+import argparse
+import csv
+import hashlib
+import heapq
+import io
+import os
+import re
+import threading
+import time
+import unicodedata
+import zipfile
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+import invalidation
+import jobs
+import metrics
+import startup
+from database import engine
+from models import TussCatalogVersion, TussProcedure
+
+TUSS_SOURCE = os.getenv(
+    "TUSS_SOURCE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tmp", "TUSS.zip")
+)
+TUSS_KEEP_VERSIONS = int(os.getenv("TUSS_KEEP_VERSIONS", "2"))
+TUSS_BATCH_SIZE = int(os.getenv("TUSS_BATCH_SIZE", "5000"))
+TUSS_REFRESH_INTERVAL = int(os.getenv("TUSS_REFRESH_INTERVAL", "60"))
+
+CODE_MAX_LENGTH = 10
+# Títulos e observações antes do cabeçalho nos arquivos da ANS
+MAX_HEADER_SEARCH_LINES = 20
+
+# Nomes de coluna aceitos (já sem acento e em minúsculas)
+COLUMN_ALIASES = {
+    "code": {"codigo", "codigo do termo", "codigo tuss", "cod", "cod termo", "cd procedimento", "codigo procedimento"},
+    "description": {"termo", "descricao", "descricao do termo", "procedimento", "descricao do procedimento", "nome"},
+    "valid_from": {"data de inicio de vigencia", "inicio de vigencia", "inicio vigencia", "dt inicio vigencia"},
+    "valid_until": {"data de fim de vigencia", "fim de vigencia", "fim vigencia", "dt fim vigencia"},
+}
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+
+class CatalogError(ValueError):
+    """Arquivo do catálogo ausente ou em formato não reconhecido."""
+
+
+def fold(text: str) -> str:
+    """Minúsculas, sem acentos e com espaços normalizados."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().split())
+
+
+def _column_name(header: str) -> str:
+    return _NON_ALNUM_RE.sub(" ", fold(header)).strip()
+
+
+def _parse_date(value: str) -> Optional[str]:
+    value = value.strip()
+    for pattern in ("%d/%m/%Y", "%Y-%m-%d", "%d/%m/%y"):
+        try:
+            return datetime.strptime(value, pattern).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+@dataclass
+class Row:
+    code: str
+    description: str
+    valid_from: Optional[str]
+    valid_until: Optional[str]
+
+
+def _check_file(path: str) -> None:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        raise CatalogError(f"Arquivo do catálogo TUSS vazio ou inexistente: {path}")
+
+
+def _open_members(path: str) -> Iterator[Tuple[str, Callable[[], BinaryIO]]]:
+    """(nome, abrir) de cada CSV do arquivo; aceita zip ou CSV direto."""
+    _check_file(path)
+    if not zipfile.is_zipfile(path):
+        yield os.path.basename(path), lambda: open(path, "rb")
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        names = sorted(
+            info.filename for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith((".csv", ".txt"))
+        )
+        if not names:
+            raise CatalogError("Nenhum CSV encontrado no zip do catálogo TUSS")
+        for name in names:
+            yield name, lambda name=name: archive.open(name)
+
+
+def _text_stream(open_member: Callable[[], BinaryIO]) -> Tuple[TextIO, str]:
+    """Abre o membro como texto, detectando a codificação e o separador."""
+    with open_member() as raw:
+        sample = raw.read(64 * 1024)
+    try:
+        sample.decode("utf-8-sig")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # Amostra cortada no meio de um caractere ainda é UTF-8
+        encoding = "utf-8-sig" if e.start >= len(sample) - 3 else "cp1252"
+    text = sample.decode(encoding, errors="ignore")
+    try:
+        delimiter = csv.Sniffer().sniff(text[:8192], delimiters=";,\t|").delimiter
+    except csv.Error:
+        delimiter = ";"
+    stream = io.TextIOWrapper(open_member(), encoding=encoding, errors="replace", newline="")
+    return stream, delimiter
+
+
+def _find_columns(reader) -> Optional[Dict[str, int]]:
+    """Posição de cada campo, procurando o cabeçalho nas primeiras linhas."""
+    for line_number, header in enumerate(reader):
+        names = [_column_name(cell) for cell in header]
+        columns = {
+            field: names.index(alias)
+            for field, aliases in COLUMN_ALIASES.items()
+            for alias in aliases if alias in names
+        }
+        if "code" in columns and "description" in columns:
+            return columns
+        if line_number >= MAX_HEADER_SEARCH_LINES:
+            break
+    return None
+
+
+def iter_rows(path: str) -> Iterator[Row]:
+    """Linhas válidas do catálogo, em streaming."""
+    for name, open_member in _open_members(path):
+        stream, delimiter = _text_stream(open_member)
+        with stream:
+            reader = csv.reader(stream, delimiter=delimiter)
+            columns = _find_columns(reader)
+            if columns is None:
+                print(f"[TUSS] {name} ignorado: cabeçalho com código e descrição não encontrado")
+                continue
+
+            width = max(columns.values()) + 1
+            for cells in reader:
+                if len(cells) < width:
+                    continue
+                code = re.sub(r"\D", "", cells[columns["code"]])
+                description = " ".join(cells[columns["description"]].split())
+                if not code or len(code) > CODE_MAX_LENGTH or not description:
+                    continue
+                yield Row(
+                    code=code,
+                    description=description,
+                    valid_from=_parse_date(cells[columns["valid_from"]]) if "valid_from" in columns else None,
+                    valid_until=_parse_date(cells[columns["valid_until"]]) if "valid_until" in columns else None,
+                )
+
+
+def _file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _insert_batch(connection, version_id: int, batch: List[Row]) -> None:
+    if connection.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow([version_id, row.code, row.description, row.valid_from or "", row.valid_until or ""])
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                "COPY tuss_procedures (version_id, code, description, valid_from, valid_until) "
+                "FROM STDIN WITH (FORMAT csv, NULL '')",
+                buffer
+            )
+        finally:
+            cursor.close()
+        return
+
+    connection.execute(insert(TussProcedure), [
+        {
+            "version_id": version_id,
+            "code": row.code,
+            "description": row.description,
+            "valid_from": row.valid_from,
+            "valid_until": row.valid_until,
+        }
+        for row in batch
+    ])
+
+
+def load_catalog(path: str = TUSS_SOURCE, force: bool = False) -> dict:
+    """Carrega o arquivo em uma nova versão e a ativa."""
+    started = time.perf_counter()
+    _check_file(path)
+    checksum = _file_checksum(path)
+
+    with engine.begin() as connection:
+        active = connection.execute(
+            select(TussCatalogVersion).where(TussCatalogVersion.is_active == True)
+        ).first()
+        if active and active.checksum == checksum and not force:
+            return {"version_id": active.id, "procedures": active.row_count, "duplicates": 0,
+                    "seconds": 0.0, "unchanged": True}
+
+    rows = iter_rows(path)
+    with engine.begin() as connection:
+        version_id = connection.execute(insert(TussCatalogVersion).values(
+            source=os.path.basename(path),
+            checksum=checksum,
+            row_count=0,
+            loaded_at=datetime.now(timezone.utc),
+            is_active=False
+        ).returning(TussCatalogVersion.id)).scalar()
+
+    seen: Set[str] = set()
+    count = duplicates = 0
+    try:
+        batch: List[Row] = []
+        for row in rows:
+            # O mesmo código pode se repetir (vigências diferentes): vale o primeiro
+            if row.code in seen:
+                duplicates += 1
+                continue
+            seen.add(row.code)
+            batch.append(row)
+            if len(batch) >= TUSS_BATCH_SIZE:
+                with engine.begin() as connection:
+                    _insert_batch(connection, version_id, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            with engine.begin() as connection:
+                _insert_batch(connection, version_id, batch)
+            count += len(batch)
+        if count == 0:
+            raise CatalogError("Nenhum procedimento válido encontrado no catálogo TUSS")
+
+        with engine.begin() as connection:
+            connection.execute(update(TussCatalogVersion).values(
+                is_active=TussCatalogVersion.id == version_id
+            ))
+            connection.execute(update(TussCatalogVersion).where(
+                TussCatalogVersion.id == version_id
+            ).values(row_count=count))
+            old_versions = select(TussCatalogVersion.id).order_by(
+                TussCatalogVersion.id.desc()
+            ).offset(max(TUSS_KEEP_VERSIONS, 1))
+            old_ids = [row[0] for row in connection.execute(old_versions)]
+            if old_ids:
+                connection.execute(delete(TussProcedure).where(TussProcedure.version_id.in_(old_ids)))
+                connection.execute(delete(TussCatalogVersion).where(TussCatalogVersion.id.in_(old_ids)))
+    except BaseException:
+        with engine.begin() as connection:
+            connection.execute(delete(TussProcedure).where(TussProcedure.version_id == version_id))
+            connection.execute(delete(TussCatalogVersion).where(TussCatalogVersion.id == version_id))
+        raise
+
+    seconds = time.perf_counter() - started
+    metrics.observe("tuss.load", seconds)
+    print(f"[TUSS] Versão {version_id} ativada: {count} procedimentos ({duplicates} repetidos) em {seconds:.1f}s")
+    refresh_index()
+    invalidation.send("tuss_catalog", version_id)
+    return {"version_id": version_id, "procedures": count, "duplicates": duplicates,
+            "seconds": round(seconds, 3), "unchanged": False}
+
+
+class PrefixIndex:
+    """Busca por prefixo em listas ordenadas (bisect), sem acessar o banco.
+
+    As posições seguem a ordem de exibição (descrições mais curtas primeiro),
+    então os melhores resultados são simplesmente as menores posições.
+    """
+
+    def __init__(self, version_id: int, procedures: Iterable[Tuple[str, str, Optional[str]]]):
+        self.version_id = version_id
+        entries = sorted(
+            (len(fold(description)), code, description, valid_until)
+            for code, description, valid_until in procedures
+        )
+        self.codes = [entry[1] for entry in entries]
+        self.descriptions = [entry[2] for entry in entries]
+        self.valid_until = [entry[3] for entry in entries]
+        folded = [fold(description) for description in self.descriptions]
+
+        by_code = sorted((code, position) for position, code in enumerate(self.codes))
+        self.sorted_codes = [code for code, _ in by_code]
+        self.code_positions = [position for _, position in by_code]
+        self.by_code = dict(by_code)
+
+        by_description = sorted((text, position) for position, text in enumerate(folded))
+        self.sorted_descriptions = [text for text, _ in by_description]
+        self.description_positions = [position for _, position in by_description]
+
+        words = sorted(
+            (word, position)
+            for position, text in enumerate(folded)
+            for word in set(_NON_ALNUM_RE.split(text)) if len(word) >= 2
+        )
+        self.words = [word for word, _ in words]
+        self.word_positions = [position for _, position in words]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @staticmethod
+    def _prefix_range(keys: List[str], prefix: str) -> Tuple[int, int]:
+        start = bisect_left(keys, prefix)
+        return start, bisect_left(keys, prefix + "\U0010ffff", start)
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        """Posições dos procedimentos que casam com o código ou com todas as palavras."""
+        folded = fold(query)
+        if not folded:
+            return []
+
+        digits = folded.replace(".", "").replace("-", "").replace(" ", "")
+        if digits.isdigit():
+            start, end = self._prefix_range(self.sorted_codes, digits)
+            return self.code_positions[start:min(end, start + limit)]
+
+        # Descrições que começam com a busca vêm primeiro
+        start, end = self._prefix_range(self.sorted_descriptions, folded)
+        results = heapq.nsmallest(limit, self.description_positions[start:end])
+        if len(results) >= limit:
+            return results
+
+        # Depois as que têm palavras com todos os prefixos, da menor faixa para a maior
+        ranges = sorted(
+            (end - start, start, end)
+            for start, end in (self._prefix_range(self.words, token) for token in set(_NON_ALNUM_RE.split(folded)) if token)
+        )
+        if not ranges or ranges[0][0] == 0:
+            return results
+        _, start, end = ranges[0]
+        candidates = set(self.word_positions[start:end])
+        for _, start, end in ranges[1:]:
+            candidates.intersection_update(self.word_positions[start:end])
+            if not candidates:
+                break
+        candidates.difference_update(results)
+        return results + heapq.nsmallest(limit - len(results), candidates)
+
+    def entry(self, position: int) -> dict:
+        return {
+            "code": self.codes[position],
+            "description": self.descriptions[position],
+            "valid_until": self.valid_until[position],
+        }
+
+_index: Optional[PrefixIndex] = None
+
+
+def _active_version_id(connection) -> Optional[int]:
+    return connection.execute(
+        select(TussCatalogVersion.id).where(TussCatalogVersion.is_active == True)
+    ).scalar()
+
+
+def refresh_index() -> None:
+    """Recarrega o índice se outra versão estiver ativa."""
+    global _index
+    with engine.connect() as connection:
+        version_id = _active_version_id(connection)
+        if version_id is None:
+            _index = None
+            return
+        if _index is not None and _index.version_id == version_id:
+            return
+        rows = connection.execute(
+            select(TussProcedure.code, TussProcedure.description, TussProcedure.valid_until)
+            .where(TussProcedure.version_id == version_id)
+        ).all()
+    started = time.perf_counter()
+    index = PrefixIndex(version_id, rows)
+    _index = index
+    metrics.observe("tuss.index_build", time.perf_counter() - started)
+
+
+def is_loaded() -> bool:
+    return _index is not None
+
+
+def autocomplete(query: str, limit: int = 20, include_expired: bool = False) -> List[dict]:
+    index = _index
+    if index is None:
+        return []
+    started = time.perf_counter()
+    today = date.today().isoformat()
+    results = []
+    # Busca alguns a mais para repor os fora de vigência
+    for position in index.search(query, limit if include_expired else limit * 2):
+        if not include_expired and index.valid_until[position] and index.valid_until[position] < today:
+            continue
+        results.append(index.entry(position))
+        if len(results) >= limit:
+            break
+    metrics.observe("tuss.autocomplete", time.perf_counter() - started)
+    return results
+
+
+def describe(code: str) -> Optional[str]:
+    index = _index
+    if index is None:
+        return None
+    position = index.by_code.get(code)
+    return index.descriptions[position] if position is not None else None
+
+
+def unknown_codes(db: Session, codes: Iterable[str]) -> List[str]:
+    """Códigos que não existem na versão ativa do catálogo."""
+    codes = set(codes)
+    if not codes:
+        return []
+    known = set(db.execute(
+        select(TussProcedure.code)
+        .join(TussCatalogVersion, TussCatalogVersion.id == TussProcedure.version_id)
+        .where(TussCatalogVersion.is_active == True, TussProcedure.code.in_(codes))
+    ).scalars())
+    return sorted(codes - known)
+
+
+def _on_catalog_changed(key: Optional[str]) -> None:
+    # Reconstruir o índice leva alguns segundos: fora da thread das invalidações
+    threading.Thread(target=refresh_index, name="tuss-refresh", daemon=True).start()
+
+
+startup.register_warmup(refresh_index)
+invalidation.register("tuss_catalog", _on_catalog_changed)
+jobs.register_job("tuss_index_refresh", TUSS_REFRESH_INTERVAL, refresh_index)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Catálogo TUSS")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    load = subparsers.add_parser("load", help="carrega um arquivo do catálogo")
+    load.add_argument("path", nargs="?", default=TUSS_SOURCE)
+    load.add_argument("--force", action="store_true", help="recarrega mesmo se o arquivo não mudou")
+    args = parser.parse_args()
+
+    try:
+        print(load_catalog(args.path, force=args.force))
+    except CatalogError as e:
+        raise SystemExit(f"[TUSS] {e}")
+
+
+if __name__ == "__main__":
+    main()
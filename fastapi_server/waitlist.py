@@ -0,0 +1,268 @@
+"""Lista de espera preenchida pelos cancelamentos.
+
+Quando um agendamento futuro é cancelado, a rota agenda ``match_freed_slot``
+como tarefa de fundo (executada depois de a resposta ser enviada, sem somar
+latência ao cancelamento). O horário liberado é comparado com as entradas em
+espera do médico e as da especialidade dele sem médico definido. No
+PostgreSQL as duas buscas usam índices GiST parciais sobre (médico ou
+especialidade, janela de dias), só com entradas em espera, que devolvem apenas
+as janelas que contêm a data; no SQLite, índices por (médico ou especialidade,
+``earliest_date``). Entradas cujo agendamento atual já é igual ou anterior ao
+horário são descartadas na própria consulta, antes do ``LIMIT``.
+
+Entre as candidatas (ordem de inscrição), se a primeira tem ``auto_book`` ela
+é marcada direto, com o horário travado e os conflitos verificados como numa
+marcação comum. Caso contrário, até ``WAITLIST_OFFER_COUNT`` pacientes
+recebem a oferta por ``WAITLIST_OFFER_MINUTES`` minutos e o primeiro que aceitar
+fica com o horário. Se o encaixe substitui um agendamento atual do paciente,
+esse agendamento é cancelado e o horário dele também é oferecido.
+
+A tarefa ``waitlist_expiry`` devolve à espera as ofertas vencidas e encerra
+entradas cuja janela já passou.
+"""
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import BackgroundTasks
+from sqlalchemy import and_, exists, or_, text, update
+from sqlalchemy.orm import Session
+
+import booking
+import events
+import jobs
+import metrics
+import stats
+from database import SessionLocal
+from models import WAITLIST_WINDOW_SQL, Appointment, Doctor, WaitlistEntry
+
+WAITLIST_OFFER_COUNT = int(os.getenv("WAITLIST_OFFER_COUNT", "3"))
+WAITLIST_OFFER_MINUTES = int(os.getenv("WAITLIST_OFFER_MINUTES", "120"))
+WAITLIST_EXPIRY_INTERVAL = float(os.getenv("WAITLIST_EXPIRY_INTERVAL", "300"))
+
+WAITING, OFFERED, BOOKED, CANCELLED, EXPIRED = "waiting", "offered", "booked", "cancelled", "expired"
+OPEN_STATUSES = (WAITING, OFFERED)
+
+
+def freed_slot(appointment: Appointment) -> Optional[dict]:
+    """Horário que o agendamento deixa livre ao ser cancelado (chamar antes do commit)."""
+    if appointment.appointment_date < date.today().isoformat():
+        return None
+    return {
+        "doctor_id": appointment.doctor_id,
+        "room_id": appointment.room_id,
+        "date": appointment.appointment_date,
+        "time": appointment.appointment_time,
+    }
+
+
+def _window_contains(db: Session, day: str):
+    if db.get_bind().dialect.name == "postgresql":
+        # Mesma expressão do índice GiST
+        return text(f"{WAITLIST_WINDOW_SQL} @> :waitlist_day").bindparams(waitlist_day=int(day.replace("-", "")))
+    return and_(WaitlistEntry.earliest_date <= day, WaitlistEntry.latest_date >= day)
+
+
+def find_candidates(
+    db: Session, slot: dict, specialty: Optional[str], limit: int = WAITLIST_OFFER_COUNT
+) -> List[WaitlistEntry]:
+    """Entradas em espera que aceitam o horário, da mais antiga para a mais nova.
+
+    Uma entrada só aceita o horário se ele for anterior ao agendamento ativo que
+    o paciente já tem (quando tem).
+    """
+    not_earlier = exists().where(
+        Appointment.id == WaitlistEntry.current_appointment_id,
+        Appointment.status.in_(booking.ACTIVE_STATUSES),
+        or_(
+            Appointment.appointment_date < slot["date"],
+            and_(Appointment.appointment_date == slot["date"], Appointment.appointment_time <= slot["time"]),
+        ),
+    )
+    target = WaitlistEntry.doctor_id == slot["doctor_id"]
+    if specialty:
+        target = or_(target, and_(WaitlistEntry.doctor_id.is_(None), WaitlistEntry.specialty == specialty))
+    return db.query(WaitlistEntry).filter(
+        WaitlistEntry.status == WAITING,
+        _window_contains(db, slot["date"]),
+        WaitlistEntry.earliest_time <= slot["time"],
+        WaitlistEntry.latest_time >= slot["time"],
+        target,
+        ~not_earlier,
+    ).order_by(WaitlistEntry.created_at).limit(limit).with_for_update(skip_locked=True).all()
+
+
+def book_entry(db: Session, entry: WaitlistEntry, slot: dict) -> Tuple[Optional[Appointment], Optional[dict]]:
+    """Marca o horário para a entrada (sem commit).
+
+    Retorna o agendamento criado (``None`` se o horário já foi ocupado) e o
+    horário liberado pelo agendamento anterior do paciente, se houver.
+    """
+    booking.lock_keys_blocking(db, booking.schedule_keys(slot["doctor_id"], slot["room_id"], slot["date"]))
+    if booking.find_conflict(db, Appointment.doctor_id, slot["doctor_id"], slot["date"], slot["time"]):
+        return None, None
+    room_id = slot["room_id"]
+    if room_id and booking.find_conflict(db, Appointment.room_id, room_id, slot["date"], slot["time"]):
+        room_id = None
+
+    appointment = Appointment(
+        patient_id=entry.patient_id,
+        doctor_id=slot["doctor_id"],
+        room_id=room_id,
+        appointment_type_id=entry.appointment_type_id,
+        appointment_date=slot["date"],
+        appointment_time=slot["time"],
+        status="scheduled",
+        reason=entry.reason,
+        notes="[WAITLIST] Encaixe da lista de espera",
+    )
+    db.add(appointment)
+    db.flush()
+    stats.record_change(db, None, stats.appointment_key(appointment))
+    events.publish(db, "created", appointment)
+
+    released = None
+    if entry.current_appointment_id is not None:
+        current = db.get(Appointment, entry.current_appointment_id)
+        if current is not None and current.status in booking.ACTIVE_STATUSES:
+            released = freed_slot(current)
+            stats_before = stats.appointment_key(current)
+            current.status = "cancelled"
+            stats.record_change(db, stats_before, stats.appointment_key(current))
+            events.publish(db, "cancelled", current)
+
+    entry.status = BOOKED
+    entry.appointment_id = appointment.id
+    # Outras ofertas do mesmo horário voltam a esperar
+    db.execute(
+        update(WaitlistEntry)
+        .where(
+            WaitlistEntry.status == OFFERED,
+            WaitlistEntry.id != entry.id,
+            WaitlistEntry.offered_doctor_id == slot["doctor_id"],
+            WaitlistEntry.offered_date == slot["date"],
+            WaitlistEntry.offered_time == slot["time"],
+        )
+        .values(**_cleared_offer(WAITING))
+        .execution_options(synchronize_session=False)
+    )
+    return appointment, released
+
+
+def _cleared_offer(new_status: str) -> dict:
+    return {
+        "status": new_status,
+        "offered_doctor_id": None,
+        "offered_room_id": None,
+        "offered_date": None,
+        "offered_time": None,
+        "offer_expires_at": None,
+    }
+
+
+def clear_offer(entry: WaitlistEntry, new_status: str) -> None:
+    for key, value in _cleared_offer(new_status).items():
+        setattr(entry, key, value)
+
+
+def lock_entry(db: Session, entry_id, statuses: Tuple[str, ...] = (OFFERED,)) -> Optional[WaitlistEntry]:
+    """Entrada travada até o fim da transação, se o status ainda for um de ``statuses``.
+
+    Retorna ``None`` se outra requisição já mudou o status (oferta aceita,
+    recusada ou vencida): quem responde depois não pode sobrescrever o status
+    gravado por quem respondeu antes.
+    """
+    entry = db.query(WaitlistEntry).filter(
+        WaitlistEntry.id == entry_id
+    ).with_for_update().populate_existing().first()
+    if entry is None or entry.status not in statuses:
+        return None
+    return entry
+
+
+def _offer(entry: WaitlistEntry, slot: dict) -> None:
+    entry.status = OFFERED
+    entry.offered_doctor_id = slot["doctor_id"]
+    entry.offered_room_id = slot["room_id"]
+    entry.offered_date = slot["date"]
+    entry.offered_time = slot["time"]
+    entry.offer_expires_at = datetime.now(timezone.utc) + timedelta(minutes=WAITLIST_OFFER_MINUTES)
+
+
+def match_slot(db: Session, slot: dict) -> Tuple[str, Optional[dict]]:
+    """Preenche um horário liberado (sem commit); retorna o resultado e o próximo horário liberado."""
+    doctor = db.get(Doctor, slot["doctor_id"])
+    specialty = doctor.specialty if doctor is not None else None
+    candidates = find_candidates(db, slot, specialty)
+    if not candidates:
+        return "unmatched", None
+
+    # A ordem de inscrição vale: só marca direto se a primeira da fila aceitar isso
+    if candidates[0].auto_book:
+        appointment, released = book_entry(db, candidates[0], slot)
+        if appointment is None:
+            return "taken", None
+        return "booked", released
+
+    for entry in candidates[:WAITLIST_OFFER_COUNT]:
+        _offer(entry, slot)
+    return "offered", None
+
+
+def match_freed_slot(slot: Optional[dict]) -> None:
+    """Tarefa de fundo do cancelamento: oferece ou marca o horário liberado.
+
+    Um encaixe que substitui o agendamento atual do paciente libera outro
+    horário, que é processado em seguida.
+    """
+    while slot is not None:
+        with SessionLocal() as db:
+            try:
+                result, slot_after = match_slot(db, slot)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                metrics.increment("waitlist.errors")
+                print(f"[WAITLIST] Erro ao processar horário {slot['date']} {slot['time']}: {e}")
+                return
+        metrics.increment(f"waitlist.{result}")
+        if result in ("booked", "offered"):
+            print(f"[WAITLIST] Horário {slot['date']} {slot['time']}: {result}")
+        slot = slot_after
+
+
+def schedule_match(background_tasks: BackgroundTasks, db: Session, slot: Optional[dict]) -> None:
+    """Agenda ``match_freed_slot`` para depois da resposta.
+
+    O FastAPI só fecha a sessão da requisição depois das tarefas de fundo; ela
+    é fechada antes para não prender a conexão (no SQLite, o único escritor).
+    """
+    if slot is None:
+        return
+    background_tasks.add_task(db.close)
+    background_tasks.add_task(match_freed_slot, slot)
+
+
+def expire_entries() -> int:
+    """Devolve ofertas vencidas à espera e encerra janelas que já passaram."""
+    today = date.today().isoformat()
+    with SessionLocal() as db:
+        offers = db.execute(
+            update(WaitlistEntry)
+            .where(WaitlistEntry.status == OFFERED, WaitlistEntry.offer_expires_at < datetime.now(timezone.utc))
+            .values(**_cleared_offer(WAITING))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        expired = db.execute(
+            update(WaitlistEntry)
+            .where(WaitlistEntry.status.in_(OPEN_STATUSES), WaitlistEntry.latest_date < today)
+            .values(**_cleared_offer(EXPIRED))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+    metrics.increment("waitlist.offers_expired", offers)
+    metrics.increment("waitlist.expired", expired)
+    return offers + expired
+
+
+jobs.register_job("waitlist_expiry", WAITLIST_EXPIRY_INTERVAL, expire_entries, singleton=True)